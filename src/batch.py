@@ -0,0 +1,157 @@
+'''
+Headless batch solver
+
+Solves many .bmp (or compiled .mazec) mazes with a process pool and streams the results as JSON lines:
+
+    python -m src.batch mazes/ other.bmp --algorithms Dijkstra AStar --output results.jsonl
+'''
+
+import os
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import json
+import sys
+import time
+from multiprocessing import Pool
+from typing import Iterable, Iterator, Optional, TextIO
+import pygame
+
+from src.maze import Maze
+from src.maze.bmp import BmpException
+from src.maze.compiled import EXTENSION as COMPILED_EXTENSION
+from src.shortest_path import AStar, BidirectionalAStar, Dijkstra, GBFS, Hierarchical, JPS, ShortestPath, WavefrontBFS
+from src.shortest_path.cache import SolutionCache
+from src.shortest_path.profiling import Profiler
+
+ALGORITHMS: dict[str, type[ShortestPath]] = {algorithm.__name__: algorithm for algorithm in [Dijkstra, AStar, GBFS, Hierarchical, BidirectionalAStar, JPS, WavefrontBFS]}
+
+Result = dict[str, object]
+
+class BatchException(Exception):
+    def __init__(self, msg: str) -> None:
+        super().__init__(msg)
+
+def find_mazes(paths: Iterable[str]) -> list[str]:
+    files: list[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(('.bmp', COMPILED_EXTENSION))))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise BatchException(f'No such file or directory: {path}')
+
+    return files
+
+def load_maze(file_name: str) -> Maze:
+    # Compiled mazes are mapped and shared between the workers instead of decoded by each of them
+    if file_name.endswith(COMPILED_EXTENSION):
+        return Maze.load_compiled(file_name)
+
+    # Uncompressed BMPs are read straight from the file, the other formats are decoded by pygame
+    try:
+        return Maze.load_bmp(file_name)
+    except BmpException:
+        return Maze(pygame.image.load(file_name))
+
+def solve_file(task: tuple[str, list[str], Optional[str], bool]) -> list[Result]:
+    file_name, algorithm_names, cache_dir, profile = task
+    profiler = Profiler() if profile else None
+
+    try:
+        start_time = time.perf_counter()
+        maze = load_maze(file_name)
+        # A profiled run times the classification and the compilation as phases of the first search
+        if profiler is None:
+            maze.compile()
+        load_time = time.perf_counter() - start_time
+    except Exception as e:
+        return [{'file': file_name, 'error': f'{type(e).__name__}: {e}'}]
+
+    # Mazes solved by an earlier run are read from the cache
+    cache = SolutionCache(cache_dir) if cache_dir is not None else None
+
+    results: list[Result] = []
+    for name in algorithm_names:
+        algorithm = ALGORITHMS[name]()
+        result: Result = {'file': file_name, 'algorithm': name, 'load_time': load_time}
+
+        try:
+            hits = cache.hits if cache is not None else 0
+            start_time = time.perf_counter()
+            if profiler is not None:
+                path = profiler.run(algorithm, maze)
+            else:
+                path = algorithm.run(maze) if cache is None else cache.run(algorithm, maze)
+            result['time'] = time.perf_counter() - start_time
+            result['path_length'] = len(path)
+            result['cost'] = algorithm.stats.cost
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+
+        result['expanded'] = algorithm.stats.expanded
+        if profiler is not None:
+            result['profile'] = profiler.profiles[-1].to_dict()
+        if cache is not None:
+            result['cached'] = cache.hits > hits
+        results.append(result)
+
+    if cache is not None:
+        cache.close()
+
+    return results
+
+def solve_many(files: list[str], algorithm_names: list[str], workers: Optional[int] = None, cache_dir: Optional[str] = None, profile: bool = False) -> Iterator[Result]:
+    for name in algorithm_names:
+        if name not in ALGORITHMS:
+            raise BatchException(f'Unknown algorithm: {name} (choose from {", ".join(ALGORITHMS)})')
+
+    tasks = [(file_name, algorithm_names, cache_dir, profile) for file_name in files]
+
+    if workers == 1:
+        for task in tasks:
+            yield from solve_file(task)
+        return
+
+    # Results are yielded as soon as a maze is solved, in whatever order the workers finish
+    with Pool(workers or os.cpu_count()) as pool:
+        for results in pool.imap_unordered(solve_file, tasks):
+            yield from results
+
+def write_results(results: Iterable[Result], output: TextIO) -> int:
+    count = 0
+    for result in results:
+        output.write(json.dumps(result) + '\n')
+        # Flush every line so nothing finished is lost if the run is killed
+        output.flush()
+        count += 1
+
+    return count
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m src.batch', description='Solve .bmp mazes without a window and write the results as JSON lines.')
+    parser.add_argument('paths', nargs='+', help='.bmp files or directories with .bmp files')
+    parser.add_argument('-a', '--algorithms', nargs='+', default=list(ALGORITHMS), choices=list(ALGORITHMS), help='algorithms to run (default: all)')
+    parser.add_argument('-o', '--output', default='-', help='output .jsonl file (default: stdout)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes (default: number of cores)')
+    parser.add_argument('--cache-dir', default=None, help='directory of a solution cache shared between runs (default: no cache)')
+    parser.add_argument('--profile', action='store_true', help='add the phase timings and counters of every search to its result (the cache is not used)')
+    args = parser.parse_args(argv)
+
+    try:
+        files = find_mazes(args.paths)
+    except BatchException as e:
+        parser.error(str(e))
+
+    results = solve_many(files, args.algorithms, args.workers, args.cache_dir, args.profile)
+    if args.output == '-':
+        write_results(results, sys.stdout)
+    else:
+        with open(args.output, 'w') as output:
+            write_results(results, output)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
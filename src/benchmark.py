@@ -0,0 +1,213 @@
+'''
+Benchmark of the shortest path engines on generated mazes
+
+Every case generates a maze with a fixed seed and runs one engine on it in a fresh process,
+so the peak memory of one case does not leak into the next one:
+
+    python -m src.benchmark --sizes 64 256 1024 --keys 0 2 --save baseline.json
+    python -m src.benchmark --sizes 64 256 1024 --keys 0 2 --compare baseline.json
+
+With keys that can be picked up in any order several key combinations are searched at the
+same time, ParallelLayers expands them in parallel (compare it with Dijkstra):
+
+    python -m src.benchmark -a Dijkstra ParallelLayers --sizes 512 --keys 4 --key-layout any
+'''
+
+import os
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import inspect
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from src.maze import Maze
+from src.maze.cost import COST_MODELS
+from src.maze.generator import GREY_DISTRIBUTIONS, KEY_LAYOUTS, generate_maze, max_keys
+from src.shortest_path import ShortestPath
+from src.shortest_path.queues import QUEUES
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None # type: ignore
+
+BENCHMARK_VERSION = 4
+
+# Counters that are exactly the same on every run, everything else is timing and is compared with a tolerance
+EXACT_FIELDS = ['path_length', 'cost', 'expanded', 'pushes', 'distances']
+
+@dataclass(frozen=True)
+class Case:
+    algorithm: str
+    side: int
+    wall_density: float
+    keys: int
+    grey: str
+    seed: int
+    cost: str = 'unit'
+    queue: str = 'heap'
+    key_layout: str = 'ordered'
+
+    @property
+    def key(self) -> str:
+        return f'{self.algorithm}/{self.side}/{self.wall_density}/{self.keys}/{self.grey}/{self.seed}/{self.cost}/{self.queue}/{self.key_layout}'
+
+def algorithms() -> dict[str, type[ShortestPath]]:
+    # Every concrete engine that can be created without arguments
+    found: dict[str, type[ShortestPath]] = dict()
+    classes = list(ShortestPath.__subclasses__())
+    while classes:
+        cls = classes.pop(0)
+        classes.extend(cls.__subclasses__())
+        if not getattr(cls, '__abstractmethods__', None):
+            found.setdefault(cls.__name__, cls)
+
+    return found
+
+def takes_queue(cls: type[ShortestPath]) -> bool:
+    return 'queue' in inspect.signature(cls).parameters
+
+def peak_rss() -> Optional[int]:
+    if resource is None:
+        return None
+
+    # Kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def run_case(case: Case) -> dict[str, object]:
+    result: dict[str, object] = {'case': case.key, **asdict(case)}
+
+    start_time = time.perf_counter()
+    maze = Maze(generate_maze(case.side, case.wall_density, case.keys, case.grey, case.seed, case.key_layout), cost_model=COST_MODELS[case.cost]())
+    maze.compile()
+    result['load_time'] = time.perf_counter() - start_time
+    result['rss_before_kb'] = peak_rss()
+
+    cls = algorithms()[case.algorithm]
+    algorithm = cls(queue=QUEUES[case.queue]) if takes_queue(cls) else cls() # type: ignore # the engines with a queue have defaults for the rest
+    start_time = time.perf_counter()
+    try:
+        path = algorithm.run(maze)
+        result['path_length'] = len(path)
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    search_time = time.perf_counter() - start_time
+
+    stats = algorithm.stats
+    result.update({
+        'search_time': search_time,
+        'cost': stats.cost,
+        'expanded': stats.expanded,
+        'pushes': stats.pushes,
+        'relaxations': stats.relaxations,
+        'stale': stats.stale,
+        'distances': stats.distances,
+        'ns_per_expansion': search_time * 1e9 / stats.expanded if stats.expanded else None,
+        'peak_rss_kb': peak_rss(),
+    })
+
+    return result
+
+def run_cases(cases: list[Case]) -> list[dict[str, object]]:
+    # A new interpreter for every case keeps the peak RSS numbers independent
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for case in cases:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, (case,))
+        print(format_result(result), file=sys.stderr)
+        results.append(result)
+
+    return results
+
+def format_result(result: dict[str, object]) -> str:
+    ns = result['ns_per_expansion']
+    rss = result['peak_rss_kb']
+    return (f'{result["case"]:<40} '
+        f'expanded={result["expanded"]:<9} pushes={result["pushes"]:<9} distances={result["distances"]:<9} '
+        f'{"-" if ns is None else f"{ns:.0f}"} ns/expansion  '
+        f'peak rss={"-" if rss is None else f"{rss / 1024:.1f} MB"}' +
+        (f'  error={result["error"]}' if 'error' in result else ''))
+
+def compare(results: list[dict[str, object]], baseline: dict[str, object], tolerance: float) -> list[str]:
+    '''
+    Differences between the results and a saved baseline. The counters have to match exactly,
+    the time per expansion and the peak memory may grow at most by the tolerance.
+    '''
+    baseline_results = {result['case']: result for result in baseline['results']} # type: ignore # the baseline is a parsed json
+    regressions = []
+
+    for result in results:
+        old = baseline_results.get(result['case'])
+        if old is None:
+            continue
+
+        for field in EXACT_FIELDS:
+            if result.get(field) != old.get(field):
+                regressions.append(f'{result["case"]}: {field} changed from {old.get(field)} to {result.get(field)}')
+
+        for field in ['ns_per_expansion', 'peak_rss_kb']:
+            new_value, old_value = result.get(field), old.get(field)
+            if new_value is not None and old_value and new_value > old_value * (1 + tolerance): # type: ignore # both are numbers
+                regressions.append(f'{result["case"]}: {field} grew from {old_value:.0f} to {new_value:.0f}')
+
+    return regressions
+
+def main(argv: Optional[list[str]] = None) -> int:
+    engines = algorithms()
+
+    parser = argparse.ArgumentParser(prog='python -m src.benchmark', description='Benchmark the shortest path engines on generated mazes.')
+    parser.add_argument('-a', '--algorithms', nargs='+', default=list(engines), choices=list(engines), help='engines to run (default: all)')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[64, 128, 256], help='maze side lengths in pixels (20 to 4096)')
+    parser.add_argument('--wall-density', nargs='+', type=float, default=[0.2], help='part of the area covered by random walls')
+    parser.add_argument('--keys', nargs='+', type=int, default=[0, 2], help='number of door/key colors')
+    parser.add_argument('--grey', nargs='+', default=['flat'], choices=GREY_DISTRIBUTIONS, help='distribution of the grey levels')
+    parser.add_argument('--cost', nargs='+', default=['unit'], choices=list(COST_MODELS), help='cost models of the grey pixels')
+    parser.add_argument('--queue', nargs='+', default=['heap'], choices=list(QUEUES), help='priority queues of the engines that take one')
+    parser.add_argument('--key-layout', nargs='+', default=['ordered'], choices=KEY_LAYOUTS, help='keys in the strip before their door or all in the first strip')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the maze generator')
+    parser.add_argument('-o', '--output', help='write the results as json')
+    parser.add_argument('--save', help='write the results as a baseline file')
+    parser.add_argument('--compare', help='compare the results with a baseline file and fail on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative growth of time and memory when comparing (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    cases = []
+    for side, keys in itertools.product(args.sizes, args.keys):
+        if keys > max_keys(side):
+            print(f'Skipping {keys} keys for side {side}, at most {max_keys(side)} fit', file=sys.stderr)
+            continue
+
+        cases.extend(Case(algorithm, side, density, keys, grey, args.seed, cost, queue if takes_queue(engines[algorithm]) else 'heap', key_layout)
+            for density, grey, cost, key_layout, algorithm, queue in itertools.product(args.wall_density, args.grey, args.cost, args.key_layout, args.algorithms, args.queue)
+            # The other engines always use a heap
+            if queue == args.queue[0] or takes_queue(engines[algorithm]))
+
+    results = run_cases(cases)
+    report = {'version': BENCHMARK_VERSION, 'python': sys.version.split()[0], 'results': results}
+
+    for file_name in filter(None, [args.output, args.save]):
+        with open(file_name, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
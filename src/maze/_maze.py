@@ -1,10 +1,22 @@
+import hashlib
+import itertools
+import mmap
+from array import array
+from dataclasses import asdict
 from typing import Iterator, NewType, Optional
 import pygame
-from math import sqrt
 from collections import deque
 
 from src.maze.key_comb import KeyCombination
+from src.maze.adjacency import Adjacency, build_adjacency
+from src.maze.bmp import Bitmap, Region
+from src.maze.classify import Classification, Zone, classify
+from src.maze.compiled import write_compiled, read_compiled
+from src.maze.cost import ConstantCost, CostModel, LookupTableCost, cost_grid
+from src.maze.distances import DistanceStore
+from src.maze.grid import Color, Grid, PixelMap
 from src.maze.pixel import Pixel, PixelType
+from src.maze.rooms import RoomFields, Rooms, find_rooms
 
 WALL_COLOR = (0, 0, 0)
 START_COLOR = (195, 195, 196)
@@ -22,36 +34,280 @@ START_KEY_COMB = KeyCombination()
 
 Coord = NewType('Coord', tuple[int, int])
 Edge = NewType('Edge', tuple[float, KeyCombination, Coord])
-PriorityNode = NewType('PriorityNode', tuple[float, KeyCombination, Coord])
-Distances = dict[Coord, dict[KeyCombination, float]]
+# The searches work with (pixel index, key combination) slots (see DistanceStore) instead of coordinates,
+# the middle value is minus the number of keys so that ties pop the states with more keys first
+PriorityNode = NewType('PriorityNode', tuple[float, int, int])
+Distances = DistanceStore
 
 class MazeException(Exception):
     def __init__(self, msg: str) -> None:
         super().__init__(msg)
 
 class Maze:
-    def __init__(self, image: pygame.surface.Surface) -> None:
+    def __init__(self, image: Optional[pygame.surface.Surface] = None, eager: bool = False, cost_model: Optional[CostModel] = None) -> None:
         super().__init__()
 
+        # Every step costs 1 by default
+        self.cost_model: CostModel = cost_model if cost_model is not None else ConstantCost()
+        self.costs: Optional[array] = None
         self.keys: dict[tuple[int, int, int], int] = dict()
-        self.map: dict[Coord, Pixel] = dict()
+        self.grid = Grid(0, 0, b'')
+        self.map: PixelMap = PixelMap(self.grid)
+        self.classification: Optional[Classification] = None
+        self.adjacency: Optional[Adjacency] = None
+        self.rooms: Optional[Rooms] = None
+        # Distance fields inside the rooms, kept between the searches
+        self.fields: Optional[RoomFields] = None
+        self._content_hash: Optional[str] = None
+        # Color -> index of its first pixel, the start and the end are looked up by every search
+        self.found_colors: dict[tuple[int, int, int], Optional[int]] = dict()
+        # Keeps the sections of a compiled file mapped, see load_compiled
+        self.mapped: Optional[mmap.mmap] = None
+        # Areas labelled by classify or set_area_at and their pixels, read by the profiler
+        self.flood_fills = 0
+        self.filled_pixels = 0
         self.width = 0
         self.height = 0
-        self.image = image
+        self._image: Optional[pygame.surface.Surface] = image
 
-        self.load_map(image)
+        # A maze without an image is filled by load_compiled
+        if image is not None:
+            self.load_map(image)
+
+        if eager:
+            self.classify()
 
     def load_map(self, image: pygame.surface.Surface) -> None:
-        self.map = dict()
+        self.load_grid(Grid.from_surface(image))
+        self._image = image
+
+    def load_grid(self, grid: Grid) -> None:
+        self.keys = dict()
+        self.grid = grid
+        self.map = PixelMap(self.grid)
+        self.classification = None
+        self.adjacency = None
+        self.rooms = None
+        self.fields = None
+        self.costs = None
+        self._content_hash = None
+        self.found_colors = dict()
+        self.mapped = None
+
+        self.width = grid.width
+        self.height = grid.height
+        # Built from the colors when the maze is drawn
+        self._image = None
+
+    @classmethod
+    def load_bmp(cls, file_name: str, region: Optional[Region] = None, eager: bool = False, cost_model: Optional[CostModel] = None) -> 'Maze':
+        '''
+        Read an uncompressed BMP from the mapped file instead of decoding it into a pygame surface
+        first. With a region only that window of the image is loaded and the coordinates of the maze
+        are relative to it.
+
+        The window is copied into the grid as a whole, the maze needs as much memory as a maze of
+        that size made from a surface.
+        '''
+        bitmap = Bitmap(file_name)
+        try:
+            _, _, width, height = region if region is not None else (0, 0, bitmap.width, bitmap.height)
+            colors = bitmap.read_region(region)
+        finally:
+            bitmap.close()
+
+        maze = cls(eager=False, cost_model=cost_model)
+        maze.load_grid(Grid(width, height, colors))
+        if eager:
+            maze.classify()
+
+        return maze
+
+    def set_colors(self, colors: dict[Coord, Color]) -> None:
+        '''
+        Repaint some pixels. Everything computed from the colors (classification, adjacency, rooms,
+        room fields, hash) is dropped and built again when it is needed.
+        '''
+        for coord in colors:
+            if coord not in self.map:
+                raise MazeException(f'Invalid map coords: {coord}')
+
+        # The colors of a loaded image or a compiled file are read-only
+        if not isinstance(self.grid.colors, bytearray):
+            self.grid.colors = bytearray(self.grid.colors)
+
+        pixels = self.grid.colors
+        for coord, color in colors.items():
+            offset = 3 * self.index(coord)
+            pixels[offset:offset + 3] = bytes(color)
+            if self._image is not None:
+                self._image.set_at(coord, color)
+
+        self.keys = dict()
+        self.grid.types = bytearray(self.grid.size)
+        self.classification = None
+        self.adjacency = None
+        self.rooms = None
+        self.fields = None
+        self.costs = None
+        self._content_hash = None
+        self.found_colors = dict()
+
+    @property
+    def image(self) -> pygame.surface.Surface:
+        # A compiled maze has only the colors, the image is built from them when it is drawn
+        if self._image is None:
+            transposed = pygame.image.frombuffer(bytes(self.grid.colors), (self.height, self.width), 'RGB')
+            self._image = pygame.transform.flip(pygame.transform.rotate(transposed, -90), True, False)
+
+        return self._image
+
+    def save_compiled(self, file_name: str) -> None:
+        '''
+        Write the classified and compiled maze to a file that load_compiled maps back without
+        decoding the image, classifying or building the adjacency again.
+        '''
+        classification = self.classify()
+        adjacency = self.compile()
+
+        header = {
+            'width': self.width,
+            'height': self.height,
+            'content_hash': self.content_hash,
+            'keys': [[list(color), position] for color, position in self.keys.items()],
+            'zones': [{**asdict(zone), 'type': int(zone.type)} for zone in classification.zones],
+            'start': self.index(self.get_start()),
+            'end': self.index(self.get_end()),
+            'costs': list(self.cost_model.table),
+            'other_cost': self.cost_model.other_cost,
+        }
+        write_compiled(file_name, header, {
+            'colors': self.grid.colors,
+            'types': self.grid.types,
+            'labels': classification.labels,
+            'offsets': adjacency.offsets,
+            'targets': adjacency.targets,
+            'weights': adjacency.weights,
+            'key_set': adjacency.key_set,
+            'key_required': adjacency.key_required,
+        })
+
+    @classmethod
+    def load_compiled(cls, file_name: str) -> 'Maze':
+        header, sections, mapped = read_compiled(file_name)
+        width, height = header['width'], header['height']
+
+        maze = cls()
+        maze.width, maze.height = width, height
+        maze.mapped = mapped
+
+        # The colors and types are copied because they are searched and written by the legacy
+        # lazy classification, the labels and the adjacency stay in the shared mapping
+        maze.grid = Grid(width, height, bytes(sections['colors']), bytearray(sections['types']))
+        maze.map = PixelMap(maze.grid)
+        maze.keys = {(color[0], color[1], color[2]): position for color, position in header['keys']}
+        maze.classification = Classification(sections['labels'], [
+            Zone(**{**zone, 'color': tuple(zone['color']), 'type': PixelType(zone['type'])}) for zone in header['zones']
+        ], height)
+        maze.adjacency = Adjacency(sections['offsets'], sections['targets'], sections['weights'], sections['key_set'], sections['key_required'])
+        maze.cost_model = LookupTableCost(header['costs'], header['other_cost'])
+        maze._content_hash = header['content_hash']
+        maze.found_colors = {START_COLOR: header['start'], END_COLOR: header['end']}
+
+        return maze
+
+    @property
+    def content_hash(self) -> str:
+        # Hash of the decoded pixels, the same maze has the same hash whatever file it was loaded from
+        if self._content_hash is None:
+            digest = hashlib.blake2b(digest_size=20)
+            digest.update(f'{self.width}x{self.height}:'.encode())
+            digest.update(self.grid.colors)
+            self._content_hash = digest.hexdigest()
+
+        return self._content_hash
+
+    @property
+    def weight_model(self) -> str:
+        # Name of the step costs in the adjacency
+        return self.cost_model.name
+
+    @property
+    def min_cost(self) -> float:
+        # The cheapest step, the distance heuristics are multiplied by it
+        return self.cost_model.min_cost
+
+    def set_cost_model(self, cost_model: CostModel) -> None:
+        # The adjacency and the rooms are built again with the new weights
+        self.cost_model = cost_model
+        self.costs = None
+        self.adjacency = None
+        self.rooms = None
+        self.fields = None
+
+    @property
+    def is_classified(self) -> bool:
+        return self.classification is not None
+
+    def classify(self) -> Classification:
+        # Label the whole image up front so the searches dont have to call set_area_at
+        if self.classification is None:
+            self.classification = classify(self.grid, START_COLOR, END_COLOR, KEY_WIDTH, KEY_HEIGHT)
+            self.flood_fills += len(self.classification.zones)
+            self.filled_pixels += sum(zone.area for zone in self.classification.zones)
+
+            # Keys get their positions in scan order instead of the order they are found by the search
+            self.keys = dict()
+            for zone in self.classification.zones:
+                if zone.type == PixelType.KEY:
+                    self.keys.setdefault(zone.color, len(self.keys))
+
+        return self.classification
+
+    def compile(self) -> Adjacency:
+        # Build the cost grid and the edge index once, the searches iterate over it instead of get_adjacent_edges
+        if self.adjacency is None:
+            self.costs = cost_grid(self.grid, self.classify(), self.cost_model)
+            self.adjacency = build_adjacency(self.grid, self.classify(), self.keys, self.costs)
+
+        return self.adjacency
+
+    def step_costs(self) -> array:
+        # The cost of stepping on every pixel, a compiled maze is loaded with the adjacency but without it
+        if self.costs is None:
+            self.costs = cost_grid(self.grid, self.classify(), self.cost_model)
+
+        return self.costs
+
+    def new_distances(self) -> DistanceStore:
+        # One slot for every pixel and combination of the keys found by compile
+        self.compile()
+        return DistanceStore(self.grid.size, len(self.keys))
+
+    def split_rooms(self) -> Rooms:
+        if self.rooms is None:
+            self.rooms = find_rooms(self.grid, self.classify(), self.compile())
+
+        return self.rooms
+
+    def room_fields(self) -> RoomFields:
+        # Filled by the searches that cross the rooms from portal to portal, dropped with the rooms
+        if self.fields is None:
+            self.fields = RoomFields(self.split_rooms(), self.compile(), self.step_costs())
+
+        return self.fields
+
+    def zone_at(self, coord: Coord) -> Optional[Zone]:
+        if coord not in self.map:
+            raise MazeException(f'Invalid map coords: {coord}')
 
-        for x in range(image.get_width()):
-            for y in range(image.get_height()):
-                r, g, b, _ = image.get_at((x,y))
-                self.map[Coord((x,y))] = Pixel((r, g, b))
+        return self.classify().zone_of(self.index(coord))
 
-        self.width = image.get_width()
-        self.height = image.get_height()
-        self.image = image
+    def index(self, coord: Coord) -> int:
+        return coord[0] * self.height + coord[1]
+
+    def coord(self, index: int) -> Coord:
+        return Coord(divmod(index, self.height))
 
     def pixel_at(self, coord: Coord) -> Pixel:
         if coord not in self.map:
@@ -59,40 +315,45 @@ class Maze:
 
         return self.map[coord]
 
+    def type_at(self, coord: Coord) -> PixelType:
+        if coord not in self.map:
+            raise MazeException(f'Invalid map coords: {coord}')
+
+        return PixelType(self.grid.types[self.index(coord)])
+
+    def find_color(self, color: tuple[int, int, int]) -> Optional[int]:
+        if color not in self.found_colors:
+            self.found_colors[color] = self.grid.find_color(color)
+
+        return self.found_colors[color]
+
     def get_start(self) -> Coord:
-        for key, value in self.map.items():
-            if value.color == START_COLOR:
-                return key
+        index = self.find_color(START_COLOR)
+        if index is None:
+            raise MazeException('No starting point')
 
-        raise MazeException('No starting point')
+        return self.coord(index)
 
     def get_end(self) -> Coord:
-        for key, value in self.map.items():
-            if value.color == END_COLOR:
-                return key
+        index = self.find_color(END_COLOR)
+        if index is None:
+            raise MazeException('No ending point')
 
-        raise MazeException('No ending point')
+        return self.coord(index)
 
     def get_adjacent_edges(self, node: Coord, key_comb: KeyCombination) -> Iterator[Edge]:
-        for adjacent_coord in self.get_adjacent_coords(node):
-            if self.pixel_at(adjacent_coord).type == PixelType.UNSET:
-                self.set_area_at(adjacent_coord)
-            
-            if self.pixel_at(adjacent_coord).type == PixelType.WALL: continue
-
-            weight: float = 1 # self.pixel_at(adjacent_coord).color[0] if self.pixel_at(adjacent_coord).is_grey() else 1
-            if adjacent_coord[0] != node[0] and adjacent_coord[1] != node[1]:
-                weight *= sqrt(2)
-
-            adjacent_key_comb = key_comb
-            if self.pixel_at(adjacent_coord).type == PixelType.KEY:
-                key_pos = self.keys.setdefault(self.pixel_at(adjacent_coord).color, len(self.keys))
-                adjacent_key_comb = key_comb.set_at(key_pos)
-            elif self.pixel_at(adjacent_coord).type == PixelType.ZONE:
-                key_pos = self.keys.get(self.pixel_at(adjacent_coord).color) # type: ignore # It gives: 'Incompatible types in assignment (expression has type 'Optional[int]', variable has type 'int')'
-                if key_pos is None or key_comb != key_comb.set_at(key_pos): continue
-
-            yield Edge((weight, adjacent_key_comb, adjacent_coord))
+        # The keys have their positions from classify, so the combinations do not depend on the order of the calls
+        adjacency = self.compile()
+        targets, weights = adjacency.targets, adjacency.weights
+        key_set, key_required = adjacency.key_set, adjacency.key_required
+
+        comb = key_comb.comb
+        index = self.index(node)
+        for edge in range(adjacency.offsets[index], adjacency.offsets[index + 1]):
+            if key_required[edge] & ~comb: continue
+
+            adjacent_key_comb = KeyCombination(comb | key_set[edge]) if key_set[edge] else key_comb
+            yield Edge((weights[edge], adjacent_key_comb, self.coord(targets[edge])))
 
     def get_adjacent_coords(self, coord: Coord) -> Iterator[Coord]:
         return (Coord((coord[0]+i, coord[1]+j)) for i in range(-1, 2) for j in range(-1, 2) 
@@ -101,58 +362,58 @@ class Maze:
                 (0 <= coord[1]+j < self.height))
 
     def set_area_at(self, coord: Coord) -> None:
-        pixel: Pixel = self.pixel_at(coord)
-
-        if pixel.color == WALL_COLOR:
-            pixel.type = PixelType.WALL
-        elif pixel.is_grey():
-            pixel.type = PixelType.FREE
+        grid = self.grid
+        types = grid.types
+        index = self.index(coord)
+        color = grid.color_at(index)
+
+        if types[index] != PixelType.UNSET:
+            return
+
+        if color == WALL_COLOR:
+            types[index] = PixelType.WALL
+        elif grid.is_grey_at(index):
+            types[index] = PixelType.FREE
         else:
-            pixel.type = PixelType.ZONE
-            if pixel.color == START_COLOR: pixel.type = PixelType.START
-            if pixel.color == END_COLOR: pixel.type = PixelType.END
-            
+            area_type = PixelType.ZONE
+            if color == START_COLOR: area_type = PixelType.START
+            if color == END_COLOR: area_type = PixelType.END
+
             max_height, min_height, max_width, min_width = coord[1], coord[1], coord[0], coord[0]
 
-            key_pixels: list[Pixel] = [pixel]
-            wave: deque[Coord] = deque([coord])
+            types[index] = area_type
+            area: list[int] = [index]
+            wave: deque[int] = deque([index])
 
             while wave:
-                curr_coord = wave.pop()
-                curr_pixel = self.pixel_at(curr_coord)
-
-                for adjacent_coord in self.get_adjacent_coords(curr_coord):
-                    adjacent_pixel = self.pixel_at(adjacent_coord)
+                curr_index = wave.pop()
 
-                    if (adjacent_pixel.color != curr_pixel.color or
-                        adjacent_pixel.type != PixelType.UNSET):
+                for adjacent_index in grid.adjacent_indices(curr_index):
+                    if (types[adjacent_index] != PixelType.UNSET or
+                        grid.color_at(adjacent_index) != color):
                         continue
 
-                    adjacent_pixel.type = curr_pixel.type
-
-                    wave.append(adjacent_coord)
-                    if max_height < adjacent_coord[1]: max_height = adjacent_coord[1]
-                    if min_height > adjacent_coord[1]: min_height = adjacent_coord[1]
-                    if max_width < adjacent_coord[0]: max_width = adjacent_coord[0]
-                    if min_width > adjacent_coord[0]: min_width = adjacent_coord[0]
-
-                    # Add elements to key_pixels while there is a chance this zone to be a key
-                    if (curr_pixel.type == PixelType.ZONE and
-                        max_height - min_height + 1 <= KEY_HEIGHT and
-                        max_width - min_width + 1 <= KEY_WIDTH and
-                        len(key_pixels) < KEY_HEIGHT * KEY_WIDTH): # length of key_pixels cant be greater with this limitations of width and height
-                        
-                        key_pixels.append(adjacent_pixel)
-                    elif len(key_pixels) != 0:
-                        key_pixels.clear()
-
-            if (pixel.type == PixelType.ZONE and
+                    types[adjacent_index] = area_type
+                    area.append(adjacent_index)
+                    wave.append(adjacent_index)
+
+                    x, y = divmod(adjacent_index, self.height)
+                    if max_height < y: max_height = y
+                    if min_height > y: min_height = y
+                    if max_width < x: max_width = x
+                    if min_width > x: min_width = x
+
+            self.flood_fills += 1
+            self.filled_pixels += len(area)
+
+            # The zone is a key only if it fills a whole KEY_WIDTH x KEY_HEIGHT square
+            if (area_type == PixelType.ZONE and
                 max_height - min_height + 1 == KEY_HEIGHT and
                 max_width - min_width + 1 == KEY_WIDTH and
-                len(key_pixels) == KEY_HEIGHT * KEY_WIDTH):
-                
-                for key_pixel in key_pixels:
-                    key_pixel.type = PixelType.KEY
+                len(area) == KEY_HEIGHT * KEY_WIDTH):
+
+                for key_index in area:
+                    types[key_index] = PixelType.KEY
 
     def draw_node(self, screen: pygame.surface.Surface, coord: Coord, color: Optional[tuple[int, int, int]] = None) -> None:
         if not color: color = self.pixel_at(coord).color
@@ -160,56 +421,44 @@ class Maze:
         screen.set_at(tuple(coord), color)
         pygame.display.update(pygame.Rect(coord[0], coord[1], 1, 1))
 
+    def draw_nodes(self, screen: pygame.surface.Surface, coords: list[Coord], color: tuple[int, int, int]) -> None:
+        # Many nodes with a single display update of the rectangle around them
+        if not coords: return
+
+        for coord in coords:
+            screen.set_at(tuple(coord), color)
+
+        xs = [coord[0] for coord in coords]
+        ys = [coord[1] for coord in coords]
+        pygame.display.update(pygame.Rect(min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1))
+
     def draw_path(self, screen: pygame.surface.Surface, path: list[Coord]) -> None:
         screen.blit(self.image, (0,0))
         pygame.display.update()
-        for node in path:
-            self.draw_node(screen, node, PATH_COLOR)
+        self.draw_nodes(screen, path, PATH_COLOR)
 
     def get_path(self, distances: Distances, end_node: Optional[Coord] = None) -> list[Coord]:
         # start_node: Coord = self.get_start()
         if end_node is None: end_node = self.get_end()
+        end_index = self.index(end_node)
 
-        if end_node not in distances:
+        end_combinations = list(distances.combinations(end_index))
+        if not end_combinations:
             raise MazeException('Missing end_node in distances')
 
-        path = []
+        types = self.grid.types
+        key_bits = distances.key_bits
+        comb_mask = (1 << key_bits) - 1
 
-        curr_node = end_node
-        key_comb, min_dist = min(distances[end_node].items(), key=lambda comb_dist: comb_dist[1])
-
-        while self.pixel_at(curr_node).type != PixelType.START or key_comb != START_KEY_COMB:
-            next_node = curr_node
-            
-            # Get all neighbors and use only those that appear in distances
-            # to find the one that is closer to the start
-            for adjacent_coord in self.get_adjacent_coords(curr_node):
-                adjacent_node = Coord(adjacent_coord)
-                if adjacent_node not in distances or \
-                    key_comb not in distances[adjacent_node]: continue
-
-                if distances[adjacent_node][key_comb] < min_dist:
-                    next_node = adjacent_node
-                    min_dist = distances[adjacent_node][key_comb]
-            
-            # If we are still at the current node and its a key then
-            # remove the key from key_comb and continue the loop with the same
-            # node to check if it has neighbors with the new key_comb
-            # If we came back to this key (key_comb bit for this key is unset) or
-            # the node is not key then it dont have neighbors with shorter distance to the start
-            # and raise and exception
-            if next_node == curr_node:
-                color = self.pixel_at(next_node).color
-                if self.pixel_at(next_node).type == PixelType.KEY and \
-                    key_comb.is_set_at(self.keys[color]):
-                    
-                    key_comb = key_comb.unset_at(self.keys[color])
-                else:
-                    raise MazeException('There is no path but end node is reachable')
-            
-            else:
-                path.append(next_node)
-                curr_node = next_node
+        # Follow the parents from the end with the shortest distance back to the start area,
+        # the end itself is not a part of the path
+        key_comb, _ = min(end_combinations, key=lambda comb_dist: comb_dist[1])
+        path = []
+        for slot in itertools.islice(distances.path_to(end_index, key_comb), 1, None):
+            index = slot >> key_bits
+            path.append(self.coord(index))
+            if types[index] == PixelType.START and slot & comb_mask == START_KEY_COMB.comb:
+                break
 
         return path[::-1]
 
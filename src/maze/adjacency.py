@@ -0,0 +1,111 @@
+from array import array
+from dataclasses import dataclass
+from itertools import accumulate, compress
+from typing import Optional
+
+from src.maze.classify import Classification
+from src.maze.grid import Color, Grid
+from src.maze.pixel import PixelType
+
+# Key masks are stored in unsigned 64 bit arrays
+MAX_KEYS = 64
+
+PASSABLE = bytes(1 if pixel_type not in (PixelType.UNSET, PixelType.WALL) else 0 for pixel_type in range(256))
+
+class AdjacencyException(Exception):
+    def __init__(self, msg: str) -> None:
+        super().__init__(msg)
+
+@dataclass
+class Adjacency:
+    '''
+    Compressed sparse row form of the pixel graph.
+
+    The edges leaving pixel i are offsets[i] .. offsets[i + 1] - 1. For every edge e:
+    - targets[e] is the pixel index the edge leads to
+    - weights[e] is the cost of the step
+    - key_set[e] is the key bit mask collected by stepping on the target
+    - key_required[e] is the key bit mask needed to step on the target
+    '''
+    offsets: array
+    targets: array
+    weights: array
+    key_set: array
+    key_required: array
+
+    def edges(self, index: int) -> range:
+        return range(self.offsets[index], self.offsets[index + 1])
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+def node_masks(grid: Grid, classification: Classification, keys: dict[Color, int]) -> tuple[bytearray, array, array]:
+    '''
+    Per pixel passable flags and the key masks gained and required by stepping on it.
+    Doors without a key anywhere are not passable.
+    '''
+    n = grid.size
+    gained = array('Q', bytes(8 * n))
+    required = array('Q', bytes(8 * n))
+    passable = bytearray(grid.types.translate(PASSABLE))
+
+    for zone in classification.zones:
+        if zone.type not in (PixelType.KEY, PixelType.ZONE): continue
+
+        key_pos = keys.get(zone.color)
+        for index in classification.pixels_of(zone):
+            if key_pos is None:
+                passable[index] = 0
+            elif zone.type == PixelType.KEY:
+                gained[index] = 1 << key_pos
+            else:
+                required[index] = 1 << key_pos
+
+    return passable, gained, required
+
+def build_adjacency(grid: Grid, classification: Classification, keys: dict[Color, int], costs: Optional[array] = None) -> Adjacency:
+    if len(keys) > MAX_KEYS:
+        raise AdjacencyException(f'Too many key colors: {len(keys)} (at most {MAX_KEYS} are supported)')
+
+    n = grid.size
+    height = grid.height
+
+    # Key masks for stepping on each pixel
+    passable, gained, required = node_masks(grid, classification, keys)
+
+    # Every pixel has four edge slots in the same order as Maze.get_adjacent_coords:
+    # (x - 1, y), (x, y - 1), (x, y + 1), (x + 1, y). Each direction is masked as a whole
+    # and the slots without an edge are dropped at the end
+    not_first_row = int.from_bytes((b'\x00' + b'\x01' * (height - 1)) * grid.width, 'big')
+    not_last_row = int.from_bytes((b'\x01' * (height - 1) + b'\x00') * grid.width, 'big')
+    sources = int.from_bytes(passable, 'big')
+    directions = [
+        (-height, int.from_bytes(bytes(height) + passable[:n - height], 'big')),
+        (-1, int.from_bytes(b'\x00' + passable[:n - 1], 'big') & not_first_row),
+        (1, int.from_bytes(passable[1:] + b'\x00', 'big') & not_last_row),
+        (height, int.from_bytes(passable[height:] + bytes(height), 'big')),
+    ]
+
+    slot_targets = array('q', bytes(8 * 4 * n))
+    slot_mask = bytearray(4 * n)
+    degrees = 0
+    for slot, (delta, targets_mask) in enumerate(directions):
+        mask = sources & targets_mask
+        degrees += mask
+
+        slot_targets[slot::4] = array('q', range(delta, n + delta))
+        slot_mask[slot::4] = mask.to_bytes(n, 'big')
+
+    # The degree of a pixel is at most 4 so the sum above never carries between bytes
+    offsets = array('Q', accumulate(degrees.to_bytes(n, 'big'), initial=0))
+    targets = array('I', compress(slot_targets, slot_mask))
+    # A step costs as much as the pixel it leads to, 1 without a cost grid
+    weights = array('d', map(costs.__getitem__, targets)) if costs is not None else array('d', [1.0]) * len(targets)
+    key_set = array('Q', map(gained.__getitem__, targets))
+    key_required = array('Q', map(required.__getitem__, targets))
+
+    return Adjacency(offsets, targets, weights, key_set, key_required)
+
+
+
+__all__ = ['MAX_KEYS', 'AdjacencyException', 'Adjacency', 'node_masks', 'build_adjacency']
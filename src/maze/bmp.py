@@ -0,0 +1,96 @@
+import mmap
+import struct
+from typing import Optional
+
+# BITMAPFILEHEADER and the start of every BITMAPINFOHEADER version
+FILE_HEADER = struct.Struct('<2sIHHI')
+INFO_HEADER = struct.Struct('<IiiHHI')
+BI_RGB = 0
+BI_BITFIELDS = 3
+# The red, green and blue masks that follow the 40 byte BITMAPINFOHEADER (or are a part of the
+# later versions) and the only ones that are read as BGR(A)
+CHANNEL_MASKS = struct.Struct('<III')
+BGR_MASKS = (0x00ff0000, 0x0000ff00, 0x000000ff)
+
+# (x, y, width, height) of a part of the image
+Region = tuple[int, int, int, int]
+
+class BmpException(Exception):
+    def __init__(self, msg: str) -> None:
+        super().__init__(msg)
+
+class Bitmap:
+    '''
+    Uncompressed 24 or 32 bit BMP file mapped read-only.
+
+    The pixel rows are read straight from the mapping into column-major RGB buffers (the layout
+    of Grid.colors), without decoding the whole image first.
+    '''
+
+    def __init__(self, file_name: str) -> None:
+        with open(file_name, 'rb') as bmp_file:
+            self.mapped = mmap.mmap(bmp_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Nothing keeps the mapping of a file that is not read
+        try:
+            self.read_header(file_name)
+        except Exception:
+            self.mapped.close()
+            raise
+
+    def read_header(self, file_name: str) -> None:
+        if len(self.mapped) < FILE_HEADER.size + INFO_HEADER.size:
+            raise BmpException(f'{file_name} is not a BMP file')
+
+        magic, _, _, _, self.data_offset = FILE_HEADER.unpack_from(self.mapped)
+        _, width, height, _, bits, compression = INFO_HEADER.unpack_from(self.mapped, FILE_HEADER.size)
+        if magic != b'BM':
+            raise BmpException(f'{file_name} is not a BMP file')
+        if bits not in (24, 32) or compression not in (BI_RGB, BI_BITFIELDS):
+            raise BmpException(f'{file_name} has {bits} bit pixels (compression {compression}), only uncompressed 24 and 32 bit BMPs are supported')
+        if compression == BI_BITFIELDS:
+            masks = CHANNEL_MASKS.unpack_from(self.mapped, FILE_HEADER.size + 40) if len(self.mapped) >= FILE_HEADER.size + 40 + CHANNEL_MASKS.size else None
+            if bits != 32 or masks != BGR_MASKS:
+                raise BmpException(f'{file_name} has {bits} bit pixels with the channel masks {masks}, only 32 bit BGR(A) masks are supported')
+
+        self.width = width
+        # A negative height means the rows are stored from the top
+        self.top_down = height < 0
+        self.height = abs(height)
+        self.pixel_size = bits // 8
+        # Every row is padded to 4 bytes
+        self.stride = (self.width * self.pixel_size + 3) // 4 * 4
+
+        if len(self.mapped) < self.data_offset + self.stride * self.height:
+            raise BmpException(f'{file_name} is truncated')
+
+    def row_offset(self, y: int) -> int:
+        row = y if self.top_down else self.height - 1 - y
+        return self.data_offset + row * self.stride
+
+    def read_region(self, region: Optional[Region] = None) -> bytearray:
+        '''
+        The colors of the region (the whole image by default) as column-major RGB.
+        '''
+        x, y, width, height = region if region is not None else (0, 0, self.width, self.height)
+        if width <= 0 or height <= 0 or x < 0 or y < 0 or x + width > self.width or y + height > self.height:
+            raise BmpException(f'Region {(x, y, width, height)} is not inside the {self.width}x{self.height} image')
+
+        pixel_size = self.pixel_size
+        colors = bytearray(3 * width * height)
+        for row in range(height):
+            start = self.row_offset(y + row) + x * pixel_size
+            pixels = self.mapped[start:start + width * pixel_size]
+
+            # The pixels are stored as BGR(A), every channel of the row is copied with one strided slice
+            for channel, source in ((0, 2), (1, 1), (2, 0)):
+                colors[3 * row + channel::3 * height] = pixels[source::pixel_size]
+
+        return colors
+
+    def close(self) -> None:
+        self.mapped.close()
+
+
+
+__all__ = ['Region', 'BmpException', 'Bitmap']
@@ -0,0 +1,140 @@
+from array import array
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from src.maze.grid import Color, Grid
+from src.maze.pixel import PixelType
+
+# Lookup tables for bytes.translate
+# - grey pixels are walls when they are black and free otherwise
+# - any non zero byte marks a pixel that is not grey
+GREY_TYPES = bytes([PixelType.WALL]) + bytes([PixelType.FREE]) * 255
+NON_ZERO = bytes([0]) + bytes([1]) * 255
+
+@dataclass(frozen=True)
+class Zone:
+    id: int
+    color: Color
+    type: PixelType
+    min_x: int
+    min_y: int
+    max_x: int
+    max_y: int
+    area: int
+
+    @property
+    def width(self) -> int:
+        return self.max_x - self.min_x + 1
+
+    @property
+    def height(self) -> int:
+        return self.max_y - self.min_y + 1
+
+@dataclass
+class Classification:
+    # Zone id for every pixel (0 for walls and free pixels)
+    labels: array
+    # zones[id - 1] is the zone with that id
+    zones: list[Zone]
+    height: int
+
+    def zone_of(self, index: int) -> Optional[Zone]:
+        label = self.labels[index]
+        return self.zones[label - 1] if label else None
+
+    def pixels_of(self, zone: Zone) -> Iterator[int]:
+        labels = self.labels
+        for x in range(zone.min_x, zone.max_x + 1):
+            for index in range(x * self.height + zone.min_y, x * self.height + zone.max_y + 1):
+                if labels[index] == zone.id:
+                    yield index
+
+def classify(grid: Grid, start_color: Color, end_color: Color, key_width: int, key_height: int) -> Classification:
+    '''
+    Label every pixel of the grid in one pass.
+
+    The wall/free split of the grey pixels is done on whole channel buffers at once,
+    after that only the coloured pixels are visited one by one and grouped into
+    4-connected zones of the same color.
+    '''
+    n = grid.size
+    colors = grid.colors
+    types = grid.types
+
+    red = int.from_bytes(colors[0::3], 'big')
+    green = int.from_bytes(colors[1::3], 'big')
+    blue = int.from_bytes(colors[2::3], 'big')
+
+    types[:] = (red | green | blue).to_bytes(n, 'big').translate(GREY_TYPES)
+    coloured = ((red ^ green) | (red ^ blue)).to_bytes(n, 'big').translate(NON_ZERO)
+    del red, green, blue
+
+    labels = array('I', bytes(4 * n))
+    zones: list[Zone] = []
+    height = grid.height
+
+    index = coloured.find(1)
+    while index != -1:
+        if not labels[index]:
+            zones.append(_fill_zone(grid, labels, index, len(zones) + 1, start_color, end_color, key_width, key_height))
+
+        index = coloured.find(1, index + 1)
+
+    classification = Classification(labels, zones, height)
+
+    # Only the zones that are not ZONE have to be retyped, the fill marks everything as ZONE
+    for zone in zones:
+        if zone.type == PixelType.ZONE: continue
+        for index in classification.pixels_of(zone):
+            types[index] = zone.type
+
+    return classification
+
+def _fill_zone(grid: Grid, labels: array, index: int, zone_id: int, start_color: Color, end_color: Color, key_width: int, key_height: int) -> Zone:
+    colors = grid.colors
+    types = grid.types
+    height = grid.height
+    pattern = colors[3 * index:3 * index + 3]
+    color = grid.color_at(index)
+
+    min_x, min_y = max_x, max_y = divmod(index, height)
+    area = 1
+
+    labels[index] = zone_id
+    types[index] = PixelType.ZONE
+    wave = [index]
+
+    while wave:
+        curr_index = wave.pop()
+
+        for adjacent_index in grid.adjacent_indices(curr_index):
+            if labels[adjacent_index] or colors[3 * adjacent_index:3 * adjacent_index + 3] != pattern:
+                continue
+
+            labels[adjacent_index] = zone_id
+            types[adjacent_index] = PixelType.ZONE
+            wave.append(adjacent_index)
+            area += 1
+
+            x, y = divmod(adjacent_index, height)
+            if max_y < y: max_y = y
+            if min_y > y: min_y = y
+            if max_x < x: max_x = x
+            if min_x > x: min_x = x
+
+    zone_type = PixelType.ZONE
+    if color == start_color:
+        zone_type = PixelType.START
+    elif color == end_color:
+        zone_type = PixelType.END
+    elif (max_x - min_x + 1 == key_width and
+        max_y - min_y + 1 == key_height and
+        area == key_width * key_height):
+        # The zone is a key only if it fills a whole key_width x key_height square
+        zone_type = PixelType.KEY
+
+    return Zone(zone_id, color, zone_type, min_x, min_y, max_x, max_y, area)
+
+
+
+__all__ = ['Zone', 'Classification', 'classify']
@@ -0,0 +1,80 @@
+import json
+import mmap
+import struct
+import sys
+from typing import Any, Union
+from array import array
+
+# File layout:
+#   MAGIC, uint32 version, uint32 header length, json header, data sections
+# The sections start at ALIGNMENT bytes and are in the native byte order of the machine that wrote them
+EXTENSION = '.mazec'
+MAGIC = b'MAZEC\x00\x00\x00'
+VERSION = 1
+ALIGNMENT = 8
+PREFIX = struct.Struct('<8sII')
+
+Section = Union[array, bytes, bytearray, memoryview]
+
+class CompiledException(Exception):
+    def __init__(self, msg: str) -> None:
+        super().__init__(msg)
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def write_compiled(file_name: str, header: dict[str, Any], sections: dict[str, Section]) -> None:
+    # Section offsets are relative to the start of the data so they dont depend on the header length
+    table = dict()
+    offset = 0
+    for name, section in sections.items():
+        view = memoryview(section)
+        table[name] = [offset, view.nbytes, view.format]
+        offset = _aligned(offset + view.nbytes)
+
+    header_bytes = json.dumps({**header, 'byteorder': sys.byteorder, 'sections': table}).encode()
+    data_start = _aligned(PREFIX.size + len(header_bytes))
+
+    with open(file_name, 'wb') as output:
+        output.write(PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+        output.write(header_bytes)
+        output.write(bytes(data_start - PREFIX.size - len(header_bytes)))
+
+        written = 0
+        for name, section in sections.items():
+            section_offset, size, _ = table[name]
+            output.write(bytes(section_offset - written))
+            output.write(memoryview(section).cast('B'))
+            written = section_offset + size
+
+def read_compiled(file_name: str) -> tuple[dict[str, Any], dict[str, memoryview], mmap.mmap]:
+    '''
+    Map a compiled file read-only. The sections are memoryviews of the mapping, so processes
+    that read the same file share its pages and nothing is copied until it is used.
+    '''
+    with open(file_name, 'rb') as compiled_file:
+        mapped = mmap.mmap(compiled_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapped) < PREFIX.size:
+        raise CompiledException(f'{file_name} is not a compiled maze')
+
+    magic, version, header_length = PREFIX.unpack_from(mapped)
+    if magic != MAGIC:
+        raise CompiledException(f'{file_name} is not a compiled maze')
+    if version != VERSION:
+        raise CompiledException(f'{file_name} has version {version} but version {VERSION} is expected, compile the maze again')
+
+    header = json.loads(mapped[PREFIX.size:PREFIX.size + header_length])
+    if header['byteorder'] != sys.byteorder:
+        raise CompiledException(f'{file_name} was written on a {header["byteorder"]} endian machine')
+
+    data_start = _aligned(PREFIX.size + header_length)
+    view = memoryview(mapped)
+    sections = {name: view[data_start + offset:data_start + offset + size].cast(typecode)
+        for name, (offset, size, typecode) in header['sections'].items()}
+
+    return header, sections, mapped
+
+
+
+__all__ = ['EXTENSION', 'VERSION', 'CompiledException', 'write_compiled', 'read_compiled']
@@ -0,0 +1,108 @@
+import hashlib
+from abc import ABC, abstractmethod
+from array import array
+from functools import cached_property
+from typing import Optional, Sequence
+
+from src.maze.classify import Classification
+from src.maze.grid import Grid
+from src.maze.pixel import PixelType
+
+# Grey level 0 is a wall and has no cost
+LEVELS = 256
+
+class CostException(Exception):
+    def __init__(self, msg: str) -> None:
+        super().__init__(msg)
+
+class CostModel(ABC):
+    '''
+    Cost of stepping on a pixel. Grey (FREE) pixels cost level_cost(level) of their grey level,
+    every other passable pixel (start, end, keys and doors) costs other_cost.
+    The model is evaluated once into a table of LEVELS costs.
+    '''
+    other_cost: float = 1.0
+
+    @abstractmethod
+    def level_cost(self, level: int) -> float:
+        pass
+
+    @cached_property
+    def table(self) -> array:
+        table = array('d', [0.0] + [self.level_cost(level) for level in range(1, LEVELS)])
+        if min(table[1:]) <= 0 or self.other_cost <= 0:
+            raise CostException(f'{type(self).__name__} has steps that do not cost anything')
+
+        return table
+
+    @property
+    def min_cost(self) -> float:
+        # The heuristics are scaled by it so they never overestimate
+        return min(min(self.table[1:]), self.other_cost)
+
+    @property
+    def uniform_cost(self) -> Optional[float]:
+        # The cost of every step when all of them cost the same
+        costs = set(self.table[1:]) | {self.other_cost}
+        return costs.pop() if len(costs) == 1 else None
+
+    @property
+    def name(self) -> str:
+        # Models with the same costs have the same name so the solutions of one are valid for the other
+        if self.uniform_cost == 1:
+            return 'unit'
+
+        digest = hashlib.blake2b(self.table.tobytes() + array('d', [self.other_cost]).tobytes(), digest_size=8)
+        return f'table:{digest.hexdigest()}'
+
+class ConstantCost(CostModel):
+    def __init__(self, cost: float = 1.0) -> None:
+        self.cost = cost
+        self.other_cost = cost
+
+    def level_cost(self, level: int) -> float:
+        return self.cost
+
+class LinearGreyCost(CostModel):
+    '''
+    offset + scale * level, with the defaults the cost is the grey level itself (brighter is more expensive).
+    '''
+    def __init__(self, scale: float = 1.0, offset: float = 0.0, other_cost: float = 1.0) -> None:
+        self.scale = scale
+        self.offset = offset
+        self.other_cost = other_cost
+
+    def level_cost(self, level: int) -> float:
+        return self.offset + self.scale * level
+
+class LookupTableCost(CostModel):
+    def __init__(self, costs: Sequence[float], other_cost: float = 1.0) -> None:
+        if len(costs) != LEVELS:
+            raise CostException(f'Expected {LEVELS} costs, got {len(costs)}')
+
+        self.costs = list(costs)
+        self.other_cost = other_cost
+
+    def level_cost(self, level: int) -> float:
+        return self.costs[level]
+
+COST_MODELS: dict[str, type[CostModel]] = {'unit': ConstantCost, 'linear': LinearGreyCost}
+
+def cost_grid(grid: Grid, classification: Classification, model: CostModel) -> array:
+    '''
+    Cost of stepping on every pixel, computed once from the red channel (grey pixels have equal channels).
+    '''
+    costs = array('d', map(model.table.__getitem__, grid.colors[0::3]))
+
+    other_cost = model.other_cost
+    for zone in classification.zones:
+        if zone.type == PixelType.FREE: continue
+
+        for index in classification.pixels_of(zone):
+            costs[index] = other_cost
+
+    return costs
+
+
+
+__all__ = ['LEVELS', 'CostException', 'CostModel', 'ConstantCost', 'LinearGreyCost', 'LookupTableCost', 'COST_MODELS', 'cost_grid']
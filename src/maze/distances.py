@@ -0,0 +1,88 @@
+from array import array
+from math import inf
+from typing import Iterator, Optional, Union
+
+# Most distance slots kept in one flat array, 64 MB of floats
+DENSE_LIMIT = 1 << 23
+
+class SparseSlots(dict):
+    '''
+    Slot -> value map with the same interface as the dense arrays, the missing slots have a default value.
+    '''
+    def __init__(self, default: float) -> None:
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, slot: int) -> float:
+        return self.default
+
+class DistanceStore:
+    '''
+    Distances of (pixel index, key combination) states.
+
+    Every state has a slot index << key_bits | comb. When all the slots fit in DENSE_LIMIT
+    they are kept in one flat float array, otherwise only the reached ones are kept in a dict.
+    The engines read and write values[slot] directly, both forms return inf for unreached states.
+
+    parents[slot] is the slot the state was last relaxed from (-1 for the start), so the
+    path is read back by following it instead of comparing the distances of the neighbors.
+    '''
+
+    def __init__(self, size: int, key_bits: int, dense_limit: Optional[int] = None) -> None:
+        self.size = size
+        self.key_bits = key_bits
+        self.dense = size << key_bits <= (DENSE_LIMIT if dense_limit is None else dense_limit)
+
+        self.values: Union[array, SparseSlots]
+        self.parents: Union[array, SparseSlots]
+        if self.dense:
+            self.values = array('d', [inf]) * (size << key_bits)
+            self.parents = array('q', [-1]) * (size << key_bits)
+        else:
+            self.values = SparseSlots(inf)
+            self.parents = SparseSlots(-1)
+
+    def slot(self, index: int, comb: int) -> int:
+        return index << self.key_bits | comb
+
+    def get(self, index: int, comb: int) -> float:
+        return self.values[index << self.key_bits | comb]
+
+    def set(self, index: int, comb: int, distance: float, parent: int = -1) -> None:
+        slot = index << self.key_bits | comb
+        self.values[slot] = distance
+        self.parents[slot] = parent
+
+    def path_to(self, index: int, comb: int) -> Iterator[int]:
+        # The slots from (index, comb) back to the start
+        slot = index << self.key_bits | comb
+        while slot != -1:
+            yield slot
+            slot = int(self.parents[slot])
+
+    def __contains__(self, state: tuple[int, int]) -> bool:
+        return self.get(*state) != inf
+
+    def combinations(self, index: int) -> Iterator[tuple[int, float]]:
+        # The reached key combinations of one pixel and their distances
+        key_bits = self.key_bits
+        if self.dense:
+            first = index << key_bits
+            for comb, distance in enumerate(self.values[first:first + (1 << key_bits)]):
+                if distance != inf:
+                    yield comb, distance
+        else:
+            mask = (1 << key_bits) - 1
+            for slot, distance in self.values.items():
+                if slot >> key_bits == index:
+                    yield slot & mask, distance
+
+    def __len__(self) -> int:
+        # Number of reached states
+        if self.dense:
+            return len(self.values) - self.values.count(inf) # type: ignore # values is an array
+        return len(self.values)
+
+
+
+__all__ = ['DENSE_LIMIT', 'SparseSlots', 'DistanceStore']
@@ -0,0 +1,112 @@
+from random import Random
+import pygame
+
+from src.maze import END_COLOR, KEY_HEIGHT, KEY_WIDTH, START_COLOR, WALL_COLOR
+
+GREY_DISTRIBUTIONS = ['flat', 'uniform', 'gradient']
+# Every key in the strip before its door or all of them in the first strip (picked up in any order)
+KEY_LAYOUTS = ['ordered', 'any']
+
+# Space needed in a strip for a key and the gaps around it
+STRIP_MIN_WIDTH = KEY_WIDTH + 10
+
+class GeneratorException(Exception):
+    def __init__(self, msg: str) -> None:
+        super().__init__(msg)
+
+def max_keys(side: int) -> int:
+    return max(0, (side - 2) // STRIP_MIN_WIDTH - 1)
+
+def door_color(number: int) -> tuple[int, int, int]:
+    # Saturated colors with different hues are never grey and never match the start or the end
+    color = pygame.Color(0, 0, 0)
+    color.hsva = ((number * 137.5) % 360, 100, 100 - 10 * (number // 12 % 5), 100)
+    return color.r, color.g, color.b
+
+def grey_levels(side: int, distribution: str, rng: Random) -> bytes:
+    if distribution == 'flat':
+        return b'\xff' * side * side
+    if distribution == 'uniform':
+        # Levels from 128 to 255, 0 would be a wall
+        return rng.randbytes(side * side).translate(bytes(128 + i // 2 for i in range(256)))
+    if distribution == 'gradient':
+        row = bytes(255 - (127 * x) // max(side - 1, 1) for x in range(side))
+        return row * side
+
+    raise GeneratorException(f'Unknown grey distribution: {distribution} (choose from {", ".join(GREY_DISTRIBUTIONS)})')
+
+def generate_maze(side: int, wall_density: float = 0.2, keys: int = 0, grey: str = 'flat', seed: int = 0, key_layout: str = 'ordered') -> pygame.surface.Surface:
+    '''
+    Generate a square maze that always has a path from the start to the end.
+
+    The inside is split into keys + 1 vertical strips by doors, the key for every door is
+    placed in the strip before it ('ordered') or all the keys are in the first strip, one above
+    the other ('any'). Random wall blocks cover about wall_density of the area and a random
+    corridor from the start to the end, through all the keys, is cleared after them.
+    '''
+    if side < 8:
+        raise GeneratorException('The maze side has to be at least 8 pixels')
+    if not 0 <= wall_density < 1:
+        raise GeneratorException('The wall density has to be in [0, 1)')
+    if keys > max_keys(side):
+        raise GeneratorException(f'A {side}x{side} maze is too small for {keys} keys')
+    if key_layout not in KEY_LAYOUTS:
+        raise GeneratorException(f'Unknown key layout: {key_layout} (choose from {", ".join(KEY_LAYOUTS)})')
+
+    rng = Random(seed)
+
+    levels = grey_levels(side, grey, rng)
+    colors = bytearray(3 * side * side)
+    colors[0::3] = colors[1::3] = colors[2::3] = levels
+    surface = pygame.image.frombuffer(bytes(colors), (side, side), 'RGB').copy()
+    background = surface.copy()
+
+    # Random wall blocks
+    block = max(2, side // 32)
+    for _ in range(int(wall_density * side * side / (block * block))):
+        x, y = rng.randrange(1, side - 1), rng.randrange(1, side - 1)
+        surface.fill(WALL_COLOR, pygame.Rect(x, y, block, block))
+
+    # Door x positions and the points the corridor has to go through
+    strip_width = (side - 2) // (keys + 1)
+    doors = [1 + (i + 1) * strip_width for i in range(keys)]
+    key_rects = []
+    waypoints = [(2, rng.randrange(2, side - 3))]
+    for i in range(keys):
+        if key_layout == 'ordered':
+            strip_start = 1 if i == 0 else doors[i - 1] + 2
+            x = rng.randrange(strip_start + 3, doors[i] - KEY_WIDTH - 2)
+            y = rng.randrange(2, side - KEY_HEIGHT - 2)
+        else:
+            # A band of the first strip for every key
+            band = (side - 4) // keys
+            x = rng.randrange(4, doors[0] - KEY_WIDTH - 2)
+            y = rng.randrange(2 + i * band, 2 + (i + 1) * band - KEY_HEIGHT)
+        key_rects.append(pygame.Rect(x, y, KEY_WIDTH, KEY_HEIGHT))
+        waypoints.append((x + KEY_WIDTH // 2, y + KEY_HEIGHT // 2))
+    waypoints.append((side - 4, rng.randrange(2, side - 3)))
+
+    # Clear a corridor visiting the waypoints in order with random horizontal and vertical steps
+    for (x, y), (to_x, to_y) in zip(waypoints, waypoints[1:]):
+        while (x, y) != (to_x, to_y):
+            surface.blit(background, (x, y), pygame.Rect(x, y, 2, 2))
+            if x != to_x and (y == to_y or rng.random() < 0.5):
+                x += 1 if to_x > x else -1
+            else:
+                y += 1 if to_y > y else -1
+        surface.blit(background, (x, y), pygame.Rect(x, y, 2, 2))
+
+    for i, x in enumerate(doors):
+        surface.fill(door_color(i), pygame.Rect(x, 1, 2, side - 2))
+    for i, rect in enumerate(key_rects):
+        surface.fill(door_color(i), rect)
+
+    surface.fill(START_COLOR, pygame.Rect(waypoints[0], (2, 2)))
+    surface.fill(END_COLOR, pygame.Rect(waypoints[-1], (2, 2)))
+    pygame.draw.rect(surface, WALL_COLOR, pygame.Rect(0, 0, side, side), 1)
+
+    return surface
+
+
+
+__all__ = ['GREY_DISTRIBUTIONS', 'KEY_LAYOUTS', 'GeneratorException', 'max_keys', 'door_color', 'generate_maze']
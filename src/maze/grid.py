@@ -0,0 +1,121 @@
+from collections.abc import Mapping
+from typing import Iterator, Optional
+import pygame
+
+from src.maze.pixel import Pixel, PixelType
+
+Color = tuple[int, int, int]
+
+class GridException(Exception):
+    def __init__(self, msg: str) -> None:
+        super().__init__(msg)
+
+class Grid:
+    '''
+    Compact storage of the maze pixels.
+
+    The colors are kept in one contiguous RGB buffer and the pixel types in a
+    parallel uint8 buffer. Both are column-major (index = x * height + y) so
+    iterating over the indices visits the pixels in the same order as the old
+    dict-backed map did (x first, then y).
+    '''
+
+    def __init__(self, width: int, height: int, colors: bytes, types: Optional[bytearray] = None) -> None:
+        if len(colors) != 3 * width * height:
+            raise GridException(f'Expected {3 * width * height} bytes of colors, got {len(colors)}')
+
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.colors = colors
+        self.types = types if types is not None else bytearray(self.size)
+
+    @classmethod
+    def from_surface(cls, image: pygame.surface.Surface) -> 'Grid':
+        # Transpose the image so that tostring returns the pixels column by column
+        transposed = pygame.transform.flip(pygame.transform.rotate(image, -90), True, False)
+        colors = pygame.image.tostring(transposed, 'RGB')
+
+        return cls(image.get_width(), image.get_height(), colors)
+
+    def index(self, coord: tuple[int, int]) -> int:
+        return coord[0] * self.height + coord[1]
+
+    def coord(self, index: int) -> tuple[int, int]:
+        return divmod(index, self.height)
+
+    def in_bounds(self, coord: tuple[int, int]) -> bool:
+        return 0 <= coord[0] < self.width and 0 <= coord[1] < self.height
+
+    def color_at(self, index: int) -> Color:
+        colors = self.colors
+        offset = 3 * index
+        return colors[offset], colors[offset + 1], colors[offset + 2]
+
+    def is_grey_at(self, index: int) -> bool:
+        colors = self.colors
+        offset = 3 * index
+        return colors[offset] == colors[offset + 1] == colors[offset + 2]
+
+    def find_color(self, color: Color) -> Optional[int]:
+        pattern = bytes(color)
+        offset = self.colors.find(pattern)
+
+        # Skip the matches that are not aligned to a pixel
+        while offset != -1 and offset % 3 != 0:
+            offset = self.colors.find(pattern, offset + 1)
+
+        return None if offset == -1 else offset // 3
+
+    def adjacent_indices(self, index: int) -> Iterator[int]:
+        x, y = divmod(index, self.height)
+
+        if x > 0: yield index - self.height
+        if y > 0: yield index - 1
+        if y < self.height - 1: yield index + 1
+        if x < self.width - 1: yield index + self.height
+
+class GridPixel(Pixel):
+    '''
+    Pixel view over a single cell of a Grid. Changing its type writes through to the grid.
+    '''
+
+    def __init__(self, grid: Grid, index: int) -> None:
+        self.grid = grid
+        self.index = index
+        self.color = grid.color_at(index)
+
+    @property # type: ignore # Pixel.type is a plain attribute, here it is backed by the grid
+    def type(self) -> PixelType:
+        return PixelType(self.grid.types[self.index])
+
+    @type.setter
+    def type(self, pixel_type: PixelType) -> None:
+        self.grid.types[self.index] = pixel_type
+
+class PixelMap(Mapping):
+    '''
+    Read-only dict[Coord, Pixel] compatible view of a Grid.
+    '''
+
+    def __init__(self, grid: Grid) -> None:
+        self.grid = grid
+
+    def __getitem__(self, coord: tuple[int, int]) -> Pixel:
+        if not isinstance(coord, tuple) or len(coord) != 2 or not self.grid.in_bounds(coord):
+            raise KeyError(coord)
+
+        return GridPixel(self.grid, self.grid.index(coord))
+
+    def __contains__(self, coord: object) -> bool:
+        return isinstance(coord, tuple) and len(coord) == 2 and self.grid.in_bounds(coord) # type: ignore # the tuple has exactly two items
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return (self.grid.coord(index) for index in range(self.grid.size))
+
+    def __len__(self) -> int:
+        return self.grid.size
+
+
+
+__all__ = ['Color', 'GridException', 'Grid', 'GridPixel', 'PixelMap']
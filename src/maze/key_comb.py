@@ -1,21 +1,40 @@
 from dataclasses import dataclass
 
+# Number of keys in every combination of 8 keys
+POPCOUNT = bytes(bin(comb).count('1') for comb in range(256))
+
 class KeyCombinationException(Exception):
     def __init__(self, msg: str) -> None:
         super().__init__(msg)
 
+def keys_count(comb: int) -> int:
+    # The searches keep the combinations as plain ints, the table counts them a byte at a time
+    count = 0
+    while comb:
+        count += POPCOUNT[comb & 0xff]
+        comb >>= 8
+
+    return count
+
+def key_mask(*positions: int) -> int:
+    mask = 0
+    for pos in positions:
+        if pos < 0:
+            raise KeyCombinationException('Trying to set bit for a key with negative position')
+        mask |= 1 << pos
+
+    return mask
+
 @dataclass(frozen=True)
 class KeyCombination:
+    '''
+    A set of keys for the code outside the searches, the engines and Distances use the int comb
+    with the functions above.
+    '''
     comb: int = 0
 
     def set_at(self, *positions: int) -> 'KeyCombination':
-        new_comb = self.comb
-        for pos in positions:
-            if pos < 0:
-                raise KeyCombinationException('Trying to set bit for a key with negative position')
-            new_comb |= 1 << pos
-
-        return KeyCombination(new_comb)
+        return KeyCombination(self.comb | key_mask(*positions))
 
     def unset_at(self, *positions: int) -> 'KeyCombination':
         new_comb = self.comb
@@ -32,15 +51,15 @@ class KeyCombination:
         return bool(self.comb & (1 << pos))
 
     def keys_count(self) -> int:
-        return bin(self.comb).count('1')
+        return keys_count(self.comb)
 
     # we want combinations with more keys to be earlier in the heapq
     def __lt__(self, other: object) -> bool:
         if not isinstance(other, KeyCombination):
             return NotImplemented
   
-        return self.keys_count() > other.keys_count()
+        return keys_count(self.comb) > keys_count(other.comb)
 
 
 
-__all__ = ['KeyCombination']
+__all__ = ['POPCOUNT', 'KeyCombinationException', 'keys_count', 'key_mask', 'KeyCombination']
@@ -1,6 +1,7 @@
-from enum import Enum
+from enum import IntEnum
 
-class PixelType(Enum):
+# The values are stored directly in the uint8 type buffer of the Grid
+class PixelType(IntEnum):
     UNSET = 0
     WALL = 1
     FREE = 2
@@ -9,12 +10,6 @@ class PixelType(Enum):
     START = 5
     END = 6
 
-    def __lt__(self, other: object) -> bool:
-        if not isinstance(other, PixelType):
-            return NotImplemented
-        
-        return self.value < other.value
-
 class Pixel:
     def __init__(self, color, pixel_type=PixelType.UNSET) -> None:
         self.color: tuple[int, int, int] = color
@@ -25,4 +20,4 @@ class Pixel:
 
 
 
-__all__ = ['Pixel', 'PixelType']
\ No newline at end of file
+__all__ = ['Pixel', 'PixelType']
@@ -0,0 +1,265 @@
+import heapq
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from math import inf
+from typing import Iterable
+
+from src.maze.adjacency import Adjacency
+from src.maze.classify import Classification
+from src.maze.grid import Grid
+from src.maze.pixel import PixelType
+
+# Pixels that belong to a room, doors (ZONE) and walls separate the rooms
+ROOM_TYPES = bytes(1 if pixel_type in (PixelType.FREE, PixelType.KEY, PixelType.START, PixelType.END) else 0 for pixel_type in range(256))
+
+DEFAULT_FIELDS_BUDGET = 64 * 1024 * 1024
+
+class RoomsException(Exception):
+    def __init__(self, msg: str) -> None:
+        super().__init__(msg)
+
+@dataclass
+class Rooms:
+    # Room id for every pixel (0 for walls and doors)
+    labels: array
+    # Position of every pixel in the members of its room
+    positions: array
+    # Pixel indices of each room, members[id - 1] is the room with that id
+    members: list[array] = field(default_factory=list)
+    # Door zone ids each room touches
+    doors: list[set[int]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def room_of(self, index: int) -> int:
+        return self.labels[index]
+
+def find_rooms(grid: Grid, classification: Classification, adjacency: Adjacency) -> Rooms:
+    '''
+    Split the passable pixels into rooms - connected areas that can be crossed without passing a door.
+    Doors without a key are not in the adjacency, so they separate the rooms like walls.
+    '''
+    types = grid.types
+    zone_labels = classification.labels
+    offsets, targets = adjacency.offsets, adjacency.targets
+
+    labels = array('I', bytes(4 * grid.size))
+    positions = array('I', bytes(4 * grid.size))
+    rooms = Rooms(labels, positions)
+    unvisited = bytearray(types.translate(ROOM_TYPES))
+
+    index = unvisited.find(1)
+    while index != -1:
+        room_id = len(rooms) + 1
+        members = array('I', [index])
+        doors: set[int] = set()
+
+        labels[index] = room_id
+        unvisited[index] = 0
+        wave = [index]
+
+        while wave:
+            curr_index = wave.pop()
+
+            for edge in range(offsets[curr_index], offsets[curr_index + 1]):
+                adjacent_index = targets[edge]
+
+                if unvisited[adjacent_index]:
+                    labels[adjacent_index] = room_id
+                    positions[adjacent_index] = len(members)
+                    unvisited[adjacent_index] = 0
+                    members.append(adjacent_index)
+                    wave.append(adjacent_index)
+                elif types[adjacent_index] == PixelType.ZONE:
+                    doors.add(zone_labels[adjacent_index])
+
+        rooms.members.append(members)
+        rooms.doors.append(doors)
+
+        index = unvisited.find(1, index + 1)
+
+    return rooms
+
+@dataclass
+class RoomField:
+    room_id: int
+    sources: tuple[int, ...]
+    # Distance from the nearest source to every pixel of the room, by its position in Rooms.members.
+    # The pixels closer than settled have their final distance, the others are upper bounds
+    values: array
+    # The Dijkstra that fills the field, resumed when a farther distance is asked for
+    nodes_to_visit: list[tuple[float, int]] = field(default_factory=list)
+
+    @property
+    def settled(self) -> float:
+        return self.nodes_to_visit[0][0] if self.nodes_to_visit else inf
+
+class RoomFields:
+    '''
+    Distance fields inside the rooms, computed on demand and kept in a least recently used cache.
+
+    A field holds the distances from a set of source pixels (a portal: the start, the end, a key
+    or the pixels of a door next to the room) to every pixel of one room, walking only inside it.
+    It is filled lazily, only as far as the distances asked for so far need.
+
+    The rooms never change while the colors and the cost model stay the same, so the fields are
+    kept by the maze and shared by all the searches on it. The cache holds at most memory_budget
+    bytes of distances, the fields of the least recently used rooms are dropped first.
+    '''
+
+    def __init__(self, rooms: Rooms, adjacency: Adjacency, costs: array, memory_budget: int = DEFAULT_FIELDS_BUDGET) -> None:
+        self.rooms = rooms
+        self.adjacency = adjacency
+        self.costs = costs
+        self.memory_budget = memory_budget
+        # Room id -> sources -> field
+        self.fields: OrderedDict[int, dict[tuple[int, ...], RoomField]] = OrderedDict()
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def field(self, room_id: int, sources: tuple[int, ...]) -> RoomField:
+        room_fields = self.fields.get(room_id)
+        if room_fields is not None:
+            self.fields.move_to_end(room_id)
+            room_field = room_fields.get(sources)
+            if room_field is not None:
+                self.hits += 1
+                return room_field
+        else:
+            room_fields = self.fields[room_id] = dict()
+
+        self.misses += 1
+        labels, positions = self.rooms.labels, self.rooms.positions
+        values = array('d', [inf]) * len(self.rooms.members[room_id - 1])
+        for index in sources:
+            if labels[index] == room_id:
+                values[positions[index]] = 0
+        room_field = room_fields[sources] = RoomField(room_id, sources, values, [(0, index) for index in dict.fromkeys(sources)])
+        self.cached_bytes += values.itemsize * len(values)
+
+        # The room just used stays even if it alone is over the budget
+        while self.cached_bytes > self.memory_budget and len(self.fields) > 1:
+            _, evicted = self.fields.popitem(last=False)
+            self.cached_bytes -= sum(evicted_field.values.itemsize * len(evicted_field.values) for evicted_field in evicted.values())
+
+        return room_field
+
+    def expand(self, room_field: RoomField, bound: float, watched: dict[int, float]) -> float:
+        '''
+        Resume the Dijkstra of the field until every pixel closer than bound is settled. Settling
+        a watched pixel (pixel -> cost added to its distance) lowers the bound, the lowest bound
+        is returned.
+        '''
+        offsets, targets, weights = self.adjacency.offsets, self.adjacency.targets, self.adjacency.weights
+        labels, positions = self.rooms.labels, self.rooms.positions
+        room_id, values, nodes_to_visit = room_field.room_id, room_field.values, room_field.nodes_to_visit
+        heappush, heappop = heapq.heappush, heapq.heappop
+
+        while nodes_to_visit and nodes_to_visit[0][0] < bound:
+            current_dist, current_node = heappop(nodes_to_visit)
+            # The sources outside the room (doors) are only in the queue once
+            if labels[current_node] == room_id:
+                if current_dist > values[positions[current_node]]: continue
+
+                extra = watched.get(current_node)
+                if extra is not None:
+                    bound = min(bound, current_dist + extra)
+
+            for edge in range(offsets[current_node], offsets[current_node + 1]):
+                adjacent_node = targets[edge]
+                if labels[adjacent_node] != room_id: continue
+
+                distance = current_dist + weights[edge]
+                position = positions[adjacent_node]
+                if distance < values[position]:
+                    values[position] = distance
+                    heappush(nodes_to_visit, (distance, adjacent_node))
+
+        return bound
+
+    def watch(self, room_field: RoomField, pixels: Iterable[int]) -> tuple[dict[int, float], float]:
+        '''
+        The pixels of the room a distance to the pixels is read from (pixel -> cost of the step
+        out of it) and the distance found so far.
+        '''
+        offsets, targets = self.adjacency.offsets, self.adjacency.targets
+        labels, positions = self.rooms.labels, self.rooms.positions
+        room_id, sources = room_field.room_id, set(room_field.sources)
+
+        watched: dict[int, float] = dict()
+        bound = inf
+        for index in pixels:
+            if labels[index] == room_id:
+                watched[index] = 0
+            elif index in sources:
+                return dict(), 0
+            else:
+                # A step costs as much as the pixel it leads to
+                for edge in range(offsets[index], offsets[index + 1]):
+                    adjacent_node = targets[edge]
+                    if labels[adjacent_node] == room_id:
+                        watched[adjacent_node] = min(watched.get(adjacent_node, inf), self.costs[index])
+                    elif adjacent_node in sources:
+                        bound = min(bound, self.costs[index])
+
+        for index, extra in watched.items():
+            bound = min(bound, room_field.values[positions[index]] + extra)
+
+        return watched, bound
+
+    def distance(self, room_field: RoomField, pixels: Iterable[int]) -> float:
+        '''
+        Distance from the sources of the field to the nearest of the pixels, they can be in the
+        room or next to it (the pixels of a door).
+        '''
+        # The distances found so far are reachable, the search only has to look for shorter ones
+        watched, bound = self.watch(room_field, pixels)
+
+        return self.expand(room_field, bound, watched)
+
+    def known_distance(self, room_field: RoomField, pixels: Iterable[int]) -> float:
+        # Same as distance without expanding the field, inf until the distance is final
+        _, bound = self.watch(room_field, pixels)
+
+        return bound if bound <= room_field.settled else inf
+
+    def path(self, room_field: RoomField, index: int) -> list[int]:
+        '''
+        The pixels from a pixel of the room (or next to it) to the nearest source, read from the
+        field without a search: every step goes back to a neighbor the pixel was reached from.
+        '''
+        offsets, targets = self.adjacency.offsets, self.adjacency.targets
+        labels, positions = self.rooms.labels, self.rooms.positions
+        room_id, values, sources = room_field.room_id, room_field.values, set(room_field.sources)
+
+        distance = self.distance(room_field, [index])
+        if distance == inf:
+            return []
+
+        path = [index]
+        while index not in sources:
+            step_cost = self.costs[index]
+            for edge in range(offsets[index], offsets[index + 1]):
+                adjacent_node = targets[edge]
+                if adjacent_node in sources:
+                    previous = 0.0
+                elif labels[adjacent_node] == room_id:
+                    previous = values[positions[adjacent_node]]
+                else:
+                    continue
+
+                if previous + step_cost == distance:
+                    index, distance = adjacent_node, previous
+                    break
+            else:
+                raise RoomsException('Broken room distance field')
+
+            path.append(index)
+
+        return path
+
+
+__all__ = ['DEFAULT_FIELDS_BUDGET', 'RoomsException', 'Rooms', 'find_rooms', 'RoomField', 'RoomFields']
@@ -2,4 +2,10 @@ from src.shortest_path.metrics import manhattan_dist, euclidean_dist
 from src.shortest_path.abstract_shortest_path import ShortestPath
 from src.shortest_path.dijkstra import Dijkstra
 from src.shortest_path.a_star import AStar
-from src.shortest_path.greedy_best_first_search import GBFS
\ No newline at end of file
+from src.shortest_path.greedy_best_first_search import GBFS
+from src.shortest_path.hierarchical import Hierarchical
+from src.shortest_path.bidirectional_a_star import BidirectionalAStar
+from src.shortest_path.jump_point_search import JPS
+from src.shortest_path.lpa_star import LPAStar
+from src.shortest_path.parallel_layers import ParallelLayers
+from src.shortest_path.wavefront import WavefrontBFS
\ No newline at end of file
@@ -1,14 +1,153 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from contextlib import nullcontext
+from dataclasses import dataclass
+from threading import Thread
+from typing import TYPE_CHECKING, ContextManager, Generator, Optional
 import pygame
 
 from src.maze import Maze, Coord
+from src.shortest_path.sink import SLICE_EXPANSIONS, ExpansionSink, ScreenSink, SearchCancelled, SteppingSink
+
+if TYPE_CHECKING:
+    from src.shortest_path.profiling import Profiler
+
+@dataclass
+class SearchStats:
+    # Number of nodes taken out of the queue and expanded
+    expanded: int = 0
+    # Number of nodes put in the queue
+    pushes: int = 0
+    # Number of edges looked at from the expanded nodes (Dijkstra, AStar and GBFS)
+    relaxations: int = 0
+    # Number of queue entries dropped because their node was pushed again with a better priority
+    stale: int = 0
+    # Number of (node, key combination) distances kept at the end of the search
+    distances: int = 0
+    # Cost of the found path from the start node, the returned path is cut at the last pixel of the start area
+    cost: float = 0
 
 class ShortestPath(ABC):
+    # Statistics of the last run
+    stats: SearchStats = SearchStats()
+    # Set by Profiler.run for the run it measures
+    profiler: Optional['Profiler'] = None
+    # Set by steps for the run it slices
+    stepping: Optional[SteppingSink] = None
+
     @property
     def name(self) -> str:
         return type(self).__name__
 
+    @property
+    def cache_key(self) -> Optional[str]:
+        '''
+        The engine, its heuristic and its queue, two engines with the same key find the same paths.
+        None when the heuristic cannot be told apart from others (a lambda, a nested function or
+        an object without a cache_key), the paths of such an engine are not cached.
+        '''
+        key = self.name
+        heuristic = getattr(self, 'heuristic', None)
+        if heuristic is not None:
+            heuristic_key = getattr(heuristic, 'cache_key', None)
+            if heuristic_key is None:
+                # A function is known by its module and name, lambdas and nested functions share theirs
+                name = getattr(heuristic, '__qualname__', None)
+                if name is None or '<' in name:
+                    return None
+                heuristic_key = f'{heuristic.__module__}.{name}'
+            key += f':{heuristic_key}'
+
+        # Queues break the ties between equal priorities differently, the default heap keeps the old keys
+        # (a queue class, LPAStar keeps its open list under the same name)
+        queue = getattr(self, 'queue', None)
+        if isinstance(queue, type) and queue.__name__ != 'HeapQueue':
+            key += f'@{queue.__name__}'
+
+        return key
+
     @abstractmethod
-    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None) -> list[Coord]:
-        pass
\ No newline at end of file
+    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        pass
+
+    def steps(self, maze: Maze, expansions: int = SLICE_EXPANSIONS) -> Generator[list[int], None, list[Coord]]:
+        '''
+        Resumable run. Every next() lets the search expand up to `expansions` more nodes and
+        yields their pixel indices, the path is the return value (StopIteration.value). Between
+        two steps the search is paused, closing the generator cancels it:
+
+            search = AStar().steps(maze)
+            for expanded in search:
+                ...  # draw them, handle the events, search.close() to stop
+
+        The engine runs in its own thread with a SteppingSink, so every engine that publishes
+        its expansions can be stepped without changes. The search is only paused where it
+        publishes a node or reaches a checkpoint (compiling the maze, the phases of run, every
+        table of Landmarks and the abstract search of Hierarchical). A long part without either
+        runs to its end before the next step, for example the Dijkstra of one landmark table.
+        '''
+        sink = SteppingSink(expansions)
+        result: list[list[Coord]] = []
+        errors: list[Exception] = []
+
+        def search() -> None:
+            self.stepping = sink
+            try:
+                maze.classify()
+                self.checkpoint()
+                maze.compile()
+                self.checkpoint()
+                result.append(self.run(maze, sink=sink))
+            except SearchCancelled:
+                pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self.stepping = None
+                sink.finish()
+
+        thread = Thread(target=search, daemon=True)
+        thread.start()
+        try:
+            while True:
+                sink.wait_slice()
+                if sink.done:
+                    break
+
+                yield sink.drain()
+                sink.resume()
+        finally:
+            if not sink.done:
+                sink.cancel()
+            thread.join()
+
+        # The nodes expanded after the last full slice
+        expanded = sink.drain()
+        if expanded:
+            yield expanded
+
+        if errors:
+            raise errors[0]
+        return result[0]
+
+    def prepare_heuristic(self, maze: Maze) -> None:
+        # Heuristics with tables of the maze (Landmarks) build them before the search
+        prepare = getattr(getattr(self, 'heuristic', None), 'prepare', None)
+        if prepare is not None:
+            prepare(maze, self.checkpoint)
+
+    def checkpoint(self) -> None:
+        # A point of run where a stepped search can be paused or cancelled without publishing a node
+        if self.stepping is not None:
+            self.stepping.checkpoint()
+
+    def phase(self, name: str) -> ContextManager[None]:
+        # Times a part of run when it is profiled, a stepped search can stop before it
+        self.checkpoint()
+        return self.profiler.phase(name) if self.profiler is not None else nullcontext()
+
+    def expansion_sink(self, maze: Maze, screen: Optional[pygame.surface.Surface], sink: Optional[ExpansionSink]) -> Optional[ExpansionSink]:
+        # A screen without a sink draws the expanded nodes directly (batched once per frame)
+        if sink is None and screen is not None:
+            return ScreenSink(maze, screen)
+
+        return sink
\ No newline at end of file
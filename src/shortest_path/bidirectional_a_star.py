@@ -0,0 +1,218 @@
+import heapq
+from array import array
+from math import inf
+from typing import Callable, Optional
+import pygame
+
+from src.maze import START_KEY_COMB, Coord, Distances, Maze, MazeException, PriorityNode
+from src.maze.adjacency import Adjacency
+from src.maze.key_comb import keys_count
+from src.maze.pixel import PixelType
+from src.shortest_path.metrics import manhattan_dist
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.sink import ExpansionSink
+
+class BidirectionalAStar(ShortestPath):
+    '''
+    A* from both the start and the end, meeting in the middle.
+
+    Without keys both searches use the average of the forward and backward heuristics as
+    potential, so they stay consistent and the search can stop as soon as the two queue
+    tops together reach the best meeting found. With keys only the forward search walks
+    the key combinations and the backward search, which ignores the doors, is resumed
+    on demand to give the forward search its (exact when no door is in the way) heuristic.
+    '''
+
+    def __init__(self, heuristic: Callable[[Coord, Coord], float] = manhattan_dist):
+        self.heuristic = heuristic
+
+    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        self.stats = SearchStats()
+        sink = self.expansion_sink(maze, screen, sink)
+        self.prepare_heuristic(maze)
+
+        adjacency = maze.compile()
+        start_node = maze.index(maze.get_start())
+        end_node = maze.index(maze.get_end())
+
+        try:
+            if any(adjacency.key_set) or any(adjacency.key_required):
+                return self.keyed_search(maze, adjacency, start_node, end_node, sink)
+
+            return self.bidirectional_search(maze, adjacency, start_node, end_node, sink)
+        finally:
+            if sink is not None:
+                sink.flush()
+
+    def bidirectional_search(self, maze: Maze, adjacency: Adjacency, start_node: int, end_node: int, sink: Optional[ExpansionSink]) -> list[Coord]:
+        stats = self.stats
+        offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+
+        start_coord, end_coord = maze.coord(start_node), maze.coord(end_node)
+        heuristic, heuristic_scale = self.heuristic, maze.min_cost
+
+        def potential(node: int) -> float:
+            coord = maze.coord(node)
+            return heuristic_scale * (heuristic(coord, end_coord) - heuristic(coord, start_coord)) / 2
+
+        # Index 0 is the forward search from the start and 1 is the backward search from the end
+        distances: list[dict[int, float]] = [{start_node: 0}, {end_node: 0}]
+        parents: list[dict[int, int]] = [{start_node: -1}, {end_node: -1}]
+        nodes_to_visit: list[list[tuple[float, float, int]]] = [[(potential(start_node), 0, start_node)], [(-potential(end_node), 0, end_node)]]
+        stats.pushes += 2
+
+        best_dist, meeting_node = inf, -1
+
+        while nodes_to_visit[0] and nodes_to_visit[1]:
+            # No path through the unexpanded nodes can be shorter than the best meeting
+            if nodes_to_visit[0][0][0] + nodes_to_visit[1][0][0] >= best_dist:
+                break
+
+            # Expand the smaller frontier
+            side = 0 if len(nodes_to_visit[0]) <= len(nodes_to_visit[1]) else 1
+            sign = 1 if side == 0 else -1
+            side_distances, other_distances = distances[side], distances[1 - side]
+
+            _, current_dist, current_node = heapq.heappop(nodes_to_visit[side])
+            if current_dist > side_distances[current_node]: continue
+
+            stats.expanded += 1
+            if sink is not None:
+                sink.publish(current_node)
+
+            for edge in range(offsets[current_node], offsets[current_node + 1]):
+                adjacent_node = targets[edge]
+
+                if side == 0:
+                    weight = weights[edge]
+                else:
+                    # The backward search needs the weight of the edge coming into the current node
+                    for reverse_edge in range(offsets[adjacent_node], offsets[adjacent_node + 1]):
+                        if targets[reverse_edge] == current_node:
+                            weight = weights[reverse_edge]
+                            break
+                    else:
+                        continue
+
+                distance = current_dist + weight
+                if distance < side_distances.get(adjacent_node, inf):
+                    side_distances[adjacent_node] = distance
+                    parents[side][adjacent_node] = current_node
+                    stats.pushes += 1
+                    heapq.heappush(nodes_to_visit[side], (distance + sign * potential(adjacent_node), distance, adjacent_node))
+
+                    if adjacent_node in other_distances and distance + other_distances[adjacent_node] < best_dist:
+                        best_dist = distance + other_distances[adjacent_node]
+                        meeting_node = adjacent_node
+
+        stats.distances = len(distances[0]) + len(distances[1])
+        if meeting_node == -1:
+            raise MazeException('No path to the end node')
+        stats.cost = best_dist
+
+        with self.phase('reconstruct'):
+            # Start .. meeting node from the forward parents and the rest from the backward parents
+            path = []
+            node = meeting_node
+            while node != -1:
+                path.append(node)
+                node = parents[0][node]
+            path.reverse()
+
+            node = parents[1][meeting_node]
+            while node != -1:
+                path.append(node)
+                node = parents[1][node]
+
+            # Same as Maze.get_path, the path starts from the last pixel of the start area and the end is not a part of it
+            types = maze.grid.types
+            first = max(i for i, node in enumerate(path) if types[node] == PixelType.START)
+            return [maze.coord(node) for node in path[first:-1]]
+
+    def keyed_search(self, maze: Maze, adjacency: Adjacency, start_node: int, end_node: int, sink: Optional[ExpansionSink]) -> list[Coord]:
+        stats = self.stats
+        offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+        key_set, key_required = adjacency.key_set, adjacency.key_required
+
+        # Backward A* from the end towards the start that ignores the keys, resumed only until the
+        # node asked for is closed. Its distances never overestimate so they are a consistent heuristic
+        start_coord = maze.coord(start_node)
+        heuristic, heuristic_scale = self.heuristic, maze.min_cost
+
+        to_end = array('d', [inf]) * maze.grid.size
+        to_end[end_node] = 0
+        closed = bytearray(maze.grid.size)
+        backward_to_visit: list[tuple[float, float, int]] = [(heuristic_scale * heuristic(maze.coord(end_node), start_coord), 0, end_node)]
+
+        def end_distance(node: int) -> float:
+            while not closed[node] and backward_to_visit:
+                _, current_dist, current_node = heapq.heappop(backward_to_visit)
+                if closed[current_node]: continue
+
+                closed[current_node] = 1
+                stats.expanded += 1
+
+                for edge in range(offsets[current_node], offsets[current_node + 1]):
+                    adjacent_node = targets[edge]
+                    if closed[adjacent_node]: continue
+
+                    for reverse_edge in range(offsets[adjacent_node], offsets[adjacent_node + 1]):
+                        if targets[reverse_edge] == current_node:
+                            distance = current_dist + weights[reverse_edge]
+                            if distance < to_end[adjacent_node]:
+                                to_end[adjacent_node] = distance
+                                heapq.heappush(backward_to_visit, (distance + heuristic_scale * heuristic(maze.coord(adjacent_node), start_coord), distance, adjacent_node))
+                            break
+
+            # The nodes the backward search never gets to can not reach the end at all
+            return to_end[node]
+
+        distances: Distances = maze.new_distances()
+        values, parents, key_bits = distances.values, distances.parents, distances.key_bits
+        comb_mask = (1 << key_bits) - 1
+        values[start_node << key_bits] = 0
+        nodes_to_visit: list[PriorityNode] = [PriorityNode((end_distance(start_node), 0, start_node << key_bits | START_KEY_COMB.comb))]
+        stats.pushes += 1
+        min_end_dist: Optional[float] = None
+
+        while nodes_to_visit:
+            current_f_score, current_keys, current_slot = heapq.heappop(nodes_to_visit)
+            current_node, comb = current_slot >> key_bits, current_slot & comb_mask
+
+            if min_end_dist is not None and current_f_score >= min_end_dist:
+                continue
+
+            stats.expanded += 1
+            if sink is not None:
+                sink.publish(current_node)
+
+            current_dist = values[current_slot]
+            for edge in range(offsets[current_node], offsets[current_node + 1]):
+                if key_required[edge] & ~comb: continue
+
+                adjacent_node = targets[edge]
+                adjacent_comb = comb | key_set[edge]
+                slot = adjacent_node << key_bits | adjacent_comb
+                distance = current_dist + weights[edge]
+
+                if distance < values[slot] and (min_end_dist is None or distance < min_end_dist):
+                    values[slot] = distance
+                    parents[slot] = current_slot
+
+                    if adjacent_node == end_node:
+                        min_end_dist = distance
+                        continue
+
+                    estimate = end_distance(adjacent_node)
+                    if estimate == inf: continue
+
+                    stats.pushes += 1
+                    heapq.heappush(nodes_to_visit, PriorityNode((distance + estimate, -keys_count(adjacent_comb) if key_set[edge] else current_keys, slot)))
+
+        stats.distances = len(distances)
+        if min_end_dist is None:
+            raise MazeException('No path to the end node')
+        stats.cost = min_end_dist
+
+        with self.phase('reconstruct'):
+            return maze.get_path(distances)
\ No newline at end of file
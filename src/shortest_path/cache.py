@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from src.maze import Coord, Maze
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.sink import ExpansionSink
+
+CACHE_FILE_NAME = 'solutions.sqlite'
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+@dataclass
+class Solution:
+    path: list[Coord]
+    stats: SearchStats
+
+class SolutionCache:
+    '''
+    Paths and statistics of solved mazes.
+
+    The key is the hash of the decoded pixels, the engine with its heuristic and the weight
+    model of the maze. The last max_entries solutions are kept in memory and when a cache
+    directory is given every solution is also written to a sqlite file there, which is kept
+    under max_bytes by dropping the least recently used solutions. Engines without a cache
+    key (see ShortestPath.cache_key) are run every time.
+    '''
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory: OrderedDict[str, Solution] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.connection: Optional[sqlite3.Connection] = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Worker processes of a batch run can share the same file
+            self.connection = sqlite3.connect(os.path.join(cache_dir, CACHE_FILE_NAME), timeout=30)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, path BLOB, stats TEXT, size INTEGER, used REAL)')
+            self.connection.commit()
+
+    def key(self, maze: Maze, algorithm: ShortestPath) -> Optional[str]:
+        algorithm_key = algorithm.cache_key
+        if algorithm_key is None:
+            return None
+
+        return f'{maze.content_hash}/{algorithm_key}/{maze.weight_model}'
+
+    def get(self, maze: Maze, algorithm: ShortestPath) -> Optional[Solution]:
+        key = self.key(maze, algorithm)
+        if key is None:
+            return None
+
+        solution = self.memory.get(key)
+        if solution is not None:
+            self.memory.move_to_end(key)
+            return solution
+
+        if self.connection is None:
+            return None
+
+        row = self.connection.execute('SELECT path, stats FROM solutions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        self.connection.execute('UPDATE solutions SET used = ? WHERE key = ?', (time.time(), key))
+        self.connection.commit()
+
+        indices = array('I')
+        indices.frombytes(row[0])
+        solution = Solution([maze.coord(index) for index in indices], SearchStats(**json.loads(row[1])))
+        self.remember(key, solution)
+        return solution
+
+    def put(self, maze: Maze, algorithm: ShortestPath, solution: Solution) -> None:
+        key = self.key(maze, algorithm)
+        if key is None:
+            return
+
+        self.remember(key, solution)
+
+        if self.connection is None:
+            return
+
+        # The path is kept as pixel indices, 4 bytes per step
+        path = array('I', [maze.index(coord) for coord in solution.path]).tobytes()
+        stats = json.dumps(asdict(solution.stats))
+        self.connection.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)', (key, path, stats, len(path) + len(stats), time.time()))
+        self.evict()
+        self.connection.commit()
+
+    def remember(self, key: str, solution: Solution) -> None:
+        self.memory[key] = solution
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def evict(self) -> None:
+        if self.connection is None:
+            return
+
+        total, = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM solutions').fetchone()
+        if total <= self.max_bytes:
+            return
+
+        # Drop the least recently used solutions until the file fits
+        for key, size in self.connection.execute('SELECT key, size FROM solutions ORDER BY used').fetchall():
+            if total <= self.max_bytes:
+                break
+            self.connection.execute('DELETE FROM solutions WHERE key = ?', (key,))
+            total -= size
+
+    def lookup(self, maze: Maze, algorithm: ShortestPath) -> Optional[list[Coord]]:
+        '''
+        The cached path of the algorithm or None, counted as a hit or a miss. On a hit
+        algorithm.stats are the statistics of the cached run.
+        '''
+        solution = self.get(maze, algorithm)
+        if solution is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        algorithm.stats = SearchStats(**asdict(solution.stats))
+        return list(solution.path)
+
+    def store(self, maze: Maze, algorithm: ShortestPath, path: list[Coord]) -> None:
+        # The path found by the last run of the algorithm and its statistics
+        self.put(maze, algorithm, Solution(list(path), SearchStats(**asdict(algorithm.stats))))
+
+    def run(self, algorithm: ShortestPath, maze: Maze, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        '''
+        Same as algorithm.run but the solved mazes are taken from the cache. On a hit nothing is
+        published to the sink and algorithm.stats are the statistics of the cached run.
+        '''
+        path = self.lookup(maze, algorithm)
+        if path is not None:
+            return path
+
+        path = algorithm.run(maze, sink=sink)
+        self.store(maze, algorithm, path)
+        return path
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+
+__all__ = ['CACHE_FILE_NAME', 'Solution', 'SolutionCache']
@@ -1,60 +1,87 @@
-import heapq
 from typing import Optional
 import pygame
 
-from src.maze import ITERATION_NODE_COLOR, START_KEY_COMB, Coord, Distances, Maze, MazeException, PriorityNode
-from src.shortest_path.abstract_shortest_path import ShortestPath
+from src.maze import START_KEY_COMB, Distances, Coord, Maze, MazeException
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.queues import HeapQueue, SearchQueue
+from src.shortest_path.sink import ExpansionSink
 
 class Dijkstra(ShortestPath):
-    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None) -> list[Coord]:
-        start_node = maze.get_start()
-        maze.set_area_at(start_node)
+    def __init__(self, queue: type[SearchQueue] = HeapQueue):
+        self.queue = queue
 
-        end_node = maze.get_end()
-        maze.set_area_at(end_node)
+    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        stats = self.stats = SearchStats()
+        sink = self.expansion_sink(maze, screen, sink)
 
-        # Distances from start_node to all reached nodes
-        distances: Distances = {start_node: {START_KEY_COMB: 0}}
+        adjacency = maze.compile()
+        offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+        key_set, key_required = adjacency.key_set, adjacency.key_required
+
+        start_node = maze.index(maze.get_start())
+        end_node = maze.index(maze.get_end())
+
+        # Distances from start_node to all reached (node, key combination) slots
+        distances: Distances = maze.new_distances()
+        values, parents, key_bits = distances.values, distances.parents, distances.key_bits
+        values[start_node << key_bits] = 0
 
         # Nodes that have to be checked
-        nodes_to_visit: list[PriorityNode] = [PriorityNode((0, START_KEY_COMB, start_node))]
-        heapq.heapify(nodes_to_visit)
+        nodes_to_visit = self.queue(key_bits)
+        push, pop = nodes_to_visit.push, nodes_to_visit.pop
+        push(0, start_node << key_bits | START_KEY_COMB.comb)
+        stats.pushes += 1
+        comb_mask = (1 << key_bits) - 1
 
         min_end_dist: Optional[float] = None
 
         while nodes_to_visit:
             # Get the node with the shortest distance from start
-            current_dist, current_comb, current_node = heapq.heappop(nodes_to_visit)
+            current_dist, current_slot = pop()
 
             # skip the nodes that will not improve the path to the end (the neighbor check below dont do all the work because if have not reached the end yet we add some nodes that can be away from the end when we find it)
             if min_end_dist is not None and current_dist >= min_end_dist:
                 continue
 
-            # Draw the current node
-            if screen is not None:
-                maze.draw_node(screen, current_node, ITERATION_NODE_COLOR)
+            stats.expanded += 1
+            current_node, comb = current_slot >> key_bits, current_slot & comb_mask
 
-            # Get the adjacent_nodes of the current node that are reachable with current combination
-            adjacent_edges = maze.get_adjacent_edges(current_node, current_comb)
+            # Publish the current node to be drawn
+            if sink is not None:
+                sink.publish(current_node)
 
-            for weight, adjacent_comb, adjacent_node in adjacent_edges:
-                distance = current_dist + weight
+            # Go through the edges of the current node that are reachable with current combination
+            first_edge, last_edge = offsets[current_node], offsets[current_node + 1]
+            stats.relaxations += last_edge - first_edge
+            for edge in range(first_edge, last_edge):
+                if key_required[edge] & ~comb: continue
+
+                adjacent_node = targets[edge]
+                adjacent_comb = comb | key_set[edge]
+                slot = adjacent_node << key_bits | adjacent_comb
+                distance = current_dist + weights[edge]
 
                 # Update distance only if it can imporve the distance to the current neighbor
                 # and the min distance to the end
-                if (adjacent_node not in distances or adjacent_comb not in distances[adjacent_node] or distance < distances[adjacent_node][adjacent_comb]) and \
-                    (min_end_dist is None or distance < min_end_dist):
-                    
-                    distances.setdefault(adjacent_node, dict())
-                    distances[adjacent_node][adjacent_comb] = distance
+                if distance < values[slot] and (min_end_dist is None or distance < min_end_dist):
+                    values[slot] = distance
+                    parents[slot] = current_slot
 
                     if adjacent_node == end_node:
                         min_end_dist = distance
                     else:
-                        heapq.heappush(nodes_to_visit, PriorityNode((distance, adjacent_comb, adjacent_node)))
+                        stats.pushes += 1
+                        push(distance, slot)
+
+        if sink is not None:
+            sink.flush()
 
+        stats.distances = len(distances)
+        stats.stale = nodes_to_visit.stale
         if min_end_dist is None:
             raise MazeException('No path to the end node')
+        stats.cost = min_end_dist
         
         # Get the final path through distances
-        return maze.get_path(distances)
\ No newline at end of file
+        with self.phase('reconstruct'):
+            return maze.get_path(distances)
\ No newline at end of file
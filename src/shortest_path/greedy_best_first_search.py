@@ -1,51 +1,81 @@
-import heapq
+from math import inf
 from typing import Callable, Optional
 import pygame
 
-from src.maze import ITERATION_NODE_COLOR, START_KEY_COMB, Coord, Distances, Maze, PriorityNode
+from src.maze import START_KEY_COMB, Coord, Distances, Maze
 from src.shortest_path.metrics import manhattan_dist
-from src.shortest_path.abstract_shortest_path import ShortestPath
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.queues import HeapQueue, SearchQueue
+from src.shortest_path.sink import ExpansionSink
 
 
 class GBFS(ShortestPath):
-    def __init__(self,  heuristic: Callable[[Coord, Coord], float] = manhattan_dist):
+    def __init__(self,  heuristic: Callable[[Coord, Coord], float] = manhattan_dist, queue: type[SearchQueue] = HeapQueue):
         self.heuristic = heuristic
+        self.queue = queue
 
-    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None) -> list[Coord]:
-        start_node = maze.get_start()
-        maze.set_area_at(start_node)
+    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        stats = self.stats = SearchStats()
+        sink = self.expansion_sink(maze, screen, sink)
+        self.prepare_heuristic(maze)
 
-        end_node = maze.get_end()
-        maze.set_area_at(end_node)
+        adjacency = maze.compile()
+        offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+        key_set, key_required = adjacency.key_set, adjacency.key_required
 
-        # g-score
-        distances: Distances = {start_node: {START_KEY_COMB: 0}}
+        start_node = maze.index(maze.get_start())
+        end_coord = maze.get_end()
+        end_node = maze.index(end_coord)
+
+        # g-score of the (node, key combination) slots
+        distances: Distances = maze.new_distances()
+        values, parents, key_bits = distances.values, distances.parents, distances.key_bits
+        values[start_node << key_bits] = 0
 
         # the float is heuristic cost to the end
-        nodes_to_visit: list[PriorityNode] = [PriorityNode((0, START_KEY_COMB, start_node))]
-        heapq.heapify(nodes_to_visit)
+        nodes_to_visit = self.queue(key_bits)
+        push, pop = nodes_to_visit.push, nodes_to_visit.pop
+        push(0, start_node << key_bits | START_KEY_COMB.comb)
+        stats.pushes += 1
+        comb_mask = (1 << key_bits) - 1
 
         while nodes_to_visit:
             # Get the node with the shortest heuristic distance to the end
-            _, current_comb, current_node = heapq.heappop(nodes_to_visit)
+            _, current_slot = pop()
+            current_node, comb = current_slot >> key_bits, current_slot & comb_mask
 
             if(current_node == end_node):
                 break
 
-            # Draw the current node
-            if screen is not None:
-                maze.draw_node(screen, current_node, ITERATION_NODE_COLOR)
+            stats.expanded += 1
+
+            # Publish the current node to be drawn
+            if sink is not None:
+                sink.publish(current_node)
+
+            # Go through the edges of the current node that are reachable with current combination
+            first_edge, last_edge = offsets[current_node], offsets[current_node + 1]
+            stats.relaxations += last_edge - first_edge
+            for edge in range(first_edge, last_edge):
+                if key_required[edge] & ~comb: continue
 
-            # Get the adjacent_nodes of the current node that are reachable with current combination
-            adjacent_edges = maze.get_adjacent_edges(current_node, current_comb)
+                adjacent_node = targets[edge]
+                adjacent_comb = comb | key_set[edge]
+                slot = adjacent_node << key_bits | adjacent_comb
+                if values[slot] != inf: continue
 
-            for weight, adjacent_comb, adjacent_node in adjacent_edges:
-                if adjacent_node in distances and adjacent_comb in distances[adjacent_node]: continue
+                values[slot] = values[current_slot] + weights[edge]
+                parents[slot] = current_slot
 
-                distance = distances[current_node][current_comb] + weight
-                distances.setdefault(adjacent_node, dict())[adjacent_comb] = distance
+                priority = self.heuristic(maze.coord(adjacent_node), end_coord)
+                stats.pushes += 1
+                push(priority, slot)
 
-                priority = self.heuristic(adjacent_node, end_node)
-                heapq.heappush(nodes_to_visit, PriorityNode((priority, adjacent_comb, adjacent_node)))
+        if sink is not None:
+            sink.flush()
 
-        return maze.get_path(distances)
\ No newline at end of file
+        stats.distances = len(distances)
+        stats.stale = nodes_to_visit.stale
+        stats.cost = min((distance for _, distance in distances.combinations(end_node)), default=0)
+        with self.phase('reconstruct'):
+            return maze.get_path(distances)
\ No newline at end of file
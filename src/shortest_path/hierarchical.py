@@ -0,0 +1,370 @@
+import heapq
+from dataclasses import dataclass, field
+from math import inf
+from typing import Callable, Optional
+import pygame
+
+from src.maze import START_KEY_COMB, Coord, Maze, MazeException
+from src.maze.key_comb import keys_count
+from src.maze.pixel import PixelType
+from src.shortest_path.metrics import manhattan_dist
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.sink import ExpansionSink
+
+# (portal, key combination) node of the abstract graph
+AbstractNode = tuple[int, int]
+
+@dataclass
+class Portal:
+    '''
+    A point of interest of the abstract graph - the start, the end, a key or a side of a door.
+
+    A door has a ZONE portal for every room and every other door it touches, with the door
+    pixels next to it. The sides of one door are linked by the distances across the door and
+    the sides of two touching doors by the step from one to the other.
+    '''
+    type: PixelType
+    pixels: list[int]
+    rooms: list[int] = field(default_factory=list)
+    # The bit collected by a KEY portal or needed to pass a door (ZONE) portal
+    key_mask: int = 0
+    # The zone ids of the door of a ZONE portal and of the door it touches (0 for a room)
+    door: int = 0
+    next_door: int = 0
+    # Portal -> distance of the edges that do not go through a room
+    links: dict[int, float] = field(default_factory=dict)
+
+class Hierarchical(ShortestPath):
+    '''
+    Two level search for keyed mazes.
+
+    Every room (an area bounded by walls and doors) is collapsed into the distances between
+    its portals, the doors into the distances across them, and the key combination search
+    runs only on that small graph. The chosen route is then refined back to pixels one segment
+    at a time, every segment inside its own room or door with the keys collected before it.
+    The portals are points in the abstract graph, so the route is the shortest one only up to
+    the steps inside the portals.
+    '''
+
+    def __init__(self, heuristic: Callable[[Coord, Coord], float] = manhattan_dist):
+        self.heuristic = heuristic
+
+    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        # Counts both the abstract and the refining expansions
+        self.stats = SearchStats()
+        self.prepare_heuristic(maze)
+
+        start_node = maze.index(maze.get_start())
+        end_node = maze.index(maze.get_end())
+
+        portals = self.find_portals(maze, start_node, end_node)
+        self.checkpoint()
+        route = self.abstract_search(maze, portals)
+
+        return self.refine(maze, portals, route, self.expansion_sink(maze, screen, sink))
+
+    def find_portals(self, maze: Maze, start_node: int, end_node: int) -> list[Portal]:
+        classification = maze.classify()
+        rooms = maze.split_rooms()
+
+        # The start is always portal 0 and the end is portal 1
+        portals = [
+            Portal(PixelType.START, [start_node], [rooms.room_of(start_node)]),
+            Portal(PixelType.END, [end_node], [rooms.room_of(end_node)]),
+        ]
+
+        for zone in classification.zones:
+            if zone.type not in (PixelType.KEY, PixelType.ZONE) or zone.color not in maze.keys: continue
+
+            pixels = list(classification.pixels_of(zone))
+            key_mask = 1 << maze.keys[zone.color]
+            if zone.type == PixelType.KEY:
+                portals.append(Portal(zone.type, pixels, [rooms.room_of(pixels[0])], key_mask))
+            else:
+                self.add_door(maze, portals, zone.id, pixels, key_mask)
+
+        # The step between the sides of two touching doors
+        door_sides = {(portal.door, portal.next_door): portal_id for portal_id, portal in enumerate(portals) if portal.next_door}
+        for (door, next_door), portal_id in door_sides.items():
+            other_id = door_sides.get((next_door, door))
+            if other_id is not None:
+                portals[portal_id].links[other_id] = self.door_step(maze, portals[portal_id], portals[other_id])
+
+        return portals
+
+    def add_door(self, maze: Maze, portals: list[Portal], door: int, pixels: list[int], key_mask: int) -> None:
+        '''
+        The sides of a door and the distances across it between them.
+        '''
+        adjacency = maze.compile()
+        offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+        labels = maze.split_rooms().labels
+        zone_labels = maze.classify().labels
+
+        # A room (its id) or another door (minus its zone id) -> the pixels of the door next to it
+        sides: dict[int, list[int]] = dict()
+        for index in pixels:
+            for edge in range(offsets[index], offsets[index + 1]):
+                adjacent_node = targets[edge]
+                if labels[adjacent_node]:
+                    neighbor = labels[adjacent_node]
+                elif zone_labels[adjacent_node] != door:
+                    neighbor = -zone_labels[adjacent_node]
+                else:
+                    continue
+
+                side = sides.setdefault(neighbor, [])
+                if not side or side[-1] != index:
+                    side.append(index)
+
+        first = len(portals)
+        for neighbor, side in sides.items():
+            if neighbor > 0:
+                portals.append(Portal(PixelType.ZONE, side, [neighbor], key_mask, door))
+            else:
+                portals.append(Portal(PixelType.ZONE, side, [], key_mask, door, -neighbor))
+
+        # Dijkstra inside the door from every side to the others
+        for portal_id in range(first, len(portals)):
+            distances: dict[int, float] = {index: 0 for index in portals[portal_id].pixels}
+            nodes_to_visit: list[tuple[float, int]] = [(0, index) for index in distances]
+            while nodes_to_visit:
+                current_dist, current_node = heapq.heappop(nodes_to_visit)
+                if current_dist > distances[current_node]: continue
+
+                for edge in range(offsets[current_node], offsets[current_node + 1]):
+                    adjacent_node = targets[edge]
+                    if zone_labels[adjacent_node] != door: continue
+
+                    distance = current_dist + weights[edge]
+                    if distance < distances.get(adjacent_node, inf):
+                        distances[adjacent_node] = distance
+                        heapq.heappush(nodes_to_visit, (distance, adjacent_node))
+
+            for other_id in range(first, len(portals)):
+                if other_id == portal_id: continue
+
+                distance = min(distances.get(index, inf) for index in portals[other_id].pixels)
+                if distance != inf:
+                    portals[portal_id].links[other_id] = distance
+
+    def door_step(self, maze: Maze, portal: Portal, other: Portal) -> float:
+        # The cheapest step from a side of a door onto the touching side of another door
+        adjacency = maze.compile()
+        offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+        other_pixels = set(other.pixels)
+
+        return min(weights[edge] for index in portal.pixels for edge in range(offsets[index], offsets[index + 1]) if targets[edge] in other_pixels)
+
+    def abstract_search(self, maze: Maze, portals: list[Portal]) -> list[tuple[int, int]]:
+        '''
+        Key combination search over the portals. Returns the (portal, room it was reached through,
+        0 for a link) pairs of the route.
+
+        The distances inside a room are read from the distance field of the portal, which the
+        maze keeps for the next searches. A field is expanded only as far as the search needs:
+        an expanded node leaves a scan of each of its rooms in the queue, at the distance its
+        field has settled so far, and the portals of the room are reached once their distance
+        is final.
+        '''
+        fields = maze.room_fields()
+        # The portals of every room, there is no need to come back to the start
+        room_portals: dict[int, list[int]] = dict()
+        for portal_id, portal in enumerate(portals):
+            if portal.type == PixelType.START: continue
+            for room_id in portal.rooms:
+                room_portals.setdefault(room_id, []).append(portal_id)
+
+        start: AbstractNode = (0, START_KEY_COMB.comb)
+        distances: dict[AbstractNode, float] = {start: 0}
+        parents: dict[AbstractNode, tuple[AbstractNode, int]] = dict()
+        # (node, room) -> the portals of the room its scan has not reached yet
+        unreached: dict[tuple[AbstractNode, int], list[int]] = dict()
+
+        # (distance, minus the number of keys, portal, key combination, the room of a scan or 0)
+        nodes_to_visit: list[tuple[float, int, int, int, int]] = [(0, 0, 0, START_KEY_COMB.comb, 0)]
+        end: Optional[AbstractNode] = None
+
+        def relax(node: AbstractNode, adjacent_portal: int, distance: float, room_id: int) -> None:
+            portal = portals[adjacent_portal]
+            adjacent_comb = node[1]
+            if portal.type == PixelType.KEY:
+                adjacent_comb |= portal.key_mask
+            elif portal.type == PixelType.ZONE and not adjacent_comb & portal.key_mask:
+                return
+
+            adjacent = (adjacent_portal, adjacent_comb)
+            if distance < distances.get(adjacent, inf):
+                distances[adjacent] = distance
+                parents[adjacent] = (node, room_id)
+                self.stats.pushes += 1
+                heapq.heappush(nodes_to_visit, (distance, -keys_count(adjacent_comb), adjacent_portal, adjacent_comb, 0))
+
+        while nodes_to_visit:
+            current_dist, current_keys, current_portal, current_comb, room_id = heapq.heappop(nodes_to_visit)
+            node = (current_portal, current_comb)
+            node_dist = distances[node]
+
+            if room_id:
+                # Expand the field up to the next entry of the queue, at least twice as far as
+                # before so a room is scanned only a few times
+                room_field = fields.field(room_id, tuple(portals[current_portal].pixels))
+                next_dist = nodes_to_visit[0][0] - node_dist if nodes_to_visit else inf
+                fields.expand(room_field, max(next_dist, 2 * room_field.settled, room_field.settled + maze.min_cost), dict())
+
+                remaining = []
+                for portal_id in unreached.pop((node, room_id)):
+                    distance = fields.known_distance(room_field, portals[portal_id].pixels)
+                    if distance != inf:
+                        relax(node, portal_id, node_dist + distance, room_id)
+                    else:
+                        remaining.append(portal_id)
+
+                # The portals left after the whole room is settled cannot be reached
+                if remaining and room_field.settled != inf:
+                    unreached[(node, room_id)] = remaining
+                    heapq.heappush(nodes_to_visit, (node_dist + room_field.settled, current_keys, current_portal, current_comb, room_id))
+                continue
+
+            if current_dist > node_dist: continue
+
+            if portals[current_portal].type == PixelType.END:
+                end = node
+                break
+
+            self.stats.expanded += 1
+            self.checkpoint()
+
+            for adjacent_portal, weight in portals[current_portal].links.items():
+                relax(node, adjacent_portal, current_dist + weight, 0)
+
+            for room_id in portals[current_portal].rooms:
+                unreached[(node, room_id)] = [portal_id for portal_id in room_portals[room_id] if portal_id != current_portal]
+                heapq.heappush(nodes_to_visit, (current_dist, current_keys, current_portal, current_comb, room_id))
+
+        if end is None:
+            raise MazeException('No path to the end node')
+
+        route: list[tuple[int, int]] = []
+        node = end
+        while node != start:
+            parent, room_id = parents[node]
+            route.append((node[0], room_id))
+            node = parent
+
+        return route[::-1]
+
+    def refine(self, maze: Maze, portals: list[Portal], route: list[tuple[int, int]], sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        '''
+        Pixels of the route. A state is a pixel of one segment of the route (portal -> next
+        portal), the segment is searched only inside its room or door and with the keys collected
+        before it, and a pixel of the next portal moves on to the next segment. A* over these
+        states finds the shortest path along the route without a store for the whole maze.
+        '''
+        stats = self.stats
+        adjacency = maze.compile()
+        offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+        key_required = adjacency.key_required
+        room_labels = maze.split_rooms().labels
+        zone_labels = maze.classify().labels
+        types = maze.grid.types
+
+        start_node = portals[0].pixels[0]
+        end_coord = maze.get_end()
+        end_node = maze.index(end_coord)
+        heuristic_scale = maze.min_cost
+
+        # A key no door after it needs is only on the route because a portal is crossed for free
+        # in the abstract graph, the two segments around it (in its room) are joined into one
+        needed = 0
+        kept: list[tuple[int, int]] = []
+        for portal_id, room_id in reversed(route):
+            portal = portals[portal_id]
+            if portal.type == PixelType.KEY and not portal.key_mask & needed: continue
+            if portal.type == PixelType.ZONE:
+                needed |= portal.key_mask
+            kept.append((portal_id, room_id))
+
+        # For every segment: the room (0 for a link), the doors of a link, the key combination
+        # and the pixels of the portals it goes from and to
+        segments: list[tuple[int, tuple[int, int], int, set[int], set[int]]] = []
+        comb = START_KEY_COMB.comb
+        source_id = 0
+        for portal_id, room_id in reversed(kept):
+            source, target = portals[source_id], portals[portal_id]
+            segments.append((room_id, (source.door, target.door), comb, set(source.pixels), set(target.pixels)))
+            if target.type == PixelType.KEY:
+                comb |= target.key_mask
+            source_id = portal_id
+        last = len(segments) - 1
+
+        # Pixel -> distance and pixel -> the pixel it was reached from, for every segment. A pixel
+        # without a parent was reached by the segment before
+        distances: list[dict[int, float]] = [dict() for _ in segments]
+        parents: list[dict[int, int]] = [dict() for _ in segments]
+        distances[0][start_node] = 0
+
+        # (f-score, minus the segment, distance, pixel)
+        nodes_to_visit: list[tuple[float, int, float, int]] = [(0, 0, 0, start_node)]
+        stats.pushes += 1
+        min_end_dist: Optional[float] = None
+
+        while nodes_to_visit:
+            _, segment, current_dist, current_node = heapq.heappop(nodes_to_visit)
+            segment = -segment
+            if current_dist > distances[segment][current_node]: continue
+
+            if segment == last and current_node == end_node:
+                min_end_dist = current_dist
+                break
+
+            stats.expanded += 1
+            if sink is not None:
+                sink.publish(current_node)
+
+            room_id, doors, comb, sources, portal_pixels = segments[segment]
+            if current_node in portal_pixels and segment < last:
+                # Reached the next portal without another step
+                if current_dist < distances[segment + 1].get(current_node, inf):
+                    distances[segment + 1][current_node] = current_dist
+                    parents[segment + 1].pop(current_node, None)
+                    stats.pushes += 1
+                    heapq.heappush(nodes_to_visit, (current_dist + heuristic_scale * self.heuristic(maze.coord(current_node), end_coord), -segment - 1, current_dist, current_node))
+
+            segment_distances, segment_parents = distances[segment], parents[segment]
+            for edge in range(offsets[current_node], offsets[current_node + 1]):
+                adjacent_node = targets[edge]
+                if key_required[edge] & ~comb: continue
+                if room_id:
+                    if room_labels[adjacent_node] != room_id and adjacent_node not in sources and adjacent_node not in portal_pixels: continue
+                elif zone_labels[adjacent_node] not in doors: continue
+
+                distance = current_dist + weights[edge]
+                if distance < segment_distances.get(adjacent_node, inf):
+                    segment_distances[adjacent_node] = distance
+                    segment_parents[adjacent_node] = current_node
+                    stats.pushes += 1
+                    heapq.heappush(nodes_to_visit, (distance + heuristic_scale * self.heuristic(maze.coord(adjacent_node), end_coord), -segment, distance, adjacent_node))
+
+        if sink is not None:
+            sink.flush()
+
+        stats.distances = sum(map(len, distances))
+        if min_end_dist is None:
+            raise MazeException('No path to the end node')
+        stats.cost = min_end_dist
+
+        with self.phase('reconstruct'):
+            # Back from the end through the segments. The end itself is not a part of the path
+            # and the path starts at the last pixel of the start area
+            path: list[Coord] = []
+            index = end_node
+            for segment in range(last, -1, -1):
+                segment_parents, comb = parents[segment], segments[segment][2]
+                while index in segment_parents:
+                    index = segment_parents[index]
+                    path.append(maze.coord(index))
+                    if types[index] == PixelType.START and comb == START_KEY_COMB.comb:
+                        return path[::-1]
+
+            return path[::-1]
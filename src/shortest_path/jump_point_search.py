@@ -0,0 +1,215 @@
+import heapq
+from array import array
+from typing import Callable, Optional
+import pygame
+
+from src.maze import START_KEY_COMB, Coord, Distances, Maze, MazeException, PriorityNode
+from src.maze.adjacency import node_masks
+from src.maze.key_comb import keys_count
+from src.maze.pixel import PixelType
+from src.shortest_path.metrics import manhattan_dist
+from src.shortest_path.a_star import AStar
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.sink import ExpansionSink
+
+# Directions in the order of Maze.get_adjacent_coords, ALL_DIRECTIONS is used for the nodes without a parent direction
+LEFT, UP, DOWN, RIGHT = 0, 1, 2, 3
+ALL_DIRECTIONS = 4
+HORIZONTAL = (LEFT, RIGHT)
+
+class JPS(ShortestPath):
+    '''
+    Jump point search on the 4-connected pixel grid with steps of equal cost. When the cost model
+    of the maze gives different costs to the pixels the runs cannot be jumped over and it falls
+    back to A*.
+
+    Shortest paths are taken in canonical horizontal-first order: a horizontal move may be
+    followed by any move, a vertical move only by another vertical move unless the pixel
+    diagonally behind it is blocked (a forced neighbor). Only the points where such a path can
+    turn are put in the queue and the straight runs of FREE pixels between them are jumped over.
+
+    Jumps stop on the end, on keys that are not collected yet and where a door starts or ends,
+    so every change of the key combination happens at a jump point. All directions are
+    expanded from those points.
+    '''
+
+    def __init__(self, heuristic: Callable[[Coord, Coord], float] = manhattan_dist):
+        self.heuristic = heuristic
+
+    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        step_cost = maze.cost_model.uniform_cost
+        if step_cost is None:
+            a_star = AStar(self.heuristic)
+            path = a_star.run(maze, screen, sink)
+            self.stats = a_star.stats
+            return path
+
+        stats = self.stats = SearchStats()
+        sink = self.expansion_sink(maze, screen, sink)
+        self.prepare_heuristic(maze)
+
+        maze.compile()
+        passable, gained, required = node_masks(maze.grid, maze.classify(), maze.keys)
+        width, height = maze.grid.width, maze.grid.height
+        steps = {LEFT: -height, UP: -1, DOWN: 1, RIGHT: height}
+
+        start_node = maze.index(maze.get_start())
+        end_coord = maze.get_end()
+        end_node = maze.index(end_coord)
+
+        def blocked(index: int, comb: int) -> bool:
+            return not passable[index] or bool(required[index] & ~comb)
+
+        # Key combination -> column -> the vertical jumps (up, down) from every pixel of the column
+        vertical_jumps: dict[int, dict[int, tuple[array, array]]] = dict()
+
+        def jump_column(x: int, comb: int) -> tuple[array, array]:
+            # One pass over the column (and its neighbors) in each direction instead of a scan for every jump
+            first = x * height
+            free = [not blocked(index, comb) for index in range(first, first + height)]
+            left = [not blocked(index, comb) for index in range(first - height, first)] if x > 0 else None
+            right = [not blocked(index, comb) for index in range(first + height, first + 2 * height)] if x < width - 1 else None
+
+            up, down = array('q', [-1]) * height, array('q', [-1]) * height
+            for jumps, step, ys in [(down, 1, range(height - 2, -1, -1)), (up, -1, range(1, height))]:
+                for y in ys:
+                    next_y = y + step
+                    if not free[next_y]: continue
+
+                    index = first + next_y
+                    if index == end_node or gained[index] & ~comb or required[index] != required[index - step] or \
+                        (left is not None and not left[y] and left[next_y]) or (right is not None and not right[y] and right[next_y]):
+                        # Stops here or has a forced neighbor, it could not be reached horizontally first
+                        jumps[y] = index
+                    else:
+                        jumps[y] = jumps[next_y]
+
+            return up, down
+
+        def jump_vertical(index: int, step: int, comb: int) -> int:
+            x, y = divmod(index, height)
+            columns = vertical_jumps.setdefault(comb, dict())
+            if x not in columns:
+                columns[x] = jump_column(x, comb)
+
+            return columns[x][0 if step < 0 else 1][y]
+
+        def jump_horizontal(index: int, step: int, comb: int) -> int:
+            x = index // height
+            direction = 1 if step > 0 else -1
+            while True:
+                x += direction
+                if not 0 <= x < width or blocked(index + step, comb):
+                    return -1
+
+                index += step
+                if index == end_node or gained[index] & ~comb or required[index] != required[index - step]:
+                    return index
+
+                # Turning up or down from here leads to a jump point
+                if jump_vertical(index, -1, comb) != -1 or jump_vertical(index, 1, comb) != -1:
+                    return index
+
+        distances: Distances = maze.new_distances()
+        values, parents, key_bits = distances.values, distances.parents, distances.key_bits
+        comb_mask = (1 << key_bits) - 1
+        values[start_node << key_bits] = 0
+        arrived_from: dict[int, int] = {start_node << key_bits: ALL_DIRECTIONS}
+
+        nodes_to_visit: list[PriorityNode] = [PriorityNode((0, 0, start_node << key_bits | START_KEY_COMB.comb))]
+        stats.pushes += 1
+        min_end_dist: Optional[float] = None
+
+        while nodes_to_visit:
+            current_f_score, current_keys, current_slot = heapq.heappop(nodes_to_visit)
+            current_node, comb = current_slot >> key_bits, current_slot & comb_mask
+
+            if min_end_dist is not None and current_f_score >= min_end_dist:
+                continue
+
+            stats.expanded += 1
+            if sink is not None:
+                sink.publish(current_node)
+
+            current_dist = values[current_slot]
+
+            # Natural and forced successors of the direction the node was reached from
+            direction = arrived_from[current_slot]
+            if direction == ALL_DIRECTIONS:
+                directions = [LEFT, UP, DOWN, RIGHT]
+            elif direction in HORIZONTAL:
+                directions = [direction, UP, DOWN]
+            else:
+                directions = [direction]
+                behind = -steps[direction]
+                x = current_node // height
+                for side, side_step, in_bounds in [(LEFT, -height, x > 0), (RIGHT, height, x < width - 1)]:
+                    if in_bounds and blocked(current_node + side_step + behind, comb) and not blocked(current_node + side_step, comb):
+                        directions.append(side)
+
+            for direction in directions:
+                step = steps[direction]
+                if direction in HORIZONTAL:
+                    jump_node = jump_horizontal(current_node, step, comb)
+                else:
+                    jump_node = jump_vertical(current_node, step, comb)
+                if jump_node == -1: continue
+
+                adjacent_comb = comb | gained[jump_node]
+                slot = jump_node << key_bits | adjacent_comb
+                distance = current_dist + step_cost * (abs(jump_node - current_node) // abs(step))
+
+                if distance < values[slot] and (min_end_dist is None or distance < min_end_dist):
+                    values[slot] = distance
+                    parents[slot] = current_slot
+
+                    # The key combination or the doors may change here so every direction is open again
+                    special = adjacent_comb != comb or required[jump_node] != required[jump_node - step]
+                    arrived_from[slot] = ALL_DIRECTIONS if special else direction
+
+                    if jump_node == end_node:
+                        min_end_dist = distance
+                    else:
+                        priority = distance + step_cost * self.heuristic(maze.coord(jump_node), end_coord)
+                        stats.pushes += 1
+                        heapq.heappush(nodes_to_visit, PriorityNode((priority, -keys_count(adjacent_comb) if adjacent_comb != comb else current_keys, slot)))
+
+        if sink is not None:
+            sink.flush()
+
+        stats.distances = len(distances)
+        if min_end_dist is None:
+            raise MazeException('No path to the end node')
+        stats.cost = min_end_dist
+
+        with self.phase('reconstruct'):
+            return self.get_path(maze, distances, end_node)
+
+    def get_path(self, maze: Maze, distances: Distances, end_node: int) -> list[Coord]:
+        # Same as Maze.get_path but the pixels jumped over between the parents are filled in
+        height = maze.grid.height
+        types = maze.grid.types
+        key_bits = distances.key_bits
+        comb_mask = (1 << key_bits) - 1
+
+        key_comb, _ = min(distances.combinations(end_node), key=lambda comb_dist: comb_dist[1])
+        slots = list(distances.path_to(end_node, key_comb))
+
+        # (pixel, key combination) from the end back to the start
+        states: list[tuple[int, int]] = []
+        for slot, parent_slot in zip(slots, slots[1:]):
+            index, parent_index, parent_comb = slot >> key_bits, parent_slot >> key_bits, parent_slot & comb_mask
+            states.append((index, slot & comb_mask))
+
+            step = height if abs(parent_index - index) >= height else 1
+            step = step if parent_index > index else -step
+            states.extend((pixel, parent_comb) for pixel in range(index + step, parent_index, step))
+        states.append((slots[-1] >> key_bits, slots[-1] & comb_mask))
+
+        path = []
+        for index, comb in states[1:]:
+            path.append(maze.coord(index))
+            if types[index] == PixelType.START and comb == START_KEY_COMB.comb:
+                break
+
+        return path[::-1]
\ No newline at end of file
@@ -0,0 +1,143 @@
+import heapq
+from array import array
+from math import inf
+from typing import Callable, Optional
+
+from src.maze import START_COLOR, Coord, Maze
+from src.maze.adjacency import Adjacency
+
+# Number of landmarks used for one query, see Landmarks.heuristic_to
+ACTIVE_LANDMARKS = 4
+
+class Landmarks:
+    '''
+    Lower bounds of the path cost from precomputed landmark distances (ALT: A*, landmarks and
+    the triangle inequality).
+
+    count landmarks are picked by farthest point selection and the distances from every landmark
+    are kept in one float array per landmark. The distances are taken with every door open and
+    with the cheaper of the two pixels as the cost of a step in either direction, both only make
+    them shorter, so for any key combination and direction of the search
+
+        cost(v, t) >= |d(L, t) - d(L, v)|
+
+    The object is a heuristic for the engines: prepare(maze) builds the tables (once for the
+    same maze) and called with two coords it returns the bound in steps of the cheapest cost,
+    like manhattan_dist.
+    '''
+
+    def __init__(self, maze: Optional[Maze] = None, count: int = 8, first: Optional[Coord] = None) -> None:
+        self.count = count
+        self.first = first
+        self.built_for: Optional[tuple[str, str]] = None
+        self.height = 0
+        self.min_cost = 1.0
+        self.nodes: list[int] = []
+        self.tables: list[array] = []
+
+        if maze is not None:
+            self.prepare(maze)
+
+    def prepare(self, maze: Maze, checkpoint: Optional[Callable[[], None]] = None) -> None:
+        # The engines call it before every search, the tables are built again only for another maze.
+        # checkpoint is called after every table, a stepped search can stop there
+        if self.built_for == (maze.content_hash, maze.weight_model):
+            return
+
+        adjacency = maze.compile()
+        self.height = maze.grid.height
+        self.min_cost = maze.min_cost
+        costs = maze.step_costs()
+
+        if self.first is not None:
+            first_node = maze.index(self.first)
+        else:
+            # The start or, in a maze without one, the first pixel that has a neighbor
+            start = maze.find_color(START_COLOR)
+            first_node = start if start is not None else next(index for index in range(maze.grid.size) if adjacency.edges(index))
+
+        self.nodes = []
+        self.tables = []
+
+        # The first landmark is the farthest pixel from first, every next one the farthest from all before it
+        nearest = self.distances(adjacency, costs, first_node)
+        for _ in range(self.count):
+            node = max(range(len(nearest)), key=lambda index: nearest[index] if nearest[index] != inf else -1)
+            if nearest[node] in (0, inf) and self.nodes:
+                break
+
+            table = self.distances(adjacency, costs, node)
+            self.nodes.append(node)
+            self.tables.append(table)
+            nearest = array('d', map(min, nearest, table))
+            if checkpoint is not None:
+                checkpoint()
+
+        self.built_for = (maze.content_hash, maze.weight_model)
+
+    def distances(self, adjacency: Adjacency, costs: array, source: int) -> array:
+        # Dijkstra over the pixels without the keys, a step costs the cheaper of its two pixels
+        offsets, targets = adjacency.offsets, adjacency.targets
+        distances = array('d', [inf]) * (len(offsets) - 1)
+        distances[source] = 0
+
+        nodes_to_visit: list[tuple[float, int]] = [(0, source)]
+        while nodes_to_visit:
+            current_dist, current_node = heapq.heappop(nodes_to_visit)
+            if current_dist > distances[current_node]: continue
+
+            current_cost = costs[current_node]
+            for edge in range(offsets[current_node], offsets[current_node + 1]):
+                adjacent_node = targets[edge]
+                distance = current_dist + min(current_cost, costs[adjacent_node])
+                if distance < distances[adjacent_node]:
+                    distances[adjacent_node] = distance
+                    heapq.heappush(nodes_to_visit, (distance, adjacent_node))
+
+        return distances
+
+    @property
+    def cache_key(self) -> str:
+        # The tables depend on the maze and on these, see ShortestPath.cache_key
+        return f'Landmarks(count={self.count}, first={self.first})'
+
+    def heuristic_to(self, target: int, source: Optional[int] = None, active: int = ACTIVE_LANDMARKS) -> Callable[[int], float]:
+        '''
+        The bound to one target as a function of the pixel index. With a source only the active
+        landmarks with the best bounds from it are used, the others rarely give a better bound
+        and every landmark is one more lookup for each pushed state.
+        '''
+        # A pixel in another part of the maze than the target gets an infinite bound, it cannot reach it
+        landmarks = [(table, table[target]) for table in self.tables if table[target] != inf]
+        if source is not None:
+            landmarks.sort(key=lambda landmark: -abs(landmark[1] - landmark[0][source]))
+            landmarks = landmarks[:active]
+
+        def bound(index: int) -> float:
+            best = 0.0
+            for table, to_target in landmarks:
+                best = max(best, abs(to_target - table[index]))
+
+            return best
+
+        return bound
+
+    def bound(self, index: int, target: int) -> float:
+        # The largest lower bound of the cost between index and target over all landmarks
+        best = 0.0
+        for table in self.tables:
+            from_index, from_target = table[index], table[target]
+            # Pixels in another part of the maze than the landmark get no bound from it
+            if from_index == inf or from_target == inf: continue
+
+            best = max(best, abs(from_target - from_index))
+
+        return best
+
+    def __call__(self, c1: Coord, c2: Coord) -> float:
+        height = self.height
+        return self.bound(c1[0] * height + c1[1], c2[0] * height + c2[1]) / self.min_cost
+
+
+
+__all__ = ['ACTIVE_LANDMARKS', 'Landmarks']
@@ -0,0 +1,333 @@
+import heapq
+from array import array
+from math import inf
+from typing import Callable, Iterable, Iterator, Optional
+import pygame
+
+from src.maze import END_COLOR, KEY_HEIGHT, KEY_WIDTH, START_COLOR, START_KEY_COMB, Coord, Distances, Maze, MazeException
+from src.maze.adjacency import node_masks
+from src.maze.distances import SparseSlots
+from src.maze.grid import Color
+from src.maze.pixel import PixelType
+from src.shortest_path.metrics import manhattan_dist
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.sink import ExpansionSink
+
+# Masks and step cost of a pixel: passable, gained keys, required keys, cost
+Cell = tuple[int, int, int, float]
+
+class LPAStar(ShortestPath):
+    '''
+    Lifelong planning A*, an A* that keeps its search state to repair it after the maze is edited.
+
+    run plans from scratch. After some pixels are repainted with Maze.set_colors, update_cells
+    puts in the queue only the states whose cost or predecessors changed and repairs the
+    distances from them, so a small edit is planned again in a small number of expansions.
+
+    Every (pixel, key combination) state has its distance g and a one step lookahead
+    rhs = min(g(predecessor) + cost), the states where they differ are in the queue. The
+    parent of a state is the predecessor its rhs came from.
+
+    Edits that touch the start or the end or add, remove or reshape keys change the
+    whole search space, they are planned again from scratch. So are all the edits with a
+    heuristic that has tables of the maze (Landmarks).
+    '''
+
+    def __init__(self, heuristic: Callable[[Coord, Coord], float] = manhattan_dist):
+        self.heuristic = heuristic
+        self.maze: Optional[Maze] = None
+
+    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        self.stats = SearchStats()
+        sink = self.expansion_sink(maze, screen, sink)
+
+        self.plan(maze)
+        return self.replan(sink)
+
+    def update_cells(self, changed_coords: Iterable[Coord], screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        '''
+        Repair the path after the pixels at changed_coords were repainted with Maze.set_colors.
+        The stats count only the work of the repair.
+        '''
+        maze = self.maze
+        if maze is None:
+            raise MazeException('update_cells needs a maze planned by run')
+
+        self.stats = SearchStats()
+        sink = self.expansion_sink(maze, screen, sink)
+
+        # The tables of a heuristic like Landmarks are built from the whole maze, an edit can make them overestimate
+        changed = self.refresh_cells([maze.index(coord) for coord in changed_coords])
+        if changed is None or hasattr(self.heuristic, 'prepare'):
+            self.plan(maze)
+            return self.replan(sink)
+
+        key_bits = self.distances.key_bits
+        gained = self.gained
+        for index in changed:
+            # The states of the pixel and of its neighbors, they are the only ones whose rhs can use it
+            combinations = set(self.combinations(index))
+            for adjacent_index in self.adjacent(index):
+                combinations.update(comb | gained[index] for comb in self.combinations(adjacent_index))
+
+            for comb in combinations:
+                self.update_state(index << key_bits | comb)
+            for adjacent_index in self.adjacent(index):
+                for comb in self.combinations(adjacent_index):
+                    self.update_state(adjacent_index << key_bits | comb)
+
+        return self.replan(sink)
+
+    def plan(self, maze: Maze) -> None:
+        # Copies of the pixel masks that update_cells can change one pixel at a time
+        maze.compile()
+        classification = maze.classify()
+        self.prepare_heuristic(maze)
+        self.maze = maze
+        self.keys = dict(maze.keys)
+        self.passable, self.gained, self.required = node_masks(maze.grid, classification, maze.keys)
+        self.costs = array('d', maze.step_costs())
+        self.types = bytearray(maze.grid.types)
+
+        self.start_node = maze.index(maze.get_start())
+        self.end_coord = maze.get_end()
+        self.end_node = maze.index(self.end_coord)
+        self.heuristic_scale = maze.min_cost
+
+        self.distances: Distances = maze.new_distances()
+        key_bits = self.distances.key_bits
+        self.rhs = array('d', [inf]) * (maze.grid.size << key_bits) if self.distances.dense else SparseSlots(inf)
+        # The reached key combinations of every pixel, the dense arrays are scanned instead
+        self.reached: Optional[dict[int, set[int]]] = None if self.distances.dense else dict()
+        self.end_combinations: set[int] = set()
+
+        self.queue: list[tuple[float, float, int]] = []
+        self.queued: dict[int, tuple[float, float]] = dict()
+
+        self.start_slot = self.start_node << key_bits | START_KEY_COMB.comb
+        self.rhs[self.start_slot] = 0
+        self.push(self.start_slot)
+
+    def replan(self, sink: Optional[ExpansionSink]) -> list[Coord]:
+        stats = self.stats
+        values, rhs, key_bits = self.distances.values, self.rhs, self.distances.key_bits
+
+        while True:
+            top = self.top()
+            if top is None:
+                break
+
+            # Done when the best end state is consistent and nothing in the queue can improve it
+            end_slot = self.best_end()
+            if end_slot != -1 and values[end_slot] == rhs[end_slot] and top[:2] >= (values[end_slot], values[end_slot]):
+                break
+
+            slot = heapq.heappop(self.queue)[2]
+            del self.queued[slot]
+            stats.expanded += 1
+            if sink is not None:
+                sink.publish(slot >> key_bits)
+
+            if values[slot] > rhs[slot]:
+                values[slot] = rhs[slot]
+            else:
+                values[slot] = inf
+                self.update_state(slot)
+
+            for adjacent_slot in self.successors(slot):
+                self.update_state(adjacent_slot)
+
+        if sink is not None:
+            sink.flush()
+
+        stats.distances = len(self.distances)
+        end_slot = self.best_end()
+        if end_slot == -1 or values[end_slot] == inf:
+            raise MazeException('No path to the end node')
+        stats.cost = values[end_slot]
+
+        with self.phase('reconstruct'):
+            return self.get_path(end_slot)
+
+    def key(self, slot: int) -> tuple[float, float]:
+        distance = min(self.distances.values[slot], self.rhs[slot])
+        coord = self.maze.coord(slot >> self.distances.key_bits) # type: ignore # plan sets the maze
+        return distance + self.heuristic_scale * self.heuristic(coord, self.end_coord), distance
+
+    def push(self, slot: int) -> None:
+        key = self.key(slot)
+        self.queued[slot] = key
+        self.stats.pushes += 1
+        heapq.heappush(self.queue, (key[0], key[1], slot))
+
+    def top(self) -> Optional[tuple[float, float, int]]:
+        # Entries of the states that were removed or queued again with another key are skipped
+        queue, queued = self.queue, self.queued
+        while queue and queued.get(queue[0][2]) != queue[0][:2]:
+            heapq.heappop(queue)
+
+        return queue[0] if queue else None
+
+    def best_end(self) -> int:
+        values, rhs = self.distances.values, self.rhs
+        end_slots = [self.end_node << self.distances.key_bits | comb for comb in self.end_combinations]
+        return min(end_slots, key=lambda slot: min(values[slot], rhs[slot]), default=-1)
+
+    def update_state(self, slot: int) -> None:
+        key_bits = self.distances.key_bits
+        index, comb = slot >> key_bits, slot & ((1 << key_bits) - 1)
+        values, rhs = self.distances.values, self.rhs
+
+        if slot != self.start_slot:
+            best, parent = inf, -1
+            if self.passable[index] and not (self.required[index] | self.gained[index]) & ~comb:
+                cost = self.costs[index]
+                for predecessor in self.predecessors(index, comb):
+                    distance = values[predecessor] + cost
+                    if distance < best:
+                        best, parent = distance, predecessor
+
+            rhs[slot] = best
+            self.distances.parents[slot] = parent
+            if best != inf:
+                if self.reached is not None:
+                    self.reached.setdefault(index, set()).add(comb)
+                if index == self.end_node:
+                    self.end_combinations.add(comb)
+
+        self.queued.pop(slot, None)
+        if values[slot] != rhs[slot]:
+            self.push(slot)
+
+    def adjacent(self, index: int) -> Iterator[int]:
+        return self.maze.grid.adjacent_indices(index) # type: ignore # plan sets the maze
+
+    def combinations(self, index: int) -> list[int]:
+        # The key combinations of the pixel with a distance or a lookahead
+        key_bits = self.distances.key_bits
+        if self.reached is not None:
+            return list(self.reached.get(index, ()))
+
+        values, rhs = self.distances.values, self.rhs
+        first = index << key_bits
+        return [slot - first for slot in range(first, first + (1 << key_bits)) if values[slot] != inf or rhs[slot] != inf]
+
+    def successors(self, slot: int) -> Iterator[int]:
+        # The search stops at the end, nothing is reached through it
+        key_bits = self.distances.key_bits
+        index, comb = slot >> key_bits, slot & ((1 << key_bits) - 1)
+        if index == self.end_node:
+            return
+
+        passable, gained, required = self.passable, self.gained, self.required
+        for adjacent_index in self.adjacent(index):
+            if passable[adjacent_index] and not required[adjacent_index] & ~comb:
+                yield adjacent_index << key_bits | comb | gained[adjacent_index]
+
+    def predecessors(self, index: int, comb: int) -> Iterator[int]:
+        # The keys of the pixel may have been collected on it or before it
+        key_bits = self.distances.key_bits
+        gained = self.gained[index]
+        base = comb & ~gained
+        for adjacent_index in self.adjacent(index):
+            if adjacent_index == self.end_node: continue
+
+            subset = gained
+            while True:
+                yield adjacent_index << key_bits | base | subset
+                if not subset: break
+                subset = (subset - 1) & gained
+
+    def refresh_cells(self, indices: list[int]) -> Optional[list[int]]:
+        '''
+        Classify the repainted pixels and the zones around them again. Returns the pixels whose
+        masks or cost changed, None when the change needs a plan from scratch.
+        '''
+        maze = self.maze
+        grid = maze.grid # type: ignore # plan sets the maze
+        colors = grid.colors
+        table, other_cost = maze.cost_model.table, maze.cost_model.other_cost # type: ignore # plan sets the maze
+
+        # A zone split or merged by the change is reached through the neighbors of the repainted pixels
+        candidates = dict.fromkeys(indices)
+        for index in indices:
+            candidates.update(dict.fromkeys(grid.adjacent_indices(index)))
+
+        cells: dict[int, tuple[PixelType, Cell]] = dict()
+        for index in candidates:
+            if index in cells: continue
+
+            if grid.is_grey_at(index):
+                level = colors[3 * index]
+                cells[index] = (PixelType.FREE, (1, 0, 0, table[level])) if level else (PixelType.WALL, (0, 0, 0, 0.0))
+                continue
+
+            color = grid.color_at(index)
+            zone_pixels, zone_type = self.fill_zone(index, color)
+            key_pos = self.keys.get(color)
+            if zone_type == PixelType.KEY:
+                if key_pos is None:
+                    return None
+                cell: Cell = (1, 1 << key_pos, 0, other_cost)
+            elif zone_type == PixelType.ZONE:
+                # Doors without a key anywhere are not passable
+                cell = (0, 0, 0, other_cost) if key_pos is None else (1, 0, 1 << key_pos, other_cost)
+            else:
+                cell = (1, 0, 0, other_cost)
+
+            for pixel in zone_pixels:
+                cells[pixel] = (zone_type, cell)
+
+        changed = []
+        passable, gained, required, costs, types = self.passable, self.gained, self.required, self.costs, self.types
+        for index, (pixel_type, (is_passable, gained_mask, required_mask, cost)) in cells.items():
+            if pixel_type != types[index] and {pixel_type, types[index]} & {PixelType.START, PixelType.END}:
+                return None
+            if gained_mask != gained[index]:
+                return None
+
+            if (is_passable, required_mask, cost) != (passable[index], required[index], costs[index]):
+                passable[index], required[index], costs[index] = is_passable, required_mask, cost
+                changed.append(index)
+            types[index] = pixel_type
+
+        return changed
+
+    def fill_zone(self, index: int, color: Color) -> tuple[list[int], PixelType]:
+        # The same 4-connected zone of one color as classify finds
+        grid = self.maze.grid # type: ignore # plan sets the maze
+        pattern = grid.colors[3 * index:3 * index + 3]
+        zone_pixels = [index]
+        seen = {index}
+        wave = [index]
+        while wave:
+            for adjacent_index in grid.adjacent_indices(wave.pop()):
+                if adjacent_index in seen or grid.colors[3 * adjacent_index:3 * adjacent_index + 3] != pattern: continue
+                seen.add(adjacent_index)
+                zone_pixels.append(adjacent_index)
+                wave.append(adjacent_index)
+
+        if color == START_COLOR:
+            return zone_pixels, PixelType.START
+        if color == END_COLOR:
+            return zone_pixels, PixelType.END
+
+        xs = [pixel // grid.height for pixel in zone_pixels]
+        ys = [pixel % grid.height for pixel in zone_pixels]
+        if (max(xs) - min(xs) + 1 == KEY_WIDTH and max(ys) - min(ys) + 1 == KEY_HEIGHT and
+            len(zone_pixels) == KEY_WIDTH * KEY_HEIGHT):
+            return zone_pixels, PixelType.KEY
+        return zone_pixels, PixelType.ZONE
+
+    def get_path(self, end_slot: int) -> list[Coord]:
+        # Same as Maze.get_path, the types of the repainted pixels are only kept here
+        key_bits = self.distances.key_bits
+        comb_mask = (1 << key_bits) - 1
+        path = []
+        for slot in list(self.distances.path_to(end_slot >> key_bits, end_slot & comb_mask))[1:]:
+            index = slot >> key_bits
+            path.append(self.maze.coord(index)) # type: ignore # plan sets the maze
+            if self.types[index] == PixelType.START and slot & comb_mask == START_KEY_COMB.comb:
+                break
+
+        return path[::-1]
@@ -0,0 +1,182 @@
+import heapq
+import itertools
+import os
+import tempfile
+from dataclasses import dataclass
+from functools import partial
+from math import inf
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from operator import itemgetter
+from typing import Iterable, Optional
+
+from src.maze import Coord, Maze, MazeException
+from src.maze.adjacency import node_masks
+from src.maze.compiled import EXTENSION as COMPILED_EXTENSION
+from src.maze.distances import DistanceStore
+from src.shortest_path.landmarks import Landmarks
+from src.shortest_path.metrics import manhattan_dist
+
+Query = tuple[Coord, Coord]
+# A start with the ends of its queries and their positions
+Group = tuple[Coord, list[tuple[int, Coord]]]
+
+@dataclass
+class QueryResult:
+    start: Coord
+    end: Coord
+    # The pixels from the start to the end (both included), None when the end cannot be reached
+    path: Optional[list[Coord]]
+    cost: float = inf
+    # Number of states expanded by the search that answered the query, shared by the queries of one start
+    expanded: int = 0
+
+class MultiQuery:
+    '''
+    Shortest paths between any pixels of one maze.
+
+    The classification, the adjacency and the landmarks are built once for all the queries.
+    The queries are grouped by their start: a group with a single end is answered by A*, with
+    the landmark bounds when there are landmarks, and a group with more ends by one Dijkstra
+    tree that stops when all of them are reached.
+
+    The search starts with the keys of the start pixel and can pass through the ends of
+    other queries.
+    '''
+
+    def __init__(self, maze: Maze, landmarks: Optional[Landmarks] = None) -> None:
+        self.maze = maze
+        self.landmarks = landmarks
+        maze.compile()
+        self.passable, self.gained, _ = node_masks(maze.grid, maze.classify(), maze.keys)
+
+    def solve(self, pairs: Iterable[Query]) -> list[QueryResult]:
+        return in_order(solve_group(self, group) for group in group_by_start(pairs))
+
+    def solve_from(self, start: Coord, ends: list[Coord]) -> list[QueryResult]:
+        maze = self.maze
+        for coord in [start, *ends]:
+            if coord not in maze.map:
+                raise MazeException(f'Invalid map coords: {coord}')
+
+        adjacency = maze.compile()
+        offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+        key_set, key_required = adjacency.key_set, adjacency.key_required
+        passable, gained = self.passable, self.gained
+
+        start_node = maze.index(start)
+        remaining = {maze.index(end) for end in ends if passable[maze.index(end)]}
+
+        # Only the goal directed searches reach few enough states to keep them in a dict
+        single_end = len(remaining) == 1
+        distances = DistanceStore(maze.grid.size, len(maze.keys), dense_limit=0 if single_end else None)
+        values, parents, key_bits = distances.values, distances.parents, distances.key_bits
+
+        if single_end:
+            end_node = next(iter(remaining))
+            end_coord = maze.coord(end_node)
+            heuristic_scale = maze.min_cost
+            if self.landmarks is not None:
+                heuristic = self.landmarks.heuristic_to(end_node, start_node)
+            else:
+                def heuristic(node: int) -> float:
+                    return heuristic_scale * manhattan_dist(maze.coord(node), end_coord)
+        else:
+            def heuristic(node: int) -> float:
+                return 0
+
+        # The end of every query and the slot it was first reached with
+        found: dict[int, int] = dict()
+        expanded = 0
+        if passable[start_node]:
+            start_slot = start_node << key_bits | gained[start_node]
+            values[start_slot] = 0
+            nodes_to_visit: list[tuple[float, float, int]] = [(heuristic(start_node), 0, start_slot)]
+        else:
+            nodes_to_visit = []
+
+        while nodes_to_visit and remaining:
+            _, current_dist, current_slot = heapq.heappop(nodes_to_visit)
+            if current_dist > values[current_slot]: continue
+
+            expanded += 1
+            current_node, comb = current_slot >> key_bits, current_slot & ((1 << key_bits) - 1)
+            if current_node in remaining:
+                found[current_node] = current_slot
+                remaining.discard(current_node)
+
+            for edge in range(offsets[current_node], offsets[current_node + 1]):
+                if key_required[edge] & ~comb: continue
+
+                adjacent_node = targets[edge]
+                slot = adjacent_node << key_bits | comb | key_set[edge]
+                distance = current_dist + weights[edge]
+                if distance < values[slot]:
+                    values[slot] = distance
+                    parents[slot] = current_slot
+                    heapq.heappush(nodes_to_visit, (distance + heuristic(adjacent_node), distance, slot))
+
+        results = []
+        for end in ends:
+            slot = found.get(maze.index(end))
+            if slot is None:
+                results.append(QueryResult(start, end, None, expanded=expanded))
+                continue
+
+            path = [maze.coord(path_slot >> key_bits) for path_slot in distances.path_to(slot >> key_bits, slot & ((1 << key_bits) - 1))]
+            results.append(QueryResult(start, end, path[::-1], values[slot], expanded))
+
+        return results
+
+def group_by_start(pairs: Iterable[Query]) -> list[Group]:
+    # The ends of every start with the positions of their queries
+    groups: dict[Coord, list[tuple[int, Coord]]] = dict()
+    for position, (start, end) in enumerate(pairs):
+        groups.setdefault(start, []).append((position, end))
+
+    return list(groups.items())
+
+def solve_group(solver: MultiQuery, group: Group) -> list[tuple[int, QueryResult]]:
+    start, ends = group
+    return list(zip((position for position, _ in ends), solver.solve_from(start, [end for _, end in ends])))
+
+def in_order(answered: Iterable[list[tuple[int, QueryResult]]]) -> list[QueryResult]:
+    return [result for _, result in sorted(itertools.chain.from_iterable(answered), key=itemgetter(0))]
+
+# The solver of a worker process, see solve_many
+_solver: Optional[MultiQuery] = None
+
+def _init_worker(file_name: str, landmarks: Optional[Landmarks]) -> None:
+    global _solver
+    _solver = MultiQuery(Maze.load_compiled(file_name), landmarks)
+
+def _solve_in_worker(group: Group) -> list[tuple[int, QueryResult]]:
+    return solve_group(_solver, group) # type: ignore # set by _init_worker
+
+def solve_many(maze: Maze, pairs: Iterable[Query], landmarks: int = 0, workers: Optional[int] = None, processes: bool = False) -> list[QueryResult]:
+    '''
+    Answer the (start, end) queries, the results are in the order of the pairs.
+
+    The groups of queries with the same start are split between worker threads, or between
+    processes when processes is set. The processes map the maze compiled to a temporary file
+    and get the landmarks built here.
+    '''
+    solver = MultiQuery(maze, Landmarks(maze, landmarks) if landmarks else None)
+    groups = group_by_start(pairs)
+
+    if workers == 1:
+        return in_order(solve_group(solver, group) for group in groups)
+
+    if not processes:
+        with ThreadPool(workers or os.cpu_count()) as pool:
+            return in_order(pool.map(partial(solve_group, solver), groups))
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'maze' + COMPILED_EXTENSION)
+        maze.save_compiled(file_name)
+        with Pool(workers or os.cpu_count(), _init_worker, (file_name, solver.landmarks)) as pool:
+            return in_order(pool.map(_solve_in_worker, groups))
+
+
+
+__all__ = ['Query', 'QueryResult', 'MultiQuery', 'group_by_start', 'solve_group', 'solve_many']
@@ -0,0 +1,212 @@
+import heapq
+import os
+import tempfile
+from array import array
+from dataclasses import dataclass, field
+from math import inf
+from multiprocessing import current_process
+from multiprocessing.pool import Pool
+from typing import Optional
+import pygame
+
+from src.maze import START_KEY_COMB, Coord, Maze, MazeException
+from src.maze.compiled import EXTENSION as COMPILED_EXTENSION
+from src.maze.key_comb import keys_count
+from src.maze.pixel import PixelType
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.sink import ExpansionSink
+
+# Pixel -> (distance, parent slot) of the states a layer starts from
+Seeds = dict[int, tuple[float, int]]
+
+@dataclass
+class LayerResult:
+    comb: int
+    # The pixels reached in the layer and the slots they were reached from, parallel arrays
+    nodes: array = field(default_factory=lambda: array('q'))
+    parents: array = field(default_factory=lambda: array('q'))
+    # (key combination, pixel, distance, parent slot) of the steps onto new keys
+    boundary: list[tuple[int, int, float, int]] = field(default_factory=list)
+    # Distance of the end in the layer
+    end_distance: float = inf
+    expanded: int = 0
+    pushes: int = 0
+
+def expand_layer(maze: Maze, comb: int, seeds: Seeds, bound: float) -> LayerResult:
+    '''
+    Dijkstra over the pixels with one key combination, from seeds reached in the layers with
+    fewer keys. A step that picks up a new key leaves the layer and is returned as a seed of
+    the next one, nothing at or over bound (the best end found so far) is expanded.
+    '''
+    adjacency = maze.compile()
+    offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+    key_set, key_required = adjacency.key_set, adjacency.key_required
+    end_node = maze.index(maze.get_end())
+    key_bits = len(maze.keys)
+
+    result = LayerResult(comb)
+    values = array('d', [inf]) * maze.grid.size
+    parents: dict[int, int] = dict()
+    nodes_to_visit: list[tuple[float, int]] = []
+    for node, (distance, parent) in seeds.items():
+        values[node] = distance
+        parents[node] = parent
+        nodes_to_visit.append((distance, node))
+    heapq.heapify(nodes_to_visit)
+    result.pushes = len(nodes_to_visit)
+
+    while nodes_to_visit:
+        current_dist, current_node = heapq.heappop(nodes_to_visit)
+        if current_dist > values[current_node] or current_dist >= bound: continue
+
+        result.expanded += 1
+        current_slot = current_node << key_bits | comb
+        for edge in range(offsets[current_node], offsets[current_node + 1]):
+            if key_required[edge] & ~comb: continue
+
+            adjacent_node = targets[edge]
+            distance = current_dist + weights[edge]
+            if distance >= bound: continue
+
+            if key_set[edge] & ~comb:
+                result.boundary.append((comb | key_set[edge], adjacent_node, distance, current_slot))
+            elif distance < values[adjacent_node]:
+                values[adjacent_node] = distance
+                parents[adjacent_node] = current_slot
+
+                # There is no need to go on from the end
+                if adjacent_node == end_node:
+                    bound = distance
+                else:
+                    result.pushes += 1
+                    heapq.heappush(nodes_to_visit, (distance, adjacent_node))
+
+    result.nodes.extend(parents.keys())
+    result.parents.extend(parents.values())
+    result.end_distance = values[end_node]
+
+    return result
+
+# The maze of a worker process, see ParallelLayers.run
+_maze: Optional[Maze] = None
+
+def _init_worker(file_name: str) -> None:
+    global _maze
+    _maze = Maze.load_compiled(file_name)
+
+def _expand_in_worker(task: tuple[int, Seeds, float]) -> LayerResult:
+    return expand_layer(_maze, *task) # type: ignore # set by _init_worker
+
+class ParallelLayers(ShortestPath):
+    '''
+    Dijkstra over the key combinations one layer at a time.
+
+    Keys are only ever picked up, so a layer (the pixels with one key combination) is entered
+    only from the layers with fewer keys. The search runs in rounds: round k expands all the
+    layers with k keys, each on its own in a worker process, and the steps onto new keys they
+    return are the seeds of the next rounds. The workers map the maze compiled to a temporary
+    file, so they share its read-only pages. The layers stay as the workers returned them,
+    only the parents of the layers on the path are looked up at the end.
+
+    A layer is never split between the workers, so only the mazes where several layers have
+    the same number of keys (keys that can be picked up in any order) run in parallel. When the
+    keys have to be collected in order every round has one layer and the search is as fast as
+    Dijkstra. With a single worker (workers=1 or one CPU), a single layer per round or inside
+    a daemonic process (a worker of another pool cannot start its own) the layers are expanded
+    in this process.
+    '''
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers
+
+    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        stats = self.stats = SearchStats()
+        sink = self.expansion_sink(maze, screen, sink)
+        maze.compile()
+
+        start_node = maze.index(maze.get_start())
+        end_node = maze.index(maze.get_end())
+        key_bits = len(maze.keys)
+
+        pending: dict[int, Seeds] = {START_KEY_COMB.comb: {start_node: (0, -1)}}
+        layers: dict[int, LayerResult] = dict()
+        best_end = inf
+        end_comb = START_KEY_COMB.comb
+        workers = 1 if current_process().daemon else self.workers or os.cpu_count() or 1
+
+        with tempfile.TemporaryDirectory() as directory:
+            # Created for the first round with more than one layer
+            pool: Optional[Pool] = None
+            try:
+                while pending:
+                    # The layers with the fewest keys have all their seeds
+                    keys = min(keys_count(comb) for comb in pending)
+                    tasks = [(comb, pending.pop(comb), best_end) for comb in sorted(pending) if keys_count(comb) == keys]
+
+                    if len(tasks) > 1 and workers > 1:
+                        if pool is None:
+                            file_name = os.path.join(directory, 'maze' + COMPILED_EXTENSION)
+                            maze.save_compiled(file_name)
+                            pool = Pool(min(workers, len(tasks)), _init_worker, (file_name,))
+                        results = pool.map(_expand_in_worker, tasks)
+                    else:
+                        results = [expand_layer(maze, *task) for task in tasks]
+
+                    for result in results:
+                        stats.expanded += result.expanded
+                        stats.pushes += result.pushes
+                        stats.distances += len(result.nodes)
+                        layers[result.comb] = result
+                        if sink is not None:
+                            for node in result.nodes:
+                                sink.publish(node)
+                        if result.end_distance < best_end:
+                            best_end, end_comb = result.end_distance, result.comb
+
+                    # The seeds of the next layers, only the best one for every pixel
+                    for result in results:
+                        for comb, node, distance, parent in result.boundary:
+                            seeds = pending.setdefault(comb, dict())
+                            if distance < seeds.get(node, (inf, -1))[0]:
+                                seeds[node] = (distance, parent)
+
+                    # A layer starts no closer than its nearest seed
+                    for comb in list(pending):
+                        seeds = {node: seed for node, seed in pending[comb].items() if seed[0] < best_end}
+                        if seeds:
+                            pending[comb] = seeds
+                        else:
+                            del pending[comb]
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+
+        if sink is not None:
+            sink.flush()
+
+        if best_end == inf:
+            raise MazeException('No path to the end node')
+        stats.cost = best_end
+
+        with self.phase('reconstruct'):
+            # Back from the end through the parents of the layers, the end itself is not a part
+            # of the path and the path starts at the last pixel of the start area
+            types = maze.grid.types
+            comb_mask = (1 << key_bits) - 1
+            layer_parents: dict[int, dict[int, int]] = dict()
+            path: list[Coord] = []
+            node, comb = end_node, end_comb
+            while True:
+                if comb not in layer_parents:
+                    layer_parents[comb] = dict(zip(layers[comb].nodes, layers[comb].parents))
+                slot = layer_parents[comb][node]
+                if slot == -1:
+                    break
+
+                node, comb = slot >> key_bits, slot & comb_mask
+                path.append(maze.coord(node))
+                if types[node] == PixelType.START and comb == START_KEY_COMB.comb:
+                    break
+
+            return path[::-1]
@@ -0,0 +1,98 @@
+import json
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from time import perf_counter
+from typing import Callable, Iterator, Optional
+import pygame
+
+from src.maze import Coord, Maze
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.sink import ExpansionSink
+
+# Changes when the fields of Profile change, so exported profiles of different versions are not mixed up
+PROFILE_VERSION = 1
+
+@dataclass
+class Profile:
+    algorithm: str
+    # Seconds spent in every phase: load (timed by the caller), classify, compile, search and reconstruct
+    phases: dict[str, float] = field(default_factory=dict)
+    stats: SearchStats = field(default_factory=SearchStats)
+    # Areas labelled by the flood fills of classify or set_area_at during the run and their pixels
+    flood_fills: int = 0
+    filled_pixels: int = 0
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict[str, object]:
+        return {'version': PROFILE_VERSION, **asdict(self)}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+class Profiler:
+    '''
+    Opt-in instrumentation of the searches.
+
+    run times the phases of one search and passes its Profile to the callback. Without a
+    profiler the engines only pay for the counters of SearchStats, ShortestPath.phase does
+    nothing. Phases timed outside of run (like loading the maze) go to the next profile:
+
+        profiler = Profiler(lambda profile: print(profile.to_json()))
+        with profiler.phase('load'):
+            maze = Maze(image)
+        profiler.run(AStar(), maze)
+    '''
+
+    def __init__(self, callback: Optional[Callable[[Profile], None]] = None) -> None:
+        self.callback = callback
+        self.profiles: list[Profile] = []
+        self.current: Optional[Profile] = None
+        # Phases timed before the next run
+        self.pending: dict[str, float] = dict()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        phases = self.current.phases if self.current is not None else self.pending
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            phases[name] = phases.get(name, 0) + perf_counter() - start_time
+
+    def run(self, algorithm: ShortestPath, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        profile = self.current = Profile(algorithm.name, phases=self.pending)
+        self.pending = dict()
+        flood_fills, filled_pixels = maze.flood_fills, maze.filled_pixels
+
+        try:
+            # Done by the engines anyway, here they are timed on their own
+            with self.phase('classify'):
+                maze.classify()
+            with self.phase('compile'):
+                maze.compile()
+
+            algorithm.profiler = self
+            profile.phases['search'] = 0
+            start_time = perf_counter()
+            try:
+                return algorithm.run(maze, screen, sink)
+            finally:
+                # The engine times the reconstruction of the path itself
+                profile.phases['search'] = perf_counter() - start_time - profile.phases.get('reconstruct', 0)
+        except Exception as e:
+            profile.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            algorithm.profiler = None
+            self.current = None
+
+            profile.stats = SearchStats(**asdict(algorithm.stats))
+            profile.flood_fills = maze.flood_fills - flood_fills
+            profile.filled_pixels = maze.filled_pixels - filled_pixels
+            self.profiles.append(profile)
+            if self.callback is not None:
+                self.callback(profile)
+
+
+
+__all__ = ['PROFILE_VERSION', 'Profile', 'Profiler']
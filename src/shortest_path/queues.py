@@ -0,0 +1,180 @@
+import heapq
+from abc import ABC, abstractmethod
+
+from src.maze.key_comb import POPCOUNT, keys_count
+
+class SearchQueue(ABC):
+    '''
+    Priority queue of the search states. A state is its distance slot (index << key_bits | comb).
+
+    A state pushed again with a better priority replaces the old entry, pop never returns an
+    entry that was replaced (stale). stale counts the entries that were dropped for that.
+    '''
+
+    def __init__(self, key_bits: int) -> None:
+        self.comb_mask = (1 << key_bits) - 1
+        self.stale = 0
+
+    @abstractmethod
+    def push(self, priority: float, slot: int) -> None:
+        pass
+
+    @abstractmethod
+    def pop(self) -> tuple[float, int]:
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def keys_count(self, slot: int) -> int:
+        # Equal priorities pop the states with more keys first, they are closer to the doors
+        comb = slot & self.comb_mask
+        return POPCOUNT[comb] if comb < 256 else keys_count(comb)
+
+class HeapQueue(SearchQueue):
+    '''
+    heapq with lazy deletion: the replaced entries stay in the heap and are skipped when popped.
+    '''
+
+    def __init__(self, key_bits: int) -> None:
+        super().__init__(key_bits)
+        self.heap: list[tuple[float, int, int]] = []
+        # Priority of the live entry of every queued state
+        self.queued: dict[int, float] = dict()
+
+    def push(self, priority: float, slot: int) -> None:
+        self.queued[slot] = priority
+        comb = slot & self.comb_mask
+        heapq.heappush(self.heap, (priority, -(POPCOUNT[comb] if comb < 256 else keys_count(comb)), slot))
+
+    def pop(self) -> tuple[float, int]:
+        heap, queued = self.heap, self.queued
+        while True:
+            priority, _, slot = heapq.heappop(heap)
+            if queued.get(slot) == priority:
+                del queued[slot]
+                return priority, slot
+
+            self.stale += 1
+
+    def __len__(self) -> int:
+        return len(self.queued)
+
+class IndexedHeapQueue(SearchQueue):
+    '''
+    Binary heap with the position of every state, a better priority moves the entry up
+    (decrease-key) so the heap never holds more than one entry per state.
+    '''
+
+    def __init__(self, key_bits: int) -> None:
+        super().__init__(key_bits)
+        self.heap: list[tuple[float, int, int]] = []
+        self.positions: dict[int, int] = dict()
+
+    def push(self, priority: float, slot: int) -> None:
+        entry = (priority, -self.keys_count(slot), slot)
+        position = self.positions.get(slot)
+        if position is None:
+            self.heap.append(entry)
+            self.sift_up(len(self.heap) - 1)
+        elif entry < self.heap[position]:
+            self.heap[position] = entry
+            self.sift_up(position)
+
+    def pop(self) -> tuple[float, int]:
+        heap, positions = self.heap, self.positions
+        priority, _, slot = heap[0]
+        del positions[slot]
+
+        last = heap.pop()
+        if heap:
+            heap[0] = last
+            self.sift_down(0)
+
+        return priority, slot
+
+    def sift_up(self, position: int) -> None:
+        heap, positions = self.heap, self.positions
+        entry = heap[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if not entry < heap[parent]:
+                break
+            heap[position] = heap[parent]
+            positions[heap[position][2]] = position
+            position = parent
+
+        heap[position] = entry
+        positions[entry[2]] = position
+
+    def sift_down(self, position: int) -> None:
+        heap, positions = self.heap, self.positions
+        size = len(heap)
+        entry = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[position] = heap[child]
+            positions[heap[position][2]] = position
+            position = child
+
+        heap[position] = entry
+        positions[entry[2]] = position
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+class BucketQueue(SearchQueue):
+    '''
+    One bucket (a stack) for every distinct priority and a heap of the priorities that have one.
+
+    With unit steps the searches have few distinct priorities, so most pushes and pops are a
+    list append and pop instead of a heap operation. The states of one bucket pop in last in
+    first out order, not by the number of keys.
+    '''
+
+    def __init__(self, key_bits: int) -> None:
+        super().__init__(key_bits)
+        self.buckets: dict[float, list[int]] = dict()
+        self.priorities: list[float] = []
+        self.queued: dict[int, float] = dict()
+
+    def push(self, priority: float, slot: int) -> None:
+        self.queued[slot] = priority
+        bucket = self.buckets.get(priority)
+        if bucket is None:
+            self.buckets[priority] = [slot]
+            heapq.heappush(self.priorities, priority)
+        else:
+            bucket.append(slot)
+
+    def pop(self) -> tuple[float, int]:
+        buckets, priorities, queued = self.buckets, self.priorities, self.queued
+        while True:
+            priority = priorities[0]
+            bucket = buckets[priority]
+            slot = bucket.pop()
+            if not bucket:
+                del buckets[priority]
+                heapq.heappop(priorities)
+
+            if queued.get(slot) == priority:
+                del queued[slot]
+                return priority, slot
+
+            self.stale += 1
+
+    def __len__(self) -> int:
+        return len(self.queued)
+
+QUEUES: dict[str, type[SearchQueue]] = {'heap': HeapQueue, 'indexed': IndexedHeapQueue, 'bucket': BucketQueue}
+
+
+
+__all__ = ['SearchQueue', 'HeapQueue', 'IndexedHeapQueue', 'BucketQueue', 'QUEUES']
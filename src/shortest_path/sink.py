@@ -0,0 +1,123 @@
+from collections import deque
+from threading import Semaphore
+from time import perf_counter
+from typing import Optional
+import pygame
+
+from src.maze import ITERATION_NODE_COLOR, Maze
+
+FRAME_RATE = 60
+# Expanded nodes in one slice of a search run step by step, see ShortestPath.steps
+SLICE_EXPANSIONS = 1000
+
+class SearchCancelled(Exception):
+    def __init__(self, msg: str) -> None:
+        super().__init__(msg)
+
+class ExpansionSink:
+    '''
+    Buffer of the nodes (pixel indices) expanded by a search.
+
+    The search only appends to it, so it can run in another thread while the
+    visualizer drains the buffer and draws it at its own frame rate.
+    '''
+
+    def __init__(self) -> None:
+        self.expansions: deque[int] = deque()
+
+    def publish(self, index: int) -> None:
+        self.expansions.append(index)
+
+    def drain(self, limit: Optional[int] = None) -> list[int]:
+        expansions = self.expansions
+        count = len(expansions) if limit is None else min(limit, len(expansions))
+        return [expansions.popleft() for _ in range(count)]
+
+    def flush(self) -> None:
+        # Called by the search when it is done
+        pass
+
+class ScreenSink(ExpansionSink):
+    '''
+    Draws the expanded nodes directly on the screen from the searching thread,
+    at most once per frame and with one display update for all of them.
+    '''
+
+    def __init__(self, maze: Maze, screen: pygame.surface.Surface, frame_rate: int = FRAME_RATE) -> None:
+        super().__init__()
+        self.maze = maze
+        self.screen = screen
+        self.interval = 1 / frame_rate
+        self.last_draw = perf_counter()
+
+    def publish(self, index: int) -> None:
+        self.expansions.append(index)
+
+        if perf_counter() - self.last_draw >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        maze = self.maze
+        maze.draw_nodes(self.screen, [maze.coord(index) for index in self.drain()], ITERATION_NODE_COLOR)
+        self.last_draw = perf_counter()
+
+class SteppingSink(ExpansionSink):
+    '''
+    Lets a search run only one slice at a time.
+
+    After every `expansions` published nodes the searching thread waits until resume is called,
+    the other thread waits for the slice in wait_slice. Only one of them runs at a time, so the
+    search can be paused between the slices and cancelled: after cancel the next publish raises
+    SearchCancelled, which unwinds the search from any engine.
+
+    Parts of a search that publish nothing (compiling the maze, building the portals) call
+    checkpoint instead, it ends the slice early when a frame has passed since the last one.
+    '''
+
+    def __init__(self, expansions: int = SLICE_EXPANSIONS, frame_rate: int = FRAME_RATE) -> None:
+        super().__init__()
+        self.expansions_per_slice = expansions
+        self.count = 0
+        self.cancelled = False
+        self.done = False
+        self.slice_ready = Semaphore(0)
+        self.resumed = Semaphore(0)
+        self.interval = 1 / frame_rate
+        self.last_resume = perf_counter()
+
+    def publish(self, index: int) -> None:
+        self.expansions.append(index)
+        self.count += 1
+        if self.count >= self.expansions_per_slice:
+            self.pause()
+
+    def checkpoint(self) -> None:
+        if perf_counter() - self.last_resume >= self.interval:
+            self.pause()
+
+    def pause(self) -> None:
+        # Hands the slice to the other thread and waits until it resumes or cancels the search
+        self.count = 0
+        self.slice_ready.release()
+        self.resumed.acquire()
+        self.last_resume = perf_counter()
+
+        if self.cancelled:
+            raise SearchCancelled('The search was cancelled')
+
+    def finish(self) -> None:
+        # Called by the searching thread when the search is over, with or without a path
+        self.done = True
+        self.slice_ready.release()
+
+    def wait_slice(self) -> None:
+        self.slice_ready.acquire()
+
+    def resume(self) -> None:
+        self.resumed.release()
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        self.resumed.release()
+
+__all__ = ['FRAME_RATE', 'SLICE_EXPANSIONS', 'SearchCancelled', 'ExpansionSink', 'ScreenSink', 'SteppingSink']
@@ -0,0 +1,172 @@
+from itertools import compress
+from typing import Optional
+import pygame
+
+from src.maze import START_KEY_COMB, Coord, Distances, Maze, MazeException
+from src.maze.adjacency import node_masks
+from src.shortest_path.abstract_shortest_path import SearchStats, ShortestPath
+from src.shortest_path.dijkstra import Dijkstra
+from src.shortest_path.sink import ExpansionSink
+
+# Pixel flags (0 or 1) -> the digits of a binary number
+BIT_DIGITS = b'0' + b'1' * 255
+
+def to_bits(flags: bytes) -> int:
+    # Bit i of the result is set when flags[i] is not 0
+    return int(flags.translate(BIT_DIGITS)[::-1], 2) if flags else 0
+
+def bit_indices(bits: int) -> list[int]:
+    # The set bits of a bit set, found with str.find instead of testing every bit
+    digits = format(bits, 'b')
+    last = len(digits) - 1
+    indices = []
+    position = digits.find('1')
+    while position != -1:
+        indices.append(last - position)
+        position = digits.find('1', position + 1)
+
+    return indices
+
+class WavefrontBFS(ShortestPath):
+    '''
+    Breadth-first search that expands a whole frontier at once, for mazes where every step
+    costs the same. When the cost model of the maze gives different costs to the pixels it
+    falls back to Dijkstra.
+
+    The pixels are bit sets in Python ints (bit i is the pixel with index i), so one level of
+    the search is a few shifts and masks over all the pixels:
+
+        next = grow(frontier) & allowed & ~visited
+
+    There is a frontier and a visited set for every key combination reached so far. allowed
+    of a combination leaves out the doors it cannot open and the keys it does not have yet,
+    the pixels of such a key reached from the frontier go to the combination with the key at
+    the same level. The search stops at the first level that reaches the end.
+
+    The distances of all the reached states are written to the distance store, the path is
+    then read back from them: a state at level d was reached from a neighbor at level d - 1.
+    '''
+
+    def run(self, maze: Maze, screen: Optional[pygame.surface.Surface] = None, sink: Optional[ExpansionSink] = None) -> list[Coord]:
+        step_cost = maze.cost_model.uniform_cost
+        if step_cost is None:
+            dijkstra = Dijkstra()
+            path = dijkstra.run(maze, screen, sink)
+            self.stats = dijkstra.stats
+            return path
+
+        stats = self.stats = SearchStats()
+        sink = self.expansion_sink(maze, screen, sink)
+
+        adjacency = maze.compile()
+        passable, gained, required = node_masks(maze.grid, maze.classify(), maze.keys)
+        width, height, n = maze.grid.width, maze.grid.height, maze.grid.size
+        key_bits = len(maze.keys)
+
+        # The pixels of every key and of the doors it opens
+        key_flags = [bytearray(n) for _ in range(key_bits)]
+        door_flags = [bytearray(n) for _ in range(key_bits)]
+        for masks, flags in [(gained, key_flags), (required, door_flags)]:
+            for index in compress(range(n), masks):
+                flags[masks[index].bit_length() - 1][index] = 1
+        key_pixels = [to_bits(flags) for flags in key_flags]
+        door_pixels = [to_bits(flags) for flags in door_flags]
+
+        passable_bits = to_bits(passable)
+        not_first_row = to_bits((b'\x00' + b'\x01' * (height - 1)) * width)
+        not_last_row = to_bits((b'\x01' * (height - 1) + b'\x00') * width)
+
+        def grow(frontier: int) -> int:
+            # The 4-neighbors of the frontier, a step along y does not wrap to the next column
+            return (frontier << 1 & not_first_row) | (frontier >> 1 & not_last_row) | frontier << height | frontier >> height
+
+        # Key combination -> (the pixels it can step on, the keys it does not have)
+        masks: dict[int, tuple[int, int]] = dict()
+
+        def layer_masks(comb: int) -> tuple[int, int]:
+            if comb not in masks:
+                allowed, missing = passable_bits, 0
+                for key in range(key_bits):
+                    if not comb >> key & 1:
+                        allowed &= ~(key_pixels[key] | door_pixels[key])
+                        missing |= key_pixels[key]
+                masks[comb] = (allowed, missing)
+
+            return masks[comb]
+
+        start_node = maze.index(maze.get_start())
+        end_node = maze.index(maze.get_end())
+        end_bit = 1 << end_node
+
+        distances: Distances = maze.new_distances()
+        values, parents = distances.values, distances.parents
+        values[start_node << key_bits | START_KEY_COMB.comb] = 0
+
+        frontiers = {START_KEY_COMB.comb: 1 << start_node}
+        visited = dict(frontiers)
+        stats.pushes += 1
+        level = 0
+        end_comb: Optional[int] = None
+
+        while frontiers and end_comb is None:
+            level += 1
+            next_frontiers: dict[int, int] = dict()
+            for comb, frontier in frontiers.items():
+                stats.expanded += frontier.bit_count()
+                grown = grow(frontier)
+                allowed, missing = layer_masks(comb)
+                next_frontiers[comb] = next_frontiers.get(comb, 0) | grown & allowed & ~visited[comb]
+
+                # Stepping on a new key moves to the combination with it
+                picked = grown & missing
+                for key in range(key_bits):
+                    if picked & key_pixels[key]:
+                        next_comb = comb | 1 << key
+                        next_frontiers[next_comb] = next_frontiers.get(next_comb, 0) | picked & key_pixels[key] & ~visited.get(next_comb, 0)
+
+            frontiers = dict()
+            distance = level * step_cost
+            for comb, frontier in sorted(next_frontiers.items()):
+                if not frontier: continue
+
+                frontiers[comb] = frontier
+                visited[comb] = visited.get(comb, 0) | frontier
+                stats.pushes += frontier.bit_count()
+                for index in bit_indices(frontier):
+                    values[index << key_bits | comb] = distance
+                    if sink is not None:
+                        sink.publish(index)
+
+                if end_comb is None and frontier & end_bit:
+                    end_comb = comb
+
+        if sink is not None:
+            sink.flush()
+
+        stats.distances = len(distances)
+        if end_comb is None:
+            raise MazeException('No path to the end node')
+        stats.cost = level * step_cost
+
+        with self.phase('reconstruct'):
+            # Walk back through the levels and set the parents of the path only
+            offsets, targets = adjacency.offsets, adjacency.targets
+            node, comb = end_node, end_comb
+            while level > 0:
+                level -= 1
+                distance = level * step_cost
+                # The state was reached with the same keys or by picking up the key of its pixel
+                previous_combs = (comb, comb & ~gained[node]) if gained[node] & comb else (comb,)
+                slot = node << key_bits | comb
+                for edge in range(offsets[node], offsets[node + 1]):
+                    adjacent_node = targets[edge]
+                    previous_comb = next((previous for previous in previous_combs if values[adjacent_node << key_bits | previous] == distance), None)
+                    if previous_comb is not None:
+                        break
+                else:
+                    raise MazeException('Broken wavefront distances')
+
+                node, comb = adjacent_node, previous_comb
+                parents[slot] = node << key_bits | comb
+
+            return maze.get_path(distances)
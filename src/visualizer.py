@@ -1,9 +1,11 @@
-from typing import Optional
+from typing import Generator, Optional
 import pygame
 import time
 
-from src.maze import Maze, Coord
+from src.maze import ITERATION_NODE_COLOR, Maze, Coord
 from src.shortest_path import ShortestPath
+from src.shortest_path.cache import SolutionCache
+from src.shortest_path.sink import FRAME_RATE
 
 BACKGROUND_COLOR = (0, 0, 0)
 TEXT_OFFSET_DOWN_Y = 50
@@ -13,6 +15,9 @@ BUTTONS_START_X = 700
 BUTTONS_START_OFFSET_X = 50
 BUTTONS_START_Y = 50
 BUTTONS_OFFSET_Y = 100
+# Expanded nodes in one slice of the search and the part of a frame spent on the slices
+SEARCH_SLICE = 250
+FRAME_BUDGET = 0.6
 
 Buttons = list[tuple[ShortestPath, pygame.surface.Surface, pygame.rect.Rect]]
 
@@ -32,13 +37,25 @@ class Visualizer:
 
         self.running = True
 
+        # The search runs a few slices in every frame (see ShortestPath.steps), between the frames
+        # it waits so it can be paused, stepped one slice at a time (right arrow) or cancelled
+        self.search: Optional[Generator[list[int], None, list[Coord]]] = None
+        self.paused = False
+        self.step_requested = False
+        # Only the search is timed, the drawing is not
+        self.elapsed_time = 0.0
+        self.expanded = 0
+
+        # Clicking an algorithm again shows the solution it already found
+        self.cache = SolutionCache()
+
         pygame.init()
         self.screen = pygame.display.set_mode((width, height))
         pygame.display.set_caption('Maze Path Visualizer')
 
         # Load the image
         image = pygame.image.load(file_name)
-        self.maze = Maze(image)
+        self.maze = Maze(image, eager=True)
 
         self.font = pygame.font.SysFont('Arial', 20)
 
@@ -56,8 +73,12 @@ class Visualizer:
             y = BUTTONS_START_Y + i * BUTTONS_OFFSET_Y
             button[2].topleft = (x, y)
 
-    def render_time(self, time: Optional[float] = None) -> None:
+    def render_time(self, time: Optional[float] = None, expanded: int = 0) -> None:
         text = 'Elapsed time:' + (f'{time:.4f} seconds' if time else '')
+        if time and expanded:
+            text += f' ({expanded / time:,.0f} expansions/s)'
+        if self.paused and self.search is not None:
+            text += ' - paused'
         
         # Create TimeBox
         time_surface = self.font.render(text, False, FONT_COLOR)
@@ -78,6 +99,79 @@ class Visualizer:
         button_rect.topleft = pos
         return button_text, button_rect
 
+    def start_search(self, algorithm: ShortestPath) -> None:
+        # Clicking another algorithm while one is running switches to it
+        self.cancel_search()
+
+        # Redraw the image on the screen
+        self.screen.blit(self.maze.image, (0, 0))
+        self.render_time()
+        pygame.display.update()
+
+        self.current_algorithm = algorithm
+        self.path = []
+        self.paused = False
+        self.step_requested = False
+        self.elapsed_time = 0.0
+        self.expanded = 0
+
+        start_time = time.perf_counter()
+        path = self.cache.lookup(self.maze, algorithm)
+        if path is not None:
+            self.finish_search(path, time.perf_counter() - start_time)
+            return
+
+        self.search = algorithm.steps(self.maze, SEARCH_SLICE)
+        print(f'Algorithm {algorithm.name} running!')
+
+    def cancel_search(self) -> None:
+        if self.search is None: return
+
+        self.search.close()
+        self.search = None
+        print(f'Algorithm {self.current_algorithm.name} cancelled')
+        self.render_time(self.elapsed_time, self.expanded)
+
+    def finish_search(self, path: list[Coord], elapsed_time: float) -> None:
+        self.search = None
+        self.path = path
+        self.maze.draw_path(self.screen, path)
+        self.render_time(elapsed_time, self.expanded)
+
+    def advance_search(self) -> None:
+        # Run the slices of the search that fit in the frame and draw what they expanded
+        if self.search is None or (self.paused and not self.step_requested): return
+
+        algorithm = self.current_algorithm
+        maze = self.maze
+        deadline = time.perf_counter() + FRAME_BUDGET / FRAME_RATE
+        expanded: list[int] = []
+        try:
+            while True:
+                start_time = time.perf_counter()
+                expanded += next(self.search)
+                self.elapsed_time += time.perf_counter() - start_time
+
+                if self.step_requested or time.perf_counter() >= deadline:
+                    break
+        except StopIteration as stop:
+            self.elapsed_time += time.perf_counter() - start_time
+            self.expanded += len(expanded)
+            maze.draw_nodes(self.screen, [maze.coord(index) for index in expanded], ITERATION_NODE_COLOR)
+            self.cache.store(maze, algorithm, stop.value)
+            self.finish_search(stop.value, self.elapsed_time)
+            return
+        except Exception as e:
+            self.search = None
+            print(f'Algorithm {algorithm.name} failed: {e}')
+            return
+        finally:
+            self.step_requested = False
+
+        self.expanded += len(expanded)
+        maze.draw_nodes(self.screen, [maze.coord(index) for index in expanded], ITERATION_NODE_COLOR)
+        self.render_time(self.elapsed_time, self.expanded)
+
     def run(self):
         # Draw the image on the screen
         self.screen.blit(self.maze.image, (0, 0))
@@ -88,7 +182,7 @@ class Visualizer:
             self.screen.blit(button[1], button[2])
 
         pygame.display.update()
-        a = 5
+        clock = pygame.time.Clock()
         while self.running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -96,27 +190,25 @@ class Visualizer:
                 if event.type == pygame.MOUSEBUTTONUP:
                     # Get the mouse click position
                     mouse_x, mouse_y = pygame.mouse.get_pos()
-                    
+
                     for button in self.buttons:
                         if button[2].collidepoint(mouse_x, mouse_y):
-                            # Redraw the image on the screen
-                            self.screen.blit(self.maze.image, (0, 0))
-                            self.render_time()
-                            pygame.display.update()
-
-                            self.current_algorithm = button[0]
-                            
-                            start_time = time.time()
-                            self.path = self.current_algorithm.run(self.maze, self.screen)
-                            end_time = time.time()
-                            elapsed_time = end_time - start_time
-                            
-                            self.maze.draw_path(self.screen, self.path)
-                            self.render_time(elapsed_time)
-                            
-                            print(f'Algorithm {self.current_algorithm.name} running!')       
-                        
-            # wait for a while
-            # pygame.time.wait(100)
-            
-        pygame.quit()
+                            self.start_search(button[0])
+
+                # Escape cancels the search, space pauses it and the right arrow runs one slice
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        self.cancel_search()
+                    elif event.key == pygame.K_SPACE and self.search is not None:
+                        self.paused = not self.paused
+                        self.render_time(self.elapsed_time, self.expanded)
+                    elif event.key == pygame.K_RIGHT and self.paused:
+                        self.step_requested = True
+
+            self.advance_search()
+
+            # Wait for the next frame, the search is paused meanwhile
+            clock.tick(FRAME_RATE)
+
+        self.cancel_search()
+        pygame.quit()
\ No newline at end of file
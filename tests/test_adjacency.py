@@ -0,0 +1,53 @@
+import pytest
+from src.maze import START_KEY_COMB, Coord, Maze
+from src.maze.adjacency import MAX_KEYS, AdjacencyException, build_adjacency
+from tests.utils import KEY_COLOR, make_keyed_surface, make_open_surface
+
+def test_edges_follow_adjacent_coords():
+    maze = Maze(make_open_surface())
+    adjacency = maze.compile()
+
+    for coord in [Coord((1, 1)), Coord((5, 7)), Coord((19, 3)), Coord((20, 3)), Coord((38, 28))]:
+        expected = [maze.index(adjacent) for adjacent in maze.get_adjacent_coords(coord)
+            if maze.pixel_at(adjacent).color != (0, 0, 0)]
+        if maze.pixel_at(coord).color == (0, 0, 0):
+            expected = []
+
+        assert [adjacency.targets[edge] for edge in adjacency.edges(maze.index(coord))] == expected
+
+def test_weights_and_key_masks():
+    maze = Maze(make_keyed_surface())
+    adjacency = maze.compile()
+    key_bit = 1 << maze.keys[KEY_COLOR]
+
+    assert set(adjacency.weights) == {1.0}
+
+    # Stepping on the key from the left
+    edges = {adjacency.targets[edge]: edge for edge in adjacency.edges(maze.index(Coord((4, 30))))}
+    assert adjacency.key_set[edges[maze.index(Coord((5, 30)))]] == key_bit
+    assert adjacency.key_required[edges[maze.index(Coord((5, 30)))]] == 0
+
+    # Stepping on the door from the left
+    edges = {adjacency.targets[edge]: edge for edge in adjacency.edges(maze.index(Coord((49, 30))))}
+    assert adjacency.key_set[edges[maze.index(Coord((50, 30)))]] == 0
+    assert adjacency.key_required[edges[maze.index(Coord((50, 30)))]] == key_bit
+
+def test_adjacent_edges_facade():
+    maze = Maze(make_keyed_surface())
+    # The door is closed without the key, the keys are known before the first call
+    assert Coord((50, 30)) not in [coord for _, _, coord in maze.get_adjacent_edges(Coord((49, 30)), START_KEY_COMB)]
+    key_comb = START_KEY_COMB.set_at(maze.keys[KEY_COLOR])
+    assert (1.0, key_comb, Coord((50, 30))) in list(maze.get_adjacent_edges(Coord((49, 30)), key_comb))
+
+    # Stepping on the key adds it to the combination
+    assert (1.0, key_comb, Coord((5, 30))) in list(maze.get_adjacent_edges(Coord((4, 30)), START_KEY_COMB))
+
+def test_compile_is_cached():
+    maze = Maze(make_open_surface())
+    assert maze.compile() is maze.compile()
+
+def test_too_many_keys():
+    maze = Maze(make_open_surface())
+    keys = {(i, 0, 0): i for i in range(MAX_KEYS + 1)}
+    with pytest.raises(AdjacencyException, match='Too many key colors'):
+        build_adjacency(maze.grid, maze.classify(), keys)
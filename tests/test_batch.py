@@ -0,0 +1,42 @@
+import json
+import pygame
+import pytest
+from src.batch import BatchException, find_mazes, main, solve_many
+from tests.utils import make_keyed_surface, make_open_surface
+
+@pytest.fixture
+def maze_dir(tmp_path):
+    pygame.image.save(make_keyed_surface(), str(tmp_path / 'keyed.bmp'))
+    pygame.image.save(make_open_surface(), str(tmp_path / 'open.bmp'))
+    (tmp_path / 'notes.txt').write_text('not a maze')
+    return tmp_path
+
+def test_find_mazes(maze_dir):
+    assert [name.rsplit('/', 1)[1] for name in find_mazes([str(maze_dir)])] == ['keyed.bmp', 'open.bmp']
+
+    with pytest.raises(BatchException, match='No such file'):
+        find_mazes([str(maze_dir / 'missing.bmp')])
+
+def test_main_writes_jsonl(maze_dir):
+    output = maze_dir / 'results.jsonl'
+    assert main([str(maze_dir), '-a', 'Dijkstra', 'GBFS', '-j', '1', '-o', str(output)]) == 0
+
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [(result['file'].rsplit('/', 1)[1], result['algorithm']) for result in results] == [
+        ('keyed.bmp', 'Dijkstra'), ('keyed.bmp', 'GBFS'), ('open.bmp', 'Dijkstra'), ('open.bmp', 'GBFS')]
+
+    for result in results:
+        assert result['path_length'] > 0
+        assert result['expanded'] > 0
+        assert result['time'] >= 0
+
+def test_pool_and_errors(maze_dir):
+    (maze_dir / 'broken.bmp').write_bytes(b'not an image')
+    files = find_mazes([str(maze_dir)])
+
+    results = list(solve_many(files, ['AStar'], workers=2))
+    assert len(results) == 3
+    assert sum('error' in result for result in results) == 1
+
+    with pytest.raises(BatchException, match='Unknown algorithm'):
+        list(solve_many(files, ['BFS']))
@@ -0,0 +1,25 @@
+from src.benchmark import Case, algorithms, compare, run_case
+
+def test_algorithms_are_discovered():
+    assert {'Dijkstra', 'AStar', 'GBFS', 'Hierarchical'} <= set(algorithms())
+
+def test_run_case():
+    result = run_case(Case('AStar', 64, 0.2, 1, 'flat', 0))
+
+    assert result['case'] == 'AStar/64/0.2/1/flat/0/unit/heap/ordered'
+    assert result['path_length'] > 0
+    assert result['pushes'] >= result['expanded'] > 0
+    assert result['distances'] > 0
+    assert result['ns_per_expansion'] > 0
+
+def test_compare():
+    baseline = {'results': [{'case': 'a', 'expanded': 10, 'pushes': 12, 'ns_per_expansion': 100, 'peak_rss_kb': 1000}]}
+
+    same = [{'case': 'a', 'expanded': 10, 'pushes': 12, 'ns_per_expansion': 110, 'peak_rss_kb': 1000}]
+    assert compare(same, baseline, 0.25) == []
+
+    slower = [{'case': 'a', 'expanded': 11, 'pushes': 12, 'ns_per_expansion': 200, 'peak_rss_kb': 1000}]
+    assert len(compare(slower, baseline, 0.25)) == 2
+
+    new_case = [{'case': 'b', 'expanded': 1}]
+    assert compare(new_case, baseline, 0.25) == []
@@ -0,0 +1,113 @@
+import mmap
+import struct
+from typing import Optional
+import pygame
+import pytest
+from src.maze import Maze
+from src.maze.bmp import Bitmap, BmpException
+from src.maze.generator import generate_maze
+from src.shortest_path import AStar
+from tests.utils import EXAMPLES_DIR, load_example, make_keyed_surface
+
+def write_bmp(file_name: str, rows: list[list[tuple[int, int, int]]], bits: int = 24, top_down: bool = False, masks: Optional[tuple[int, int, int]] = None) -> None:
+    # rows[y][x] is the RGB color of the pixel, the rows are written from the top only when top_down is set.
+    # With masks the header is BI_BITFIELDS and the masks follow it, the pixels are still written as BGR(A)
+    width, height = len(rows[0]), len(rows)
+    stride = (width * bits // 8 + 3) // 4 * 4
+    data = b''
+    for row in (rows if top_down else rows[::-1]):
+        pixels = b''.join(bytes((b, g, r)) + (b'\xff' if bits == 32 else b'') for r, g, b in row)
+        data += pixels + bytes(stride - len(pixels))
+
+    offset = 54 if masks is None else 66
+    with open(file_name, 'wb') as bmp_file:
+        bmp_file.write(struct.pack('<2sIHHI', b'BM', offset + len(data), 0, 0, offset))
+        bmp_file.write(struct.pack('<IiiHHIIiiII', 40, width, -height if top_down else height, 1, bits, 0 if masks is None else 3, len(data), 0, 0, 0, 0))
+        if masks is not None:
+            bmp_file.write(struct.pack('<III', *masks))
+        bmp_file.write(data)
+
+def test_same_colors_as_pygame():
+    for number in range(4):
+        file_name = f'{EXAMPLES_DIR}/0{number}.input20x20.bmp'
+        assert Maze.load_bmp(file_name).content_hash == Maze(load_example(number)).content_hash
+
+@pytest.mark.parametrize('bits, top_down', [(24, False), (24, True), (32, False)])
+def test_row_layouts(tmp_path, bits, top_down):
+    rows = [[(x * 40, y * 40, 7) for x in range(3)] for y in range(2)]
+    file_name = str(tmp_path / 'small.bmp')
+    write_bmp(file_name, rows, bits, top_down)
+
+    maze = Maze.load_bmp(file_name)
+    assert (maze.width, maze.height) == (3, 2)
+    for y, row in enumerate(rows):
+        for x, color in enumerate(row):
+            assert maze.pixel_at((x, y)).color == color
+
+def test_unsupported_files(tmp_path):
+    file_name = str(tmp_path / 'maze.bmp')
+    (tmp_path / 'maze.bmp').write_bytes(b'not an image')
+    with pytest.raises(BmpException, match='not a BMP'):
+        Bitmap(file_name)
+
+    write_bmp(file_name, [[(0, 0, 0)]], bits=16)
+    with pytest.raises(BmpException, match='16 bit'):
+        Bitmap(file_name)
+
+def test_mapping_closed_on_errors(tmp_path, monkeypatch):
+    mappings = []
+    map_file = mmap.mmap
+
+    def recording_mmap(*args, **kwargs):
+        mappings.append(map_file(*args, **kwargs))
+        return mappings[-1]
+
+    monkeypatch.setattr(mmap, 'mmap', recording_mmap)
+    file_name = str(tmp_path / 'maze.bmp')
+    for bits in [16, 24]:
+        write_bmp(file_name, [[(0, 0, 0)]], bits=bits)
+        # Cut off the last row
+        with open(file_name, 'r+b') as bmp_file:
+            bmp_file.truncate(bmp_file.seek(0, 2) - 4)
+
+        with pytest.raises(BmpException):
+            Bitmap(file_name)
+
+    assert len(mappings) == 2 and all(mapping.closed for mapping in mappings)
+
+def test_channel_masks(tmp_path):
+    file_name = str(tmp_path / 'masked.bmp')
+    rows = [[(10, 20, 30), (40, 50, 60)]]
+
+    # The usual masks are the same as an uncompressed file
+    write_bmp(file_name, rows, bits=32, masks=(0x00ff0000, 0x0000ff00, 0x000000ff))
+    maze = Maze.load_bmp(file_name)
+    assert maze.pixel_at((1, 0)).color == (40, 50, 60)
+
+    # Other layouts would be read with wrong colors
+    write_bmp(file_name, rows, bits=32, masks=(0x000000ff, 0x0000ff00, 0x00ff0000))
+    with pytest.raises(BmpException, match='channel masks'):
+        Bitmap(file_name)
+
+def test_regions(tmp_path):
+    file_name = str(tmp_path / 'maze.bmp')
+    pygame.image.save(generate_maze(200, keys=1, seed=3), file_name)
+    full = Maze.load_bmp(file_name)
+
+    for region in [(10, 20, 100, 90), (0, 0, 200, 200), (150, 130, 50, 70)]:
+        window = Maze.load_bmp(file_name, region)
+        assert (window.width, window.height) == region[2:]
+        for x in range(0, region[2], 7):
+            for y in range(0, region[3], 5):
+                assert window.pixel_at((x, y)).color == full.pixel_at((x + region[0], y + region[1])).color
+
+    with pytest.raises(BmpException, match='not inside'):
+        Maze.load_bmp(file_name, (190, 0, 20, 10))
+
+def test_engines_on_a_loaded_bmp(tmp_path):
+    file_name = str(tmp_path / 'keyed.bmp')
+    pygame.image.save(make_keyed_surface(), file_name)
+
+    expected, loaded = AStar(), AStar()
+    assert expected.run(Maze(make_keyed_surface())) == loaded.run(Maze.load_bmp(file_name))
+    assert expected.stats.cost == loaded.stats.cost
@@ -0,0 +1,91 @@
+import json
+import pygame
+from src.batch import main
+from src.maze import Maze
+from src.shortest_path import AStar, Dijkstra, GBFS
+from src.shortest_path.cache import SolutionCache
+from src.shortest_path.landmarks import Landmarks
+from tests.utils import make_keyed_surface, make_open_surface
+
+def test_memory_hit_returns_same_path_and_stats():
+    cache = SolutionCache()
+    maze = Maze(make_keyed_surface())
+    algorithm = Dijkstra()
+
+    path = cache.run(algorithm, maze)
+    expanded = algorithm.stats.expanded
+
+    again = Dijkstra()
+    assert cache.run(again, maze) == path
+    assert again.stats.expanded == expanded
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_lookup_and_store():
+    cache = SolutionCache()
+    maze = Maze(make_keyed_surface())
+    algorithm = AStar()
+
+    assert cache.lookup(maze, algorithm) is None
+    path = algorithm.run(maze)
+    cache.store(maze, algorithm, path)
+
+    again = AStar()
+    assert cache.lookup(maze, again) == path
+    assert again.stats == algorithm.stats and again.stats is not algorithm.stats
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_key_depends_on_pixels_and_algorithm():
+    cache = SolutionCache()
+    keyed, same, other = Maze(make_keyed_surface()), Maze(make_keyed_surface()), Maze(make_open_surface())
+
+    assert cache.key(keyed, Dijkstra()) == cache.key(same, Dijkstra())
+    assert cache.key(keyed, Dijkstra()) != cache.key(other, Dijkstra())
+    assert cache.key(keyed, Dijkstra()) != cache.key(keyed, AStar())
+    assert 'AStar:src.shortest_path.metrics.manhattan_dist' in cache.key(keyed, AStar())
+
+def test_key_depends_on_heuristic_parameters():
+    cache = SolutionCache()
+    maze = Maze(make_keyed_surface())
+
+    assert cache.key(maze, AStar(Landmarks(count=4))) == cache.key(maze, AStar(Landmarks(count=4)))
+    assert cache.key(maze, AStar(Landmarks(count=4))) != cache.key(maze, AStar(Landmarks(count=8)))
+    assert cache.key(maze, AStar(Landmarks(first=(1, 1)))) != cache.key(maze, AStar(Landmarks(first=(2, 2))))
+
+def test_anonymous_heuristics_are_not_cached():
+    cache = SolutionCache()
+    maze = Maze(make_keyed_surface())
+
+    assert cache.key(maze, GBFS(lambda c1, c2: 0)) is None
+    cache.run(GBFS(lambda c1, c2: 0), maze)
+    cache.run(GBFS(lambda c1, c2: abs(c1[0] - c2[0])), maze)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert len(cache.memory) == 0
+
+def test_disk_tier_and_eviction(tmp_path):
+    maze = Maze(make_keyed_surface())
+    cache = SolutionCache(str(tmp_path))
+    path = cache.run(Dijkstra(), maze)
+    cache.close()
+
+    # A new cache (as in a new process) reads the solution from the disk
+    cache = SolutionCache(str(tmp_path))
+    assert cache.get(maze, Dijkstra()).path == path
+    cache.close()
+
+    # Only the most recently used solution fits
+    cache = SolutionCache(str(tmp_path), max_bytes=4 * len(path) + 100)
+    cache.run(AStar(), maze)
+    cache.memory.clear()
+    assert cache.get(maze, Dijkstra()) is None
+    assert cache.get(maze, AStar()) is not None
+    cache.close()
+
+def test_batch_cache_dir(tmp_path):
+    pygame.image.save(make_keyed_surface(), str(tmp_path / 'keyed.bmp'))
+    output = tmp_path / 'results.jsonl'
+
+    for cached in [False, True]:
+        assert main([str(tmp_path / 'keyed.bmp'), '-a', 'AStar', '-j', '1', '--cache-dir', str(tmp_path / 'cache'), '-o', str(output)]) == 0
+        result, = [json.loads(line) for line in output.read_text().splitlines()]
+        assert result['cached'] == cached
+        assert result['path_length'] > 0
@@ -0,0 +1,54 @@
+import os
+import pygame
+from src.maze import END_COLOR, KEY_HEIGHT, KEY_WIDTH, START_COLOR, Coord, Maze
+from src.maze.pixel import PixelType
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), '..', 'examples', '00.input20x20.bmp')
+
+def make_surface() -> pygame.surface.Surface:
+    surface = pygame.Surface((60, 30))
+    surface.fill((200, 200, 200))
+    pygame.draw.rect(surface, (0, 0, 0), pygame.Rect(0, 0, 60, 30), 1)
+    # Key and a door with the same color
+    surface.fill((255, 0, 0), pygame.Rect(2, 2, KEY_WIDTH, KEY_HEIGHT))
+    surface.fill((255, 0, 0), pygame.Rect(40, 1, 2, 28))
+    surface.fill(START_COLOR, pygame.Rect(30, 5, 3, 3))
+    surface.fill(END_COLOR, pygame.Rect(50, 5, 3, 3))
+    return surface
+
+def test_classify_types():
+    maze = Maze(make_surface(), eager=True)
+
+    assert maze.type_at(Coord((0, 0))) == PixelType.WALL
+    assert maze.type_at(Coord((25, 25))) == PixelType.FREE
+    assert maze.type_at(Coord((2, 2))) == PixelType.KEY
+    assert maze.type_at(Coord((41, 10))) == PixelType.ZONE
+    assert maze.type_at(Coord((31, 6))) == PixelType.START
+    assert maze.type_at(Coord((52, 7))) == PixelType.END
+    assert maze.keys == {(255, 0, 0): 0}
+
+def test_zone_table():
+    maze = Maze(make_surface())
+    classification = maze.classify()
+
+    assert [zone.type for zone in classification.zones] == [PixelType.KEY, PixelType.START, PixelType.ZONE, PixelType.END]
+
+    key = maze.zone_at(Coord((10, 10)))
+    assert key is not None
+    assert (key.width, key.height, key.area) == (KEY_WIDTH, KEY_HEIGHT, KEY_WIDTH * KEY_HEIGHT)
+
+    door = maze.zone_at(Coord((40, 1)))
+    assert door is not None
+    assert (door.min_x, door.min_y, door.max_x, door.max_y, door.area) == (40, 1, 41, 28, 56)
+
+    assert maze.zone_at(Coord((25, 25))) is None
+
+def test_matches_lazy_classification():
+    image = pygame.image.load(EXAMPLE)
+
+    lazy = Maze(image)
+    for coord in list(lazy.map):
+        lazy.set_area_at(coord)
+
+    eager = Maze(image, eager=True)
+    assert eager.grid.types == lazy.grid.types
@@ -0,0 +1,38 @@
+import pytest
+from src.maze import Maze
+from src.maze.compiled import CompiledException, read_compiled
+from src.shortest_path import AStar, Dijkstra, Hierarchical
+from tests.utils import load_example, make_keyed_surface
+
+@pytest.mark.parametrize('image', [make_keyed_surface(), load_example(1)])
+def test_compiled_maze_finds_same_paths(tmp_path, image):
+    maze = Maze(image, eager=True)
+    file_name = str(tmp_path / 'maze.mazec')
+    maze.save_compiled(file_name)
+
+    loaded = Maze.load_compiled(file_name)
+    assert (loaded.width, loaded.height) == (maze.width, maze.height)
+    assert loaded.keys == maze.keys
+    assert loaded.content_hash == maze.content_hash
+    assert loaded.classify().zones == maze.classify().zones
+    assert (loaded.get_start(), loaded.get_end()) == (maze.get_start(), maze.get_end())
+
+    for algorithm in [Dijkstra(), AStar(), Hierarchical()]:
+        assert algorithm.run(loaded) == algorithm.run(maze)
+
+def test_sections_are_mapped(tmp_path):
+    maze = Maze(make_keyed_surface())
+    file_name = str(tmp_path / 'maze.mazec')
+    maze.save_compiled(file_name)
+
+    loaded = Maze.load_compiled(file_name)
+    assert isinstance(loaded.compile().targets, memoryview)
+    assert list(loaded.compile().targets) == list(maze.compile().targets)
+    assert loaded.image.get_at((5, 25)) == maze.image.get_at((5, 25))
+
+def test_rejects_other_files(tmp_path):
+    file_name = tmp_path / 'maze.mazec'
+    file_name.write_bytes(b'BM' + bytes(100))
+
+    with pytest.raises(CompiledException, match='not a compiled maze'):
+        read_compiled(str(file_name))
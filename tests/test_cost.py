@@ -0,0 +1,70 @@
+import pytest
+from src.maze import Maze
+from src.maze.cost import LEVELS, ConstantCost, CostException, LinearGreyCost, LookupTableCost
+from src.maze.generator import generate_maze
+from src.shortest_path import AStar, BidirectionalAStar, Dijkstra, Hierarchical, JPS
+from tests.utils import make_keyed_surface
+
+def test_table_and_min_cost():
+    model = LinearGreyCost(scale=2, offset=1, other_cost=5)
+    assert model.table[0] == 0
+    assert model.table[1] == 3
+    assert model.table[255] == 511
+    assert model.min_cost == 3
+    assert model.uniform_cost is None
+
+def test_models_with_same_costs_have_same_name():
+    assert ConstantCost().name == 'unit'
+    assert LookupTableCost([1.0] * LEVELS).name == 'unit'
+    assert ConstantCost(2).name != 'unit'
+    assert LinearGreyCost().name == LookupTableCost(list(LinearGreyCost().table)).name
+
+def test_rejects_free_steps():
+    with pytest.raises(CostException):
+        LinearGreyCost(scale=0).table
+    with pytest.raises(CostException):
+        LookupTableCost([1.0] * 3)
+
+def test_cost_grid():
+    maze = Maze(generate_maze(16, grey='gradient'), cost_model=LinearGreyCost())
+    maze.compile()
+
+    for index in range(maze.grid.size):
+        if maze.grid.is_grey_at(index) and maze.grid.colors[3 * index] > 0:
+            assert maze.costs[index] == maze.grid.colors[3 * index]
+
+@pytest.mark.parametrize('keys', [0, 1])
+def test_weighted_engines_find_cheapest_paths(keys):
+    for seed in range(3):
+        image = generate_maze(64, keys=keys, grey='uniform', seed=seed)
+        expected = None
+        for algorithm in [Dijkstra(), AStar(), Hierarchical(), BidirectionalAStar(), JPS()]:
+            maze = Maze(image, cost_model=LinearGreyCost(scale=1 / 128))
+            algorithm.run(maze)
+            if expected is None:
+                expected = algorithm.stats.cost
+            assert algorithm.stats.cost == pytest.approx(expected)
+
+def test_weights_change_the_path():
+    image = generate_maze(24, grey='uniform', seed=1)
+    unit, weighted = Dijkstra(), Dijkstra()
+    unit.run(Maze(image))
+    weighted.run(Maze(image, cost_model=LinearGreyCost()))
+    assert weighted.stats.cost > unit.stats.cost
+
+def test_jps_scales_uniform_costs():
+    image = generate_maze(64, keys=1, seed=2)
+    unit, doubled = JPS(), JPS()
+    unit.run(Maze(image))
+    doubled.run(Maze(image, cost_model=ConstantCost(2)))
+    assert doubled.stats.cost == 2 * unit.stats.cost
+
+def test_compiled_maze_keeps_the_weights(tmp_path):
+    maze = Maze(make_keyed_surface(), cost_model=LinearGreyCost(scale=0.5, other_cost=3))
+    file_name = str(tmp_path / 'maze.mazec')
+    maze.save_compiled(file_name)
+
+    loaded = Maze.load_compiled(file_name)
+    assert loaded.weight_model == maze.weight_model
+    assert list(loaded.compile().weights) == list(maze.compile().weights)
+    assert Dijkstra().run(loaded) == Dijkstra().run(maze)
@@ -0,0 +1,39 @@
+from math import inf
+import pytest
+import src.maze.distances
+from src.maze import Maze
+from src.maze.distances import DistanceStore
+from src.shortest_path import AStar, Dijkstra
+from tests.utils import make_keyed_surface
+
+@pytest.mark.parametrize('dense_limit, dense', [(None, True), (0, False)])
+def test_store_forms(dense_limit, dense):
+    distances = DistanceStore(10, 2, dense_limit)
+    assert distances.dense == dense
+
+    distances.set(3, 0b01, 5)
+    distances.set(3, 0b11, 7)
+    distances.values[distances.slot(4, 0b10)] = 1
+
+    assert distances.get(3, 0b01) == 5
+    assert distances.get(3, 0b10) == inf
+    assert (4, 0b10) in distances and (4, 0b00) not in distances
+    assert list(distances.combinations(3)) == [(0b01, 5), (0b11, 7)]
+    assert len(distances) == 3
+
+@pytest.mark.parametrize('dense_limit', [None, 0])
+def test_path_follows_parents(dense_limit):
+    distances = DistanceStore(10, 1, dense_limit)
+    distances.set(0, 0, 0)
+    distances.set(1, 0, 1, distances.slot(0, 0))
+    distances.set(2, 1, 2, distances.slot(1, 0))
+
+    assert list(distances.path_to(2, 1)) == [distances.slot(2, 1), distances.slot(1, 0), distances.slot(0, 0)]
+
+def test_sparse_store_gives_same_paths(monkeypatch):
+    maze = Maze(make_keyed_surface())
+    dense_paths = [algorithm.run(maze) for algorithm in [Dijkstra(), AStar()]]
+
+    monkeypatch.setattr(src.maze.distances, 'DENSE_LIMIT', 0)
+    assert not maze.new_distances().dense
+    assert [algorithm.run(maze) for algorithm in [Dijkstra(), AStar()]] == dense_paths
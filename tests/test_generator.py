@@ -0,0 +1,43 @@
+import pygame
+import pytest
+from src.maze import Maze
+from src.maze.pixel import PixelType
+from src.maze.generator import GeneratorException, generate_maze, max_keys
+from src.shortest_path import Dijkstra
+from tests.utils import assert_valid_path
+
+def test_same_seed_same_maze():
+    first = generate_maze(100, 0.3, keys=1, grey='uniform', seed=7)
+    second = generate_maze(100, 0.3, keys=1, grey='uniform', seed=7)
+    other = generate_maze(100, 0.3, keys=1, grey='uniform', seed=8)
+
+    assert pygame.image.tostring(first, 'RGB') == pygame.image.tostring(second, 'RGB')
+    assert pygame.image.tostring(first, 'RGB') != pygame.image.tostring(other, 'RGB')
+
+@pytest.mark.parametrize('side, density, keys, grey', [(20, 0.0, 0, 'flat'), (64, 0.4, 1, 'gradient'), (128, 0.3, 3, 'uniform')])
+def test_generated_maze_is_solvable(side, density, keys, grey):
+    maze = Maze(generate_maze(side, density, keys, grey), eager=True)
+    assert len(maze.keys) == keys
+
+    path = Dijkstra().run(maze)
+    assert_valid_path(maze, path)
+
+def test_keys_in_any_order():
+    maze = Maze(generate_maze(256, keys=4, seed=5, key_layout='any'), eager=True)
+    classification = maze.classify()
+
+    # Every key is left of the first door
+    first_door = min(maze.coord(index)[0] for zone in classification.zones if zone.type == PixelType.ZONE for index in classification.pixels_of(zone))
+    keys = [zone for zone in classification.zones if zone.type == PixelType.KEY]
+    assert len(keys) == 4
+    assert all(maze.coord(index)[0] < first_door for zone in keys for index in classification.pixels_of(zone))
+
+    assert_valid_path(maze, Dijkstra().run(maze))
+
+def test_invalid_parameters():
+    with pytest.raises(GeneratorException, match='too small'):
+        generate_maze(64, keys=max_keys(64) + 1)
+    with pytest.raises(GeneratorException, match='grey distribution'):
+        generate_maze(64, grey='noise')
+    with pytest.raises(GeneratorException, match='key layout'):
+        generate_maze(64, key_layout='random')
@@ -0,0 +1,73 @@
+import pygame
+import pytest
+from src.maze import Coord, Maze, MazeException
+from src.maze.grid import Grid, GridException
+from src.maze.pixel import PixelType
+
+def make_surface() -> pygame.surface.Surface:
+    surface = pygame.Surface((4, 3))
+    surface.fill((255, 255, 255))
+    surface.set_at((1, 0), (0, 0, 0))
+    surface.set_at((2, 1), (10, 20, 30))
+    surface.set_at((3, 2), (10, 20, 30))
+    return surface
+
+def test_from_surface_colors():
+    surface = make_surface()
+    grid = Grid.from_surface(surface)
+
+    assert (grid.width, grid.height, grid.size) == (4, 3, 12)
+    for x in range(4):
+        for y in range(3):
+            assert grid.color_at(grid.index((x, y))) == tuple(surface.get_at((x, y)))[:3]
+
+def test_index_is_column_major():
+    grid = Grid.from_surface(make_surface())
+    assert grid.index((0, 2)) == 2
+    assert grid.index((1, 0)) == 3
+    assert grid.coord(7) == (2, 1)
+
+def test_find_color():
+    grid = Grid.from_surface(make_surface())
+    assert grid.find_color((10, 20, 30)) == grid.index((2, 1))
+    assert grid.find_color((20, 30, 10)) is None
+
+def test_adjacent_indices():
+    grid = Grid.from_surface(make_surface())
+    assert sorted(grid.adjacent_indices(grid.index((0, 0)))) == [1, 3]
+    assert sorted(grid.adjacent_indices(grid.index((1, 1)))) == [1, 3, 5, 7]
+
+def test_invalid_buffer_size():
+    with pytest.raises(GridException):
+        Grid(2, 2, b'\x00' * 11)
+
+def test_pixel_map_view():
+    maze = Maze(make_surface())
+
+    assert len(maze.map) == 12
+    assert Coord((3, 2)) in maze.map
+    assert Coord((4, 0)) not in maze.map
+    assert list(maze.map)[:4] == [(0, 0), (0, 1), (0, 2), (1, 0)]
+
+    pixel = maze.pixel_at(Coord((1, 0)))
+    assert pixel.color == (0, 0, 0)
+    assert pixel.type == PixelType.UNSET
+
+    pixel.type = PixelType.WALL
+    assert maze.pixel_at(Coord((1, 0))).type == PixelType.WALL
+
+    with pytest.raises(MazeException, match='Invalid map coords'):
+        maze.pixel_at(Coord((0, 3)))
+
+def test_set_area_at():
+    maze = Maze(make_surface())
+
+    maze.set_area_at(Coord((1, 0)))
+    maze.set_area_at(Coord((0, 0)))
+    maze.set_area_at(Coord((2, 1)))
+
+    assert maze.type_at(Coord((1, 0))) == PixelType.WALL
+    assert maze.type_at(Coord((0, 0))) == PixelType.FREE
+    assert maze.type_at(Coord((2, 1))) == PixelType.ZONE
+    # Same color but not connected
+    assert maze.type_at(Coord((3, 2))) == PixelType.UNSET
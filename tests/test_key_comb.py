@@ -1,5 +1,5 @@
 import pytest
-from src.maze.key_comb import KeyCombination, KeyCombinationException
+from src.maze.key_comb import KeyCombination, KeyCombinationException, key_mask, keys_count
 
 def test_set_at():
     kc = KeyCombination()
@@ -30,6 +30,19 @@ def test_keys_count():
     kc = KeyCombination(0b0)
     assert kc.keys_count() == 0
 
+def test_int_keys_count():
+    assert keys_count(0) == 0
+    assert keys_count(0b1011) == 3
+    # More than the 8 keys of the table
+    assert keys_count(1 << 63 | 1 << 8 | 1) == 3
+    assert keys_count((1 << 64) - 1) == 64
+
+def test_key_mask():
+    assert key_mask(0, 2) == 0b101
+    assert KeyCombination(0b10).set_at(0, 2).comb == 0b10 | key_mask(0, 2)
+    with pytest.raises(KeyCombinationException):
+        key_mask(-1)
+
 def test_lt():
     kc1 = KeyCombination(0b101)
     kc2 = KeyCombination(0b100)
@@ -0,0 +1,58 @@
+import pygame
+import pytest
+from src.maze import END_COLOR, START_COLOR, WALL_COLOR, Maze
+from src.maze.cost import LinearGreyCost
+from src.maze.generator import generate_maze
+from src.shortest_path import AStar, BidirectionalAStar, Dijkstra, Hierarchical, JPS, euclidean_dist
+from src.shortest_path.landmarks import Landmarks
+from tests.utils import load_example, make_keyed_surface
+
+def make_serpentine_surface(side: int = 64) -> pygame.surface.Surface:
+    # One pixel wide corridors between long walls with a gap at alternating ends,
+    # the end is just across two walls but the path has to go around them
+    surface = pygame.Surface((side, side))
+    surface.fill((255, 255, 255))
+    pygame.draw.rect(surface, WALL_COLOR, pygame.Rect(0, 0, side, side), 1)
+    for row, y in enumerate(range(2, side - 2, 2)):
+        x = 1 if row % 2 else 2
+        pygame.draw.line(surface, WALL_COLOR, (x, y), (x + side - 4, y))
+    surface.set_at((1, 1), START_COLOR)
+    surface.set_at((1, 5), END_COLOR)
+    return surface
+
+def cost_of(algorithm, maze: Maze) -> float:
+    algorithm.run(maze)
+    return algorithm.stats.cost
+
+@pytest.mark.parametrize('image, cost_model', [
+    (make_keyed_surface(), None),
+    (load_example(1), None),
+    (generate_maze(64, keys=1, grey='uniform', seed=1), LinearGreyCost(scale=1 / 128)),
+])
+def test_engines_stay_optimal(image, cost_model):
+    maze = Maze(image, cost_model=cost_model)
+    expected = cost_of(Dijkstra(), maze)
+
+    landmarks = Landmarks(count=4)
+    for algorithm in [AStar(landmarks), BidirectionalAStar(landmarks), Hierarchical(landmarks), JPS(landmarks), AStar(euclidean_dist)]:
+        assert cost_of(algorithm, maze) == pytest.approx(expected)
+
+def test_smaller_frontier_than_manhattan():
+    maze = Maze(make_serpentine_surface())
+    manhattan, landmarks = AStar(), AStar(Landmarks(count=4))
+
+    assert cost_of(landmarks, maze) == cost_of(manhattan, maze)
+    assert landmarks.stats.expanded < 0.75 * manhattan.stats.expanded
+
+def test_tables_are_built_once_per_maze():
+    landmarks = Landmarks(count=2)
+    maze = Maze(make_keyed_surface())
+    AStar(landmarks).run(maze)
+    tables = landmarks.tables
+
+    AStar(landmarks).run(maze)
+    assert landmarks.tables is tables
+
+    AStar(landmarks).run(Maze(load_example(1)))
+    assert landmarks.tables is not tables
+    assert len(landmarks.tables) == 2
@@ -0,0 +1,108 @@
+import random
+import pytest
+from src.maze import END_COLOR, START_COLOR, WALL_COLOR, Maze, MazeException
+from src.maze.generator import generate_maze
+from src.maze.pixel import PixelType
+from src.shortest_path import Dijkstra, LPAStar
+from tests.utils import KEY_COLOR, assert_valid_path, load_example, make_keyed_surface, make_open_surface
+
+def fresh_cost(maze: Maze) -> float:
+    dijkstra = Dijkstra()
+    dijkstra.run(Maze(maze.image.copy()))
+    return dijkstra.stats.cost
+
+def assert_repaired(planner: LPAStar, maze: Maze, changes: dict) -> None:
+    maze.set_colors(changes)
+    path = planner.update_cells(changes)
+    assert planner.stats.cost == fresh_cost(maze)
+    assert_valid_path(maze, path)
+
+def test_set_colors():
+    maze = Maze(make_keyed_surface(), eager=True)
+    content_hash = maze.content_hash
+    maze.set_colors({(10, 10): WALL_COLOR})
+
+    assert maze.content_hash != content_hash
+    assert maze.image.get_at((10, 10))[:3] == WALL_COLOR
+    assert maze.classify().zone_of(maze.index((10, 10))) is None
+    assert maze.type_at((10, 10)) == PixelType.WALL
+
+@pytest.mark.parametrize('image', [make_keyed_surface(), load_example(1), generate_maze(64, keys=1, seed=4)])
+def test_plans_like_dijkstra(image):
+    maze = Maze(image.copy())
+    planner = LPAStar()
+    assert_valid_path(maze, planner.run(maze))
+    assert planner.stats.cost == fresh_cost(maze)
+
+def test_wall_across_the_path_is_repaired_locally():
+    maze = Maze(generate_maze(128, wall_density=0.1, seed=3))
+    planner = LPAStar()
+    path = planner.run(maze)
+    full_expansions = planner.stats.expanded
+
+    x, y = path[len(path) // 2]
+    assert_repaired(planner, maze, {(x + dx, y + dy): WALL_COLOR for dx in range(-2, 3) for dy in range(-2, 3) if maze.grid.in_bounds((x + dx, y + dy))})
+    assert planner.stats.expanded < full_expansions
+
+def test_opened_wall_is_repaired():
+    maze = Maze(make_open_surface())
+    planner = LPAStar()
+    planner.run(maze)
+    detour = planner.stats.cost
+
+    # A gap at the top of the middle wall makes the detour under it unnecessary
+    assert_repaired(planner, maze, {(20, y): (255, 255, 255) for y in range(1, 4)})
+    assert planner.stats.cost < detour
+
+def test_moved_door_is_repaired():
+    maze = Maze(make_keyed_surface())
+    planner = LPAStar()
+    planner.run(maze)
+
+    changes = {(x, y): (255, 255, 255) for x in range(50, 53) for y in range(1, 49)}
+    changes.update({(x, y): KEY_COLOR for x in range(60, 63) for y in range(1, 49)})
+    assert_repaired(planner, maze, changes)
+
+def test_moved_start_is_planned_again():
+    maze = Maze(make_keyed_surface())
+    planner = LPAStar()
+    planner.run(maze)
+
+    changes = {(x, y): (255, 255, 255) for x in range(30, 32) for y in range(5, 7)}
+    changes[(40, 40)] = START_COLOR
+    assert_repaired(planner, maze, changes)
+    assert planner.stats.expanded > 0
+
+def test_random_edits():
+    rng = random.Random(0)
+    maze = Maze(generate_maze(64, keys=1, seed=5))
+    planner = LPAStar()
+    planner.run(maze)
+
+    protected = {START_COLOR, END_COLOR}
+    for _ in range(15):
+        x, y = rng.randrange(1, 63), rng.randrange(1, 63)
+        color = rng.choice([WALL_COLOR, (255, 255, 255), (60, 60, 60)])
+        changes = {(x + dx, y): color for dx in range(rng.randrange(1, 6)) if x + dx < 63 and maze.pixel_at((x + dx, y)).color not in protected and maze.pixel_at((x + dx, y)).is_grey()}
+        maze.set_colors(changes)
+
+        try:
+            expected = fresh_cost(maze)
+        except MazeException:
+            with pytest.raises(MazeException):
+                planner.update_cells(changes)
+            continue
+        planner.update_cells(changes)
+        assert planner.stats.cost == expected
+
+def test_update_needs_a_plan():
+    with pytest.raises(MazeException, match='planned by run'):
+        LPAStar().update_cells([(1, 1)])
+
+def test_cache_key_after_run():
+    # The open list of the planner must not be taken for a queue class
+    planner = LPAStar()
+    key = planner.cache_key
+    planner.run(Maze(make_keyed_surface()))
+    assert planner.cache_key == key
+    assert '@' not in key
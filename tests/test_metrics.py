@@ -15,10 +15,10 @@ def test_manhattan_dist():
 def test_euclidean_dist():
     c1 = Coord((1, 1))
     c2 = Coord((4, 5))
-    expected = 25
+    expected = 5
     assert euclidean_dist(c1, c2) == expected
 
     c1 = Coord((3, 4))
     c2 = Coord((0, 0))
-    expected = 25
+    expected = 5
     assert euclidean_dist(c1, c2) == expected
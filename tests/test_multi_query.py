@@ -0,0 +1,88 @@
+import random
+from math import inf
+import pytest
+from src.maze import Maze, WALL_COLOR
+from src.maze.cost import LinearGreyCost
+from src.maze.generator import generate_maze
+from src.shortest_path import Dijkstra
+from src.shortest_path.landmarks import Landmarks
+from src.shortest_path.multi_query import MultiQuery, solve_many
+from tests.utils import make_keyed_surface
+
+def free_pixels(maze: Maze) -> list:
+    return [maze.coord(index) for index in range(maze.grid.size) if maze.compile().edges(index)]
+
+def random_pairs(maze: Maze, count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    pixels = free_pixels(maze)
+    starts = rng.sample(pixels, 4)
+    return [(rng.choice(starts), rng.choice(pixels)) for _ in range(count)]
+
+def assert_valid(maze: Maze, result) -> None:
+    path = result.path
+    assert (path[0], path[-1]) == (result.start, result.end)
+    for prev, curr in zip(path, path[1:]):
+        assert abs(prev[0] - curr[0]) + abs(prev[1] - curr[1]) == 1
+    assert sum(maze.step_costs()[maze.index(coord)] for coord in path[1:]) == pytest.approx(result.cost)
+
+def test_matches_dijkstra_between_start_and_end():
+    for image in [make_keyed_surface(), generate_maze(64, keys=1, seed=2)]:
+        maze = Maze(image)
+        dijkstra = Dijkstra()
+        dijkstra.run(maze)
+
+        result, = solve_many(maze, [(maze.get_start(), maze.get_end())], workers=1)
+        assert result.cost == dijkstra.stats.cost
+        assert_valid(maze, result)
+
+@pytest.mark.parametrize('cost_model', [None, LinearGreyCost(scale=1 / 128)])
+def test_trees_and_landmarks_agree(cost_model):
+    maze = Maze(generate_maze(64, keys=1, grey='uniform', seed=3), cost_model=cost_model)
+    pairs = random_pairs(maze, 40)
+
+    # The shared starts are answered by Dijkstra trees, one query at a time by A*
+    trees = solve_many(maze, pairs, workers=1)
+    for landmarks in [0, 4]:
+        single = [solve_many(maze, [pair], landmarks, workers=1)[0] for pair in pairs[:10]]
+        assert [result.cost for result in single] == pytest.approx([result.cost for result in trees[:10]])
+
+    for result in trees:
+        if result.path is not None:
+            assert_valid(maze, result)
+
+def test_landmark_bounds_are_admissible():
+    maze = Maze(generate_maze(64, wall_density=0.3, grey='gradient', seed=4), cost_model=LinearGreyCost())
+    landmarks = Landmarks(maze, 4)
+    assert len(landmarks.nodes) == 4
+
+    for result in solve_many(maze, random_pairs(maze, 40, seed=1), workers=1):
+        if result.path is not None:
+            assert landmarks.bound(maze.index(result.start), maze.index(result.end)) <= result.cost + 1e-9
+
+def test_landmarks_shrink_the_search():
+    maze = Maze(generate_maze(128, wall_density=0.35, seed=5))
+    pairs = random_pairs(maze, 10, seed=2)
+
+    plain = [solve_many(maze, [pair], workers=1)[0] for pair in pairs]
+    solver = MultiQuery(maze, Landmarks(maze, 8))
+    with_landmarks = [solver.solve([pair])[0] for pair in pairs]
+    assert [result.cost for result in with_landmarks] == [result.cost for result in plain]
+    assert sum(result.expanded for result in with_landmarks) < sum(result.expanded for result in plain)
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_pools_keep_the_order(processes):
+    maze = Maze(generate_maze(64, keys=1, seed=6))
+    pairs = random_pairs(maze, 30)
+
+    expected = solve_many(maze, pairs, workers=1)
+    results = solve_many(maze, pairs, landmarks=2, workers=2, processes=processes)
+    assert [(result.start, result.end, result.cost) for result in results] == [(result.start, result.end, result.cost) for result in expected]
+
+def test_unreachable_end():
+    surface = make_keyed_surface()
+    surface.fill(WALL_COLOR, (60, 1, 1, 48))
+    maze = Maze(surface)
+
+    near, far = solve_many(maze, [((10, 10), (20, 10)), ((10, 10), (70, 10))], workers=1)
+    assert near.cost == 10
+    assert far.path is None and far.cost == inf
@@ -0,0 +1,82 @@
+import multiprocessing
+import pytest
+import src.shortest_path.parallel_layers as parallel_layers
+from src.maze import Maze, MazeException
+from src.maze.cost import LinearGreyCost
+from src.maze.generator import generate_maze
+from src.shortest_path import Dijkstra, ParallelLayers
+from src.shortest_path.parallel_layers import expand_layer
+from tests.utils import assert_valid_path, load_example, make_adjacent_doors_surface, make_keyed_surface, make_open_surface
+
+@pytest.mark.parametrize('image, cost_model', [
+    (make_keyed_surface(), None),
+    (load_example(3), None),
+    (generate_maze(128, keys=2, grey='uniform', seed=4), LinearGreyCost(scale=1 / 64)),
+    (generate_maze(128, keys=3, seed=2, key_layout='any'), None),
+])
+def test_same_cost_as_dijkstra(image, cost_model):
+    maze = Maze(image, cost_model=cost_model)
+    expected = Dijkstra()
+    expected.run(maze)
+
+    for workers in [1, 2]:
+        algorithm = ParallelLayers(workers)
+        path = algorithm.run(maze)
+        assert_valid_path(maze, path)
+        assert algorithm.stats.cost == pytest.approx(expected.stats.cost)
+
+def test_layer_stops_at_new_keys():
+    maze = Maze(make_keyed_surface())
+    start = maze.index(maze.get_start())
+
+    # Without the key the door is closed and the end is not reached
+    result = expand_layer(maze, 0, {start: (0, -1)}, float('inf'))
+    end = maze.index(maze.get_end())
+    assert end not in result.nodes
+    assert {comb for comb, _, _, _ in result.boundary} == {1}
+
+def test_no_path():
+    surface = make_open_surface()
+    surface.fill((0, 0, 0), (20, 0, 1, 30))
+    with pytest.raises(MazeException, match='No path to the end node'):
+        ParallelLayers(1).run(Maze(surface))
+
+def test_layers_of_one_round_in_the_pool(monkeypatch):
+    # Both keys are in the first room, so the layers with one key are expanded together
+    pools = []
+
+    class CountingPool(parallel_layers.Pool):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(parallel_layers, 'Pool', CountingPool)
+    maze = Maze(make_adjacent_doors_surface())
+    expected = Dijkstra()
+    expected.run(maze)
+
+    algorithm = ParallelLayers(2)
+    assert_valid_path(maze, algorithm.run(maze))
+    assert algorithm.stats.cost == expected.stats.cost
+    assert len(pools) == 1
+
+    # Without a worker count there is no pool on a single CPU
+    monkeypatch.setattr(parallel_layers.os, 'cpu_count', lambda: 1)
+    algorithm = ParallelLayers()
+    algorithm.run(maze)
+    assert algorithm.stats.cost == expected.stats.cost
+    assert len(pools) == 1
+
+def solve_in_pool_worker(workers):
+    algorithm = ParallelLayers(workers)
+    algorithm.run(Maze(make_adjacent_doors_surface()))
+    return algorithm.stats.cost
+
+def test_daemonic_process_runs_in_process():
+    # Like the workers of the benchmark, they cannot start a pool of their own
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        cost = pool.apply(solve_in_pool_worker, (2,))
+
+    expected = Dijkstra()
+    expected.run(Maze(make_adjacent_doors_surface()))
+    assert cost == expected.stats.cost
@@ -0,0 +1,69 @@
+import json
+import pygame
+import pytest
+from src.batch import solve_many
+from src.maze import Maze, MazeException
+from src.maze.cost import LinearGreyCost
+from src.maze.generator import generate_maze
+from src.shortest_path import AStar, Dijkstra, JPS
+from src.shortest_path.profiling import PROFILE_VERSION, Profiler
+from tests.utils import make_keyed_surface, make_open_surface
+
+def test_phases_and_counters():
+    profiles = []
+    profiler = Profiler(profiles.append)
+    with profiler.phase('load'):
+        maze = Maze(make_keyed_surface())
+
+    algorithm = Dijkstra()
+    path = profiler.run(algorithm, maze)
+
+    assert profiles == profiler.profiles
+    profile = profiles[0]
+    assert set(profile.phases) == {'load', 'classify', 'compile', 'search', 'reconstruct'}
+    assert all(seconds >= 0 for seconds in profile.phases.values())
+    assert profile.stats == algorithm.stats
+    assert profile.stats.relaxations >= profile.stats.expanded > 0
+    assert profile.stats.distances > 0
+    assert profile.flood_fills > 0 and profile.filled_pixels > 0
+    assert algorithm.profiler is None
+
+    # The maze is classified only once and the search is the same
+    assert profiler.run(Dijkstra(), maze) == path
+    assert 'load' not in profiler.profiles[1].phases
+    assert profiler.profiles[1].flood_fills == 0
+
+def test_stale_entries():
+    # With different step costs A* finds better routes to nodes that are already queued
+    algorithm = AStar()
+    Profiler().run(algorithm, Maze(generate_maze(64, keys=1, grey='uniform', seed=2), cost_model=LinearGreyCost(scale=1 / 64)))
+    assert algorithm.stats.stale > 0
+    assert algorithm.stats.pushes >= algorithm.stats.expanded + algorithm.stats.stale
+
+def test_failed_run_is_recorded():
+    surface = make_open_surface()
+    surface.fill((0, 0, 0), (20, 0, 1, 30))
+
+    profiler = Profiler()
+    with pytest.raises(MazeException):
+        profiler.run(JPS(), Maze(surface))
+
+    profile = profiler.profiles[0]
+    assert profile.error == 'MazeException: No path to the end node'
+    assert 'reconstruct' not in profile.phases
+
+def test_json_export():
+    profiler = Profiler()
+    profiler.run(AStar(), Maze(make_keyed_surface()))
+
+    exported = json.loads(profiler.profiles[0].to_json())
+    assert exported['version'] == PROFILE_VERSION
+    assert exported['algorithm'] == 'AStar'
+    assert exported['stats']['expanded'] > 0
+
+def test_batch_profile(tmp_path):
+    pygame.image.save(make_keyed_surface(), str(tmp_path / 'keyed.bmp'))
+
+    result, = solve_many([str(tmp_path / 'keyed.bmp')], ['AStar'], workers=1, profile=True)
+    assert result['profile']['stats']['expanded'] == result['expanded']
+    assert 'compile' in result['profile']['phases']
@@ -0,0 +1,74 @@
+import pytest
+from src.maze import Maze
+from src.maze.cost import LinearGreyCost
+from src.maze.generator import generate_maze
+from src.shortest_path import AStar, Dijkstra, GBFS
+from src.shortest_path.queues import QUEUES, BucketQueue, HeapQueue, IndexedHeapQueue
+from tests.utils import load_example, make_keyed_surface
+
+@pytest.mark.parametrize('queue', QUEUES.values())
+def test_pop_order(queue):
+    nodes_to_visit = queue(0)
+    for priority, slot in [(3, 1), (1, 2), (2, 3), (1.5, 4)]:
+        nodes_to_visit.push(priority, slot)
+
+    assert [nodes_to_visit.pop() for _ in range(4)] == [(1, 2), (1.5, 4), (2, 3), (3, 1)]
+    assert len(nodes_to_visit) == 0
+
+@pytest.mark.parametrize('queue', QUEUES.values())
+def test_better_priority_replaces_the_entry(queue):
+    nodes_to_visit = queue(0)
+    nodes_to_visit.push(5, 1)
+    nodes_to_visit.push(4, 2)
+    nodes_to_visit.push(2, 1)
+
+    assert len(nodes_to_visit) == 2
+    assert nodes_to_visit.pop() == (2, 1)
+    assert nodes_to_visit.pop() == (4, 2)
+    assert not nodes_to_visit
+
+def test_stale_entries_are_counted():
+    for queue in [HeapQueue(0), BucketQueue(0)]:
+        queue.push(2, 1)
+        queue.push(5, 2)
+        queue.push(1, 1)
+        assert queue.pop() == (1, 1)
+        assert queue.pop() == (5, 2)
+        assert queue.stale == 1
+
+    # decrease-key leaves nothing behind
+    indexed = IndexedHeapQueue(0)
+    indexed.push(5, 1)
+    indexed.push(2, 1)
+    assert len(indexed.heap) == 1
+
+def test_more_keys_first_on_ties():
+    # The slots of one pixel with no keys and with two keys
+    for queue in [HeapQueue(2), IndexedHeapQueue(2)]:
+        queue.push(1, 7 << 2)
+        queue.push(1, 7 << 2 | 0b11)
+        assert queue.pop() == (1, 7 << 2 | 0b11)
+
+@pytest.mark.parametrize('image, cost_model', [
+    (make_keyed_surface(), None),
+    (load_example(2), None),
+    (generate_maze(64, keys=1, grey='uniform', seed=2), LinearGreyCost(scale=1 / 64)),
+])
+def test_engines_find_the_same_cost(image, cost_model):
+    maze = Maze(image, cost_model=cost_model)
+    reference = Dijkstra()
+    reference.run(maze)
+
+    for queue in QUEUES.values():
+        for algorithm in [Dijkstra(queue), AStar(queue=queue)]:
+            algorithm.run(maze)
+            assert algorithm.stats.cost == pytest.approx(reference.stats.cost)
+
+        # Greedy search is not optimal, it only has to get there
+        gbfs = GBFS(queue=queue)
+        assert gbfs.run(maze)
+
+def test_queue_in_cache_key():
+    assert AStar().cache_key == 'AStar:src.shortest_path.metrics.manhattan_dist'
+    assert AStar(queue=BucketQueue).cache_key == 'AStar:src.shortest_path.metrics.manhattan_dist@BucketQueue'
+    assert Dijkstra(IndexedHeapQueue).cache_key == 'Dijkstra@IndexedHeapQueue'
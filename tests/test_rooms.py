@@ -0,0 +1,83 @@
+from src.maze import Coord, Maze
+from src.shortest_path import Dijkstra, Hierarchical
+from tests.utils import make_keyed_surface, make_open_surface
+
+def test_rooms_split_by_door():
+    maze = Maze(make_keyed_surface())
+    rooms = maze.split_rooms()
+
+    assert len(rooms) == 2
+    left = rooms.room_of(maze.index(Coord((10, 10))))
+    right = rooms.room_of(maze.index(Coord((70, 40))))
+    assert {left, right} == {1, 2}
+
+    # The key is a part of the room, the door is not
+    assert rooms.room_of(maze.index(Coord((10, 30)))) == left
+    assert rooms.room_of(maze.index(Coord((51, 10)))) == 0
+    assert rooms.doors[left - 1] == rooms.doors[right - 1]
+    assert len(rooms.doors[left - 1]) == 1
+
+def test_wall_does_not_split_connected_room():
+    maze = Maze(make_open_surface())
+    rooms = maze.split_rooms()
+
+    assert len(rooms) == 1
+    assert len(rooms.members[0]) == sum(1 for coord in maze.map if maze.pixel_at(coord).color != (0, 0, 0))
+
+
+def test_room_field_distances():
+    maze = Maze(make_open_surface())
+    start, end = maze.index(maze.get_start()), maze.index(maze.get_end())
+    fields = maze.room_fields()
+    room_field = fields.field(1, (start,))
+
+    dijkstra = Dijkstra()
+    dijkstra.run(maze)
+    assert fields.distance(room_field, [end]) == dijkstra.stats.cost
+
+    # The path is read back from the field, one step at a time
+    path = fields.path(room_field, end)
+    assert path[0] == end and path[-1] == start
+    assert len(path) - 1 == dijkstra.stats.cost
+    for index, next_index in zip(path, path[1:]):
+        assert next_index in [maze.compile().targets[edge] for edge in maze.compile().edges(index)]
+
+def test_room_field_next_to_door():
+    maze = Maze(make_keyed_surface())
+    rooms = maze.split_rooms()
+    left = rooms.room_of(maze.index(Coord((10, 10))))
+    fields = maze.room_fields()
+    room_field = fields.field(left, (maze.index(maze.get_start()),))
+
+    # The door is at x = 50, the start at (30, 5)
+    assert fields.distance(room_field, [maze.index(Coord((50, 5)))]) == 20
+    assert fields.distance(room_field, [maze.index(Coord((51, 5)))]) == float('inf')
+
+def test_room_fields_reused_between_runs():
+    maze = Maze(make_keyed_surface())
+    first, second = Hierarchical(), Hierarchical()
+    path = first.run(maze)
+    fields = maze.room_fields()
+    misses = fields.misses
+
+    assert second.run(maze) == path
+    assert fields.misses == misses
+    assert fields.hits > 0
+
+    # Repainting drops the fields with the rooms
+    maze.set_colors({Coord((60, 40)): (0, 0, 0)})
+    assert maze.room_fields() is not fields
+
+def test_room_fields_memory_budget():
+    maze = Maze(make_keyed_surface())
+    rooms = maze.split_rooms()
+    fields = maze.room_fields()
+    fields.memory_budget = 8 * len(rooms.members[0])
+
+    fields.field(1, (rooms.members[0][0],))
+    fields.field(2, (rooms.members[1][0],))
+    assert list(fields.fields) == [2]
+    assert fields.cached_bytes == 8 * len(rooms.members[1])
+
+    fields.field(1, (rooms.members[0][0],))
+    assert fields.misses == 3 and fields.hits == 0
@@ -0,0 +1,95 @@
+import pytest
+from src.maze import Maze, MazeException
+from src.maze.generator import generate_maze
+from src.shortest_path import AStar, BidirectionalAStar, Dijkstra, GBFS, Hierarchical, JPS
+from src.shortest_path.abstract_shortest_path import SearchStats
+from tests.utils import assert_valid_path, load_example, make_adjacent_doors_surface, make_keyed_surface, make_open_surface, make_thick_door_surface
+
+@pytest.mark.parametrize('example, expected', [(1, 530)])
+def test_optimal_engines_on_examples(example, expected):
+    image = load_example(example)
+
+    for algorithm in [Dijkstra(), AStar()]:
+        maze = Maze(image)
+        path = algorithm.run(maze)
+        assert len(path) == expected
+        assert_valid_path(maze, path)
+
+def test_gbfs_finds_a_path():
+    maze = Maze(make_keyed_surface())
+    path = GBFS().run(maze)
+    assert_valid_path(maze, path)
+
+def test_keyed_maze_detour():
+    maze = Maze(make_keyed_surface())
+    path = Dijkstra().run(maze)
+
+    assert_valid_path(maze, path)
+    # The path has to go through the key before the door
+    assert any(maze.zone_at(coord) is not None and maze.zone_at(coord).color == (255, 0, 0) for coord in path)
+    assert len(path) == len(AStar().run(maze))
+
+def test_no_path():
+    surface = make_open_surface()
+    surface.fill((0, 0, 0), (20, 0, 1, 30))
+    with pytest.raises(MazeException, match='No path to the end node'):
+        Dijkstra().run(Maze(surface))
+
+
+def test_hierarchical_matches_dijkstra():
+    for image in [make_keyed_surface(), load_example(1), load_example(2), make_adjacent_doors_surface(), make_thick_door_surface()]:
+        maze = Maze(image)
+        hierarchical, dijkstra = Hierarchical(), Dijkstra()
+        path = hierarchical.run(maze)
+
+        assert_valid_path(maze, path)
+        assert len(path) == len(dijkstra.run(maze))
+        assert hierarchical.stats.cost == dijkstra.stats.cost
+
+def test_hierarchical_refines_only_the_route():
+    maze = Maze(generate_maze(256, keys=6))
+    astar, hierarchical = AStar(), Hierarchical()
+    astar.run(maze)
+
+    hierarchical.stats = SearchStats()
+    portals = hierarchical.find_portals(maze, maze.index(maze.get_start()), maze.index(maze.get_end()))
+    route = hierarchical.abstract_search(maze, portals)
+    refined = hierarchical.stats = SearchStats()
+    path = hierarchical.refine(maze, portals, route)
+
+    assert_valid_path(maze, path)
+    assert refined.cost == astar.stats.cost
+    assert refined.expanded < astar.stats.expanded
+    # Only the pixels the refine reached have a distance
+    assert refined.distances < maze.grid.size
+
+@pytest.mark.parametrize('image', [make_keyed_surface(), make_open_surface(), load_example(1), generate_maze(256), generate_maze(128, keys=2)])
+def test_bidirectional_matches_dijkstra(image):
+    maze = Maze(image)
+    path = BidirectionalAStar().run(maze)
+
+    assert_valid_path(maze, path)
+    assert len(path) == len(Dijkstra().run(maze))
+
+def test_bidirectional_no_path():
+    surface = make_open_surface()
+    surface.fill((0, 0, 0), (20, 0, 1, 30))
+    with pytest.raises(MazeException, match='No path to the end node'):
+        BidirectionalAStar().run(Maze(surface))
+
+@pytest.mark.parametrize('image', [make_keyed_surface(), make_open_surface(), load_example(1), generate_maze(128, 0.3, seed=1), generate_maze(128, 0.5, keys=2, seed=2)])
+def test_jps_matches_dijkstra_cost(image):
+    maze = Maze(image)
+    dijkstra, jps = Dijkstra(), JPS()
+    dijkstra.run(maze)
+    path = jps.run(maze)
+
+    assert_valid_path(maze, path)
+    assert jps.stats.cost == dijkstra.stats.cost
+    assert jps.stats.expanded < dijkstra.stats.expanded
+
+def test_jps_no_path():
+    surface = make_open_surface()
+    surface.fill((0, 0, 0), (20, 0, 1, 30))
+    with pytest.raises(MazeException, match='No path to the end node'):
+        JPS().run(Maze(surface))
\ No newline at end of file
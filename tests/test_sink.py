@@ -0,0 +1,102 @@
+import threading
+import pygame
+import pytest
+from src.maze import ITERATION_NODE_COLOR, Maze, MazeException
+from src.shortest_path import AStar, Dijkstra, Hierarchical, JPS
+from src.shortest_path.abstract_shortest_path import ShortestPath
+from src.shortest_path.sink import ExpansionSink, ScreenSink
+from tests.utils import make_keyed_surface, make_open_surface
+
+def test_drain_order_and_limit():
+    sink = ExpansionSink()
+    for index in range(5):
+        sink.publish(index)
+
+    assert sink.drain(2) == [0, 1]
+    assert sink.drain() == [2, 3, 4]
+    assert sink.drain() == []
+    pygame.display.quit()
+
+def test_engines_publish_every_expansion():
+    maze = Maze(make_keyed_surface())
+
+    for algorithm in [Dijkstra(), AStar(), Hierarchical()]:
+        sink = ExpansionSink()
+        path = algorithm.run(maze, sink=sink)
+        expanded = sink.drain()
+
+        assert path
+        assert len(expanded) > 0
+        assert maze.index(maze.get_start()) in expanded
+
+def test_screen_sink_draws_on_flush(monkeypatch):
+    # Drawing updates the display, so use one that does not open a window
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    maze = Maze(make_keyed_surface())
+    screen = pygame.display.set_mode((maze.width, maze.height))
+    sink = ScreenSink(maze, screen, frame_rate=1)
+
+    sink.publish(maze.index((3, 4)))
+    sink.flush()
+
+    assert tuple(screen.get_at((3, 4)))[:3] == ITERATION_NODE_COLOR
+    assert sink.drain() == []
+    pygame.display.quit()
+
+
+def run_steps(search):
+    slices = []
+    try:
+        while True:
+            slices.append(next(search))
+    except StopIteration as stop:
+        return slices, stop.value
+
+def test_steps_same_path_as_run():
+    maze = Maze(make_keyed_surface())
+
+    for algorithm in [Dijkstra(), AStar(), Hierarchical(), JPS()]:
+        sink = ExpansionSink()
+        path = algorithm.run(maze, sink=sink)
+        expanded = sink.drain()
+
+        slices, stepped_path = run_steps(algorithm.steps(maze, 100))
+        assert stepped_path == path
+        # A checkpoint can end a slice early
+        assert all(len(expansions) <= 100 for expansions in slices)
+        assert [index for expansions in slices for index in expansions] == expanded
+
+def test_steps_cancel():
+    maze = Maze(make_keyed_surface())
+    threads = threading.active_count()
+
+    search = Dijkstra().steps(maze, 10)
+    assert len(next(search)) == 10
+    assert threading.active_count() == threads + 1
+
+    search.close()
+    assert threading.active_count() == threads
+
+class Unpublished(ShortestPath):
+    # Works for a long time without publishing a node, like building the tables of a heuristic
+    def run(self, maze, screen=None, sink=None):
+        while True:
+            self.checkpoint()
+
+def test_steps_cancel_between_checkpoints():
+    maze = Maze(make_keyed_surface())
+    threads = threading.active_count()
+
+    search = Unpublished().steps(maze)
+    assert next(search) == []
+
+    search.close()
+    assert threading.active_count() == threads
+
+def test_steps_raise_errors():
+    surface = make_open_surface()
+    surface.fill((0, 0, 0), (20, 0, 1, 30))
+
+    with pytest.raises(MazeException, match='No path to the end node'):
+        run_steps(AStar().steps(Maze(surface), 10))
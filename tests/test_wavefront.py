@@ -0,0 +1,45 @@
+import pytest
+from src.maze import Maze, MazeException
+from src.maze.cost import ConstantCost, LinearGreyCost
+from src.maze.generator import generate_maze
+from src.shortest_path import Dijkstra, WavefrontBFS
+from src.shortest_path.wavefront import bit_indices, to_bits
+from tests.utils import assert_valid_path, load_example, make_keyed_surface, make_open_surface
+
+def test_bits():
+    bits = to_bits(bytes([1, 0, 0, 1, 1]))
+    assert bits == 0b11001
+    assert bit_indices(bits) == [4, 3, 0]
+    assert bit_indices(0) == []
+
+@pytest.mark.parametrize('image, cost_model', [
+    (make_keyed_surface(), None),
+    (load_example(1), None),
+    (load_example(3), ConstantCost(2.5)),
+    (generate_maze(128, keys=3, seed=7), None),
+])
+def test_same_cost_as_dijkstra(image, cost_model):
+    maze = Maze(image, cost_model=cost_model)
+    expected = Dijkstra()
+    expected_path = expected.run(maze)
+
+    algorithm = WavefrontBFS()
+    path = algorithm.run(maze)
+    assert_valid_path(maze, path)
+    assert algorithm.stats.cost == expected.stats.cost
+    assert len(path) == len(expected_path)
+
+def test_falls_back_to_dijkstra():
+    maze = Maze(generate_maze(64, keys=1, grey='uniform', seed=2), cost_model=LinearGreyCost(scale=1 / 64))
+    expected = Dijkstra()
+    expected.run(maze)
+
+    algorithm = WavefrontBFS()
+    assert_valid_path(maze, algorithm.run(maze))
+    assert algorithm.stats.cost == pytest.approx(expected.stats.cost)
+
+def test_no_path():
+    surface = make_open_surface()
+    surface.fill((0, 0, 0), (20, 0, 1, 30))
+    with pytest.raises(MazeException, match='No path to the end node'):
+        WavefrontBFS().run(Maze(surface))
@@ -0,0 +1,80 @@
+'''
+Helpers shared by the tests
+'''
+
+import os
+import pygame
+from src.maze import END_COLOR, KEY_HEIGHT, KEY_WIDTH, START_COLOR, WALL_COLOR, Coord, Maze
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'examples')
+
+KEY_COLOR = (255, 0, 0)
+OTHER_KEY_COLOR = (0, 255, 0)
+
+def load_example(number: int) -> pygame.surface.Surface:
+    return pygame.image.load(os.path.join(EXAMPLES_DIR, f'0{number}.input20x20.bmp'))
+
+def make_keyed_surface() -> pygame.surface.Surface:
+    '''
+    Two rooms separated by a red door. The key for the door is in the left room
+    away from the direct route, the end is in the right room.
+    '''
+    surface = pygame.Surface((80, 50))
+    surface.fill((255, 255, 255))
+    pygame.draw.rect(surface, WALL_COLOR, pygame.Rect(0, 0, 80, 50), 1)
+    surface.fill(KEY_COLOR, pygame.Rect(5, 25, KEY_WIDTH, KEY_HEIGHT))
+    surface.fill(KEY_COLOR, pygame.Rect(50, 1, 3, 48))
+    surface.fill(START_COLOR, pygame.Rect(30, 5, 2, 2))
+    surface.fill(END_COLOR, pygame.Rect(70, 5, 2, 2))
+    return surface
+
+def make_adjacent_doors_surface() -> pygame.surface.Surface:
+    '''
+    Like make_keyed_surface but the way to the end goes through a red door and a green door
+    right next to it, both keys are in the left room.
+    '''
+    surface = pygame.Surface((90, 50))
+    surface.fill((255, 255, 255))
+    pygame.draw.rect(surface, WALL_COLOR, pygame.Rect(0, 0, 90, 50), 1)
+    surface.fill(KEY_COLOR, pygame.Rect(5, 25, KEY_WIDTH, KEY_HEIGHT))
+    surface.fill(OTHER_KEY_COLOR, pygame.Rect(28, 25, KEY_WIDTH, KEY_HEIGHT))
+    surface.fill(KEY_COLOR, pygame.Rect(50, 1, 3, 48))
+    surface.fill(OTHER_KEY_COLOR, pygame.Rect(53, 1, 3, 48))
+    surface.fill(START_COLOR, pygame.Rect(30, 5, 2, 2))
+    surface.fill(END_COLOR, pygame.Rect(80, 5, 2, 2))
+    return surface
+
+def make_thick_door_surface() -> pygame.surface.Surface:
+    '''
+    Two rooms split by a wall with two red doors: a long one across the wall at the top, close
+    to the start and the end but expensive to cross, and a thin one in the middle of the wall.
+    '''
+    surface = pygame.Surface((100, 60))
+    surface.fill((255, 255, 255))
+    pygame.draw.rect(surface, WALL_COLOR, pygame.Rect(0, 0, 100, 60), 1)
+    surface.fill(WALL_COLOR, pygame.Rect(50, 1, 1, 58))
+    surface.fill(WALL_COLOR, pygame.Rect(1, 15, 98, 1))
+    surface.fill((255, 255, 255), pygame.Rect(45, 15, 3, 1))
+    surface.fill((255, 255, 255), pygame.Rect(53, 15, 3, 1))
+    surface.fill(KEY_COLOR, pygame.Rect(3, 35, KEY_WIDTH, KEY_HEIGHT))
+    surface.fill(KEY_COLOR, pygame.Rect(10, 10, 81, 5))
+    surface.fill(KEY_COLOR, pygame.Rect(50, 17, 1, 4))
+    surface.fill(START_COLOR, pygame.Rect(12, 17, 2, 2))
+    surface.fill(END_COLOR, pygame.Rect(88, 17, 2, 2))
+    return surface
+
+def make_open_surface(width: int = 40, height: int = 30) -> pygame.surface.Surface:
+    surface = pygame.Surface((width, height))
+    surface.fill((255, 255, 255))
+    pygame.draw.rect(surface, WALL_COLOR, pygame.Rect(0, 0, width, height), 1)
+    pygame.draw.line(surface, WALL_COLOR, (width // 2, 1), (width // 2, height - 5))
+    surface.set_at((2, 2), START_COLOR)
+    surface.set_at((width - 3, 2), END_COLOR)
+    return surface
+
+def assert_valid_path(maze: Maze, path: list[Coord]) -> None:
+    # The path can start from any pixel of the start area
+    assert maze.pixel_at(path[0]).color == START_COLOR
+    for prev, curr in zip(path, path[1:] + [maze.get_end()]):
+        assert abs(prev[0] - curr[0]) + abs(prev[1] - curr[1]) == 1
+        assert maze.pixel_at(curr).color != WALL_COLOR